@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017-2020 Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+
+# -- Modules ------------------------------------------------------------------
+
+import json
+import os
+import sqlite3
+import threading
+from statistics import median
+
+# -- BuildHistory class -------------------------------------------------------
+
+class BuildHistory(object):
+	"""Persistent history of the builds run by the build master, kept in a
+	   sqlite database with one row per build record.
+
+	   Rows are keyed by the source of the record and its build number, so
+	   that the records of other build masters, which number their builds
+	   independently, can be imported alongside the own ones (source '').
+	   Recency is therefore determined by the start time of the builds.
+
+	   It is used to predict the duration of builds from past ones and to
+	   answer questions like which ports are the slowest to build or how
+	   many builds a builder manages per hour."""
+
+	fileName = 'buildHistory.db'
+
+	# the number of recent successful builds a prediction is based on
+	predictionSampleSize = 5
+
+	_schema = '''
+		CREATE TABLE IF NOT EXISTS builds (
+			source TEXT NOT NULL,
+			buildNumber INTEGER NOT NULL,
+			portName TEXT NOT NULL,
+			version TEXT NOT NULL,
+			revision TEXT NOT NULL,
+			startTime REAL NOT NULL,
+			duration REAL NOT NULL,
+			success INTEGER NOT NULL,
+			builderId TEXT NOT NULL,
+			PRIMARY KEY (source, buildNumber)
+		);
+		CREATE INDEX IF NOT EXISTS buildsByPort
+			ON builds (portName, success, startTime);
+		CREATE INDEX IF NOT EXISTS buildsByBuilder
+			ON builds (builderId, startTime);
+	'''
+
+	def __init__(self, directory):
+		self.path = os.path.join(directory, BuildHistory.fileName)
+		self._lock = threading.Lock()
+		self._connection = sqlite3.connect(self.path, timeout=60,
+			isolation_level=None, check_same_thread=False)
+		self._connection.execute('PRAGMA journal_mode = WAL')
+		self._connection.executescript(self._schema)
+
+	def addRecord(self, buildNumber, recordStatus, source=''):
+		"""Adds the build with the given number, described by the status of
+		   its BuildRecord"""
+
+		with self._lock:
+			self._connection.execute(
+				'INSERT OR REPLACE INTO builds '
+				'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+				self._row(source, buildNumber, recordStatus))
+
+	def importRecords(self, recordsDirectory, source=''):
+		"""Adds the build records (<build number>.json files) found in the
+		   given directory that aren't in the history yet, returns the number
+		   of imported records. Records of another build master need to be
+		   imported with a source naming it."""
+
+		with self._lock:
+			knownBuildNumbers = set(row[0] for row in self._connection.execute(
+				'SELECT buildNumber FROM builds WHERE source = ?', (source, )))
+
+		rows = []
+		for fileName in os.listdir(recordsDirectory):
+			if not fileName.endswith('.json'):
+				continue
+			try:
+				buildNumber = int(fileName[:-5])
+			except ValueError:
+				continue
+			if buildNumber in knownBuildNumbers:
+				continue
+
+			try:
+				with open(os.path.join(recordsDirectory, fileName),
+						'r') as recordFile:
+					rows.append(self._row(source, buildNumber,
+						json.load(recordFile)))
+			except (OSError, ValueError, KeyError, TypeError):
+				continue
+
+		with self._lock:
+			self._connection.execute('BEGIN')
+			self._connection.executemany(
+				'INSERT OR IGNORE INTO builds '
+				'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+				rows)
+			self._connection.execute('COMMIT')
+		return len(rows)
+
+	def predictDuration(self, portName, version=None):
+		"""Returns the expected duration of building the given port, or None
+		   if it has never been built successfully.
+
+		   The prediction is the median of the most recent successful builds
+		   of the same version, or of any version if that version hasn't
+		   been built before."""
+
+		durations = []
+		if version is not None:
+			durations = self._recentDurations(portName, version)
+		if not durations:
+			durations = self._recentDurations(portName)
+		return median(durations) if durations else None
+
+	def defaultDuration(self):
+		"""Returns the duration to expect for ports that have never been
+		   built, the median of the last successful build of every port"""
+
+		durations = [duration for _, _, duration in self.latestDurations()]
+		return median(durations) if durations else None
+
+	def latestDurations(self):
+		"""Returns (port name, version, duration) of the last successful
+		   build of every port"""
+
+		with self._lock:
+			return self._connection.execute(
+				'SELECT portName, version, duration FROM builds AS b '
+				'WHERE success = 1 AND startTime = ('
+					'SELECT MAX(startTime) FROM builds '
+					'WHERE portName = b.portName AND success = 1) '
+				'GROUP BY portName').fetchall()
+
+	def slowestPorts(self, count=10):
+		"""Returns (port name, version, duration) of the ports with the
+		   longest last successful build, slowest first"""
+
+		return sorted(self.latestDurations(), key=lambda row: row[2],
+			reverse=True)[:count]
+
+	def builderThroughput(self, since=None):
+		"""Returns a dict with the number of builds, successful builds, the
+		   mean build duration and builds per hour for each builder,
+		   optionally only for builds started at or after since"""
+
+		query = ('SELECT builderId, COUNT(*), SUM(success), SUM(duration) '
+			'FROM builds')
+		parameters = ()
+		if since is not None:
+			query += ' WHERE startTime >= ?'
+			parameters = (since, )
+		query += ' GROUP BY builderId'
+
+		with self._lock:
+			rows = self._connection.execute(query, parameters).fetchall()
+
+		return {
+			builderId: {
+				'builds': builds,
+				'successfulBuilds': successfulBuilds,
+				'meanDuration': totalDuration / builds,
+				'buildsPerHour': builds * 3600 / totalDuration
+					if totalDuration > 0 else None
+			}
+			for builderId, builds, successfulBuilds, totalDuration in rows
+		}
+
+	def _recentDurations(self, portName, version=None):
+		query = ('SELECT duration FROM builds '
+			'WHERE portName = ? AND success = 1')
+		parameters = (portName, )
+		if version is not None:
+			query += ' AND version = ?'
+			parameters += (version, )
+		query += ' ORDER BY startTime DESC LIMIT ?'
+		parameters += (self.predictionSampleSize, )
+
+		with self._lock:
+			return [row[0] for row
+				in self._connection.execute(query, parameters)]
+
+	@staticmethod
+	def _row(source, buildNumber, recordStatus):
+		port = recordStatus['port']
+		return (source, buildNumber, port['name'], str(port['version']),
+			str(port['revision']), recordStatus['startTime'],
+			recordStatus['duration'], 1 if recordStatus['buildSuccess'] else 0,
+			str(recordStatus['builderId']))
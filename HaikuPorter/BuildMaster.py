@@ -10,39 +10,29 @@
 import json
 import logging
 import os
+import queue
 import subprocess
-import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from statistics import median
 
+from .BuildHistory import BuildHistory
 from .Builders.Builder import BuilderState
 from .Builders.LocalBuilder import LocalBuilder
 from .Builders.RemoteBuilderSSH import RemoteBuilderSSH
 from .Configuration import Configuration
+from .LogRouter import LogRouter
 from .Options import getOption
-from .PackageInfo import pickleCacheBackup
 from .Port import Port
 from .ReporterJson import ReporterJson
 from .ReporterMongo import ReporterMongo
+from .ReporterQueue import ReporterQueue
+from .SchedulingPolicy import schedulingPolicies
+from .StatusJournal import StatusJournal
 from .Utils import ensureCommandIsAvailable, info, sysExit, warn, important
 
 
-class ThreadFilter(object):
-	def __init__(self):
-		self.ident = threading.current_thread().ident
-		self.build = None
-
-	def reset(self):
-		self.ident = threading.current_thread().ident
-	def setBuild(self, build):
-		self.build = build
-
-	def filter(self, record):
-		ours = threading.current_thread().ident == self.ident
-		if ours and self.build:
-			self.build['lines'] += 1
-		return ours
-
-
 class ScheduledBuild(object):
 	def __init__(self, port, portsTreePath, missingPackageIDs,
 		packageRepository, presentDependencyPackages):
@@ -88,7 +78,7 @@ class ScheduledBuild(object):
 			'requiredPackages': sorted(list(self.requiredPackageIDs)),
 			'missingPackageIDs': sorted(list(self.missingPackageIDs)),
 			'buildable': self.buildable,
-			'buildNumbers': self.buildNumbers,
+			'buildNumbers': list(self.buildNumbers),
 			'lost': self.lost
 		}
 
@@ -152,9 +142,11 @@ class BuildRecord(object):
 
 
 class BuildMaster(object):
-	def __init__(self, portsTreePath, packageRepository, options):
-		pickleCacheBackup()
+	# the minimum time in seconds between two status snapshots handed to the
+	# reporter, changes in between are coalesced
+	statusReportInterval = 0.5
 
+	def __init__(self, portsTreePath, packageRepository, options):
 		self.portsTreePath = portsTreePath
 		self._fillPortsTreeInfo()
 
@@ -177,6 +169,15 @@ class BuildMaster(object):
 		if not os.path.isdir(self.buildRecordsDir):
 			os.makedirs(self.buildRecordsDir)
 
+		# the output directory may be specific to one buildrun, the history
+		# is kept across buildruns like the build number
+		self.history = BuildHistory(self.masterBaseDir)
+		self.history.importRecords(self.buildRecordsDir)
+		if getOption('buildMasterRecordsDir'):
+			self.history.importRecords(getOption('buildMasterRecordsDir'))
+
+		self.journal = StatusJournal(self.buildOutputBaseDir)
+
 		self.buildStatus = None
 		self.buildNumberFile = os.path.join(self.masterBaseDir, 'buildnumber')
 		self.buildNumber = 0
@@ -186,6 +187,10 @@ class BuildMaster(object):
 		except Exception as exception:
 			pass
 
+		# the build number keeps moving while builds are started, the
+		# buildrun is identified by the number its first build gets
+		self.buildrunNumber = self.buildNumber
+
 		# Prevents the 'haiku package requirement not met' error
 		# These system packages are uploaded to every builder and used as the
 		# base set of packages for builds
@@ -222,6 +227,12 @@ class BuildMaster(object):
 			if not self.reporter.connected():
 				sysExit('unable to connect to reporting engine @ ' + reportURI)
 
+		if self.reporter:
+			self.reporter = ReporterQueue(self.reporter)
+		self._nextStatusReport = 0
+		self._statusReportPending = False
+		self._changedBuilds = {}
+
 		if self.localBuilders == 0:
 			info('loading builders from ' + self.builderBaseDir)
 			for fileName in os.listdir(self.builderBaseDir):
@@ -245,14 +256,20 @@ class BuildMaster(object):
 				self.remoteAvailable = True
 				self.activeBuilders.append(builder)
 		else:
+			# the local builds log to the global logger from their build
+			# threads, route the records of each one to its build log and
+			# those of all other threads to the existing handlers
 			logger = logging.getLogger("buildLogger")
-			for h in logger.handlers:
+			logRouter = LogRouter(logger.handlers)
+			for h in list(logger.handlers):
 				logger.removeHandler(h)
+			logger.setLevel(logging.DEBUG)
+			logger.addHandler(logRouter)
 			for i in range(0, self.localBuilders):
 				builder = None
 				try:
 					builder = LocalBuilder(str(i), packageRepository,
-						self.buildOutputBaseDir, options)
+						self.buildOutputBaseDir, options, logRouter)
 				except Exception as exception:
 					self.logger.error('failed to add local builder: '
 						+ str(exception))
@@ -271,7 +288,10 @@ class BuildMaster(object):
 
 		self.scheduledBuilds = []
 		self.activeBuilds = []
-		self.blockedBuilds = []
+		self.blockedBuilds = {}
+			# used as an ordered set
+		self._buildsWaitingFor = {}
+			# blocked builds by the IDs of the packages they are missing
 		self.completeBuilds = []
 		self.failedBuilds = []
 		self.lostBuilds = []
@@ -283,11 +303,24 @@ class BuildMaster(object):
 		self.impulseData = [None] * 500
 		self.impulseIndex = -1
 
-		self.buildableCondition = threading.Condition()
-			# protectes the scheduled builds lists
-		self.builderCondition = threading.Condition()
-			# protects the builders lists
-		self.statusLock = threading.Lock()
+		self.expectedDurations = {}
+		self.defaultDuration = None
+		self.buildStartTimes = {}
+
+		# bytes of required packages uploaded to the builders, found in their
+		# package caches, and saved by picking builders with the packages
+		# cached instead of the first available one
+		self.uploadedBytes = 0
+		self.cachedBytes = 0
+		self.affinitySavedBytes = 0
+		self._packageSizes = {}
+
+		self.schedulingPolicy \
+			= schedulingPolicies[getOption('buildScheduling')]()
+
+		self.buildEvents = queue.Queue()
+			# (builder, build, build number, start time, future) of finished
+			# builds
 
 		self._setBuildStatus('preparing')
 
@@ -297,6 +330,7 @@ class BuildMaster(object):
 
 		skippedBuild = SkippedBuild(self.portsTreePath, port, reason)
 		self.skippedBuilds.append(skippedBuild)
+		self._journalBuild('buildSkipped', 'skipped', skippedBuild)
 		self._reportStatus()
 
 	def schedule(self, port, missingPackageIDs, presentDependencyPackages):
@@ -316,8 +350,13 @@ class BuildMaster(object):
 
 		if scheduledBuild.buildable:
 			self.scheduledBuilds.append(scheduledBuild)
+			self._journalBuild('buildScheduled', 'scheduled', scheduledBuild)
 		else:
-			self.blockedBuilds.append(scheduledBuild)
+			self.blockedBuilds[scheduledBuild] = None
+			for packageID in scheduledBuild.missingPackageIDs:
+				self._buildsWaitingFor.setdefault(packageID, []).append(
+					scheduledBuild)
+			self._journalBuild('buildScheduled', 'blocked', scheduledBuild)
 
 		self._setBuildStatus('scheduling')
 
@@ -329,14 +368,15 @@ class BuildMaster(object):
 
 		try:
 			self._ensureConsistentSchedule()
+			builds = self.scheduledBuilds + list(self.blockedBuilds)
+			self.expectedDurations = self._expectedBuildDurations(builds)
+			if self.expectedDurations:
+				self.defaultDuration = median(self.expectedDurations.values())
+			self.schedulingPolicy.prepare(builds, self.expectedDurations)
 			self.totalBuildCount = len(self.scheduledBuilds) + len(self.blockedBuilds)
 			self.startTime = time.time()
 			self._setBuildStatus('starting builds')
-			while True:
-				self._runBuilds()
-				self._waitForBuildsToComplete()
-				if len(self.scheduledBuilds) == 0:
-					break
+			self._runBuilds()
 
 			failures = len(self.failedBuilds) + len(self.lostBuilds)
 			if failures > 0:
@@ -351,7 +391,16 @@ class BuildMaster(object):
 
 		self.logger.info('finished with status: ' + exitStatus)
 		self.endTime = time.time()
-		self._setBuildStatus(exitStatus)
+		self._setBuildStatus(exitStatus, True)
+		self._closeReporting()
+
+	def _closeReporting(self):
+		"""Waits for the last status report and closes the status journal,
+		   nothing may be reported afterwards"""
+
+		if self.reporter:
+			self.reporter.close()
+		self.journal.close()
 
 	def _fillPortsTreeInfo(self):
 		try:
@@ -369,31 +418,99 @@ class BuildMaster(object):
 		self.portsTreeHead = head[:-1]
 
 	def _runBuilds(self):
-		while True:
-			buildToRun = None
-			with self.buildableCondition:
-				if len(self.scheduledBuilds) > 0:
-					buildToRun = self.scheduledBuilds.pop(0)
-					self.activeBuilds.append(buildToRun)
-				elif len(self.blockedBuilds) > 0:
+		"""Dispatches the buildable builds to the available builders until
+		   there is nothing left to build.
+
+		   This is the only thread that changes the build and builder lists.
+		   The builds run in a pool of worker threads, which report their
+		   completion as events through the buildEvents queue, so a build is
+		   dispatched as soon as it becomes buildable and a builder is
+		   available."""
+
+		executor = ThreadPoolExecutor(max_workers=len(self.activeBuilders),
+			thread_name_prefix='build')
+		runningBuilds = 0
+		try:
+			while True:
+				while self.scheduledBuilds and self.availableBuilders:
+					self._startBuild(executor,
+						self.schedulingPolicy.selectBuild(self.scheduledBuilds))
+					runningBuilds += 1
+
+				if self.scheduledBuilds and not self.activeBuilders:
+					self._setBuildStatus('all builders lost', True)
+					self._closeReporting()
+					sysExit('all builders lost')
+
+				if runningBuilds == 0:
+					if self.blockedBuilds:
+						self.logger.error('nothing running, but '
+							+ str(len(self.blockedBuilds))
+							+ ' builds are still blocked')
+					break
+
+				if self.scheduledBuilds:
+					self._setBuildStatus('waiting for available builders')
+				elif self.blockedBuilds:
 					if self.buildStatus != 'waiting for packages':
-						self.logger.info('nothing buildable, waiting for packages')
+						self.logger.info(
+							'nothing buildable, waiting for packages')
 					self._setBuildStatus('waiting for packages')
-					self.buildableCondition.wait(1)
-					continue
 				else:
-					break
+					self._setBuildStatus('waiting for workers '
+						+ ','.join(builder.name for builder
+							in self.activeBuilders
+							if builder not in self.availableBuilders)
+						+ ' to complete')
 
-			self._runBuild(buildToRun)
+				try:
+					event = self.buildEvents.get(
+						timeout=self._pendingStatusReportDelay())
+				except queue.Empty:
+					self._reportStatus()
+					continue
 
-	def _waitForBuildsToComplete(self):
-		while True:
-			with self.builderCondition:
-				if len(self.availableBuilders) == len(self.activeBuilders):
-					break
-				worker_names = list(map(lambda x: x.name, self.activeBuilders))
-				self._setBuildStatus('waiting for workers ' + ','.join(worker_names) + ' to complete')
-				self.builderCondition.wait(1)
+				self._buildFinished(*event)
+				runningBuilds -= 1
+		finally:
+			# builds that are running when aborting are left to finish
+			executor.shutdown(wait=False, cancel_futures=True)
+
+	def _expectedBuildDurations(self, builds):
+		"""Returns the predicted durations of the given builds by port name,
+		   leaving out the ports that have never been built successfully"""
+
+		durations = {}
+		for build in builds:
+			duration = self.history.predictDuration(build.port.name,
+				build.port.version)
+			if duration is not None:
+				durations[build.port.name] = duration
+		return durations
+
+	def _estimates(self, now):
+		"""Returns the expected remaining build time of the buildrun, based
+		   on the predicted durations of the builds that aren't done yet"""
+
+		if not self.expectedDurations:
+			return None
+
+		def expectedDuration(build):
+			return self.expectedDurations.get(build.port.name,
+				self.defaultDuration)
+
+		remainingBuildTime = sum(expectedDuration(build) for build
+			in self.scheduledBuilds + list(self.blockedBuilds))
+		for build in self.activeBuilds:
+			elapsed = now - self.buildStartTimes.get(build, now)
+			remainingBuildTime += max(0, expectedDuration(build) - elapsed)
+
+		remainingTime = remainingBuildTime / max(1, len(self.activeBuilders))
+		return {
+			'remainingBuildTime': remainingBuildTime,
+			'remainingTime': remainingTime,
+			'endTime': now + remainingTime
+		}
 
 	def _getBuildNumber(self):
 		buildNumber = self.buildNumber
@@ -401,87 +518,142 @@ class BuildMaster(object):
 		self._persistBuildNumber()
 		return buildNumber
 
-	def _runBuild(self, scheduledBuild):
-		while True:
-			builder = None
-			buildNumber = -1
-			with self.builderCondition:
-				if len(self.activeBuilders) == 0:
-					self._setBuildStatus('all builders lost')
-					sysExit('all builders lost')
+	def _startBuild(self, executor, scheduledBuild):
+		builder = self._selectBuilder(scheduledBuild)
+		self.availableBuilders.remove(builder)
+		self.scheduledBuilds.remove(scheduledBuild)
+		self.activeBuilds.append(scheduledBuild)
+		buildNumber = self._getBuildNumber()
 
-				if len(self.availableBuilders) == 0:
-					self._setBuildStatus('waiting for available builders')
-					self.builderCondition.wait(1)
-					continue
+		self.logger.info('starting build ' + str(buildNumber) + ', '
+			+ scheduledBuild.port.versionedName + ' on builder '
+			+ builder.name)
 
-				builder = self.availableBuilders.pop(0)
-				buildNumber = self._getBuildNumber()
+		scheduledBuild.buildNumbers.append(buildNumber)
 
-			threading.Thread(None, self._buildThread,
-				'build ' + str(buildNumber),
-				(builder, scheduledBuild, buildNumber)).start()
-			break
+		builder.setBuild(scheduledBuild, buildNumber)
+		self._journalBuild('buildStarted', 'active', scheduledBuild)
+		self._journalBuilder(builder, 'active')
+		self._reportStatus()
+		self._prefetchNextBuild(builder)
+		startTime = time.time()
+		self.buildStartTimes[scheduledBuild] = startTime
+
+		future = executor.submit(builder.runBuild)
+		future.add_done_callback(lambda future: self.buildEvents.put(
+			(builder, scheduledBuild, buildNumber, startTime, future)))
+
+	def _selectBuilder(self, scheduledBuild):
+		"""Returns the available builder that needs the fewest bytes of the
+		   required packages uploaded to run the given build. Of several
+		   equally good ones, the one waiting longest is used."""
+
+		uploadSizes = [self._packagesSize(
+				builder.missingPackages(scheduledBuild.requiredPackages))
+			for builder in self.availableBuilders]
+		index = uploadSizes.index(min(uploadSizes))
+		builder = self.availableBuilders[index]
+
+		self.uploadedBytes += uploadSizes[index]
+		self.cachedBytes += self._packagesSize(
+			scheduledBuild.requiredPackages) - uploadSizes[index]
+		self.affinitySavedBytes += uploadSizes[0] - uploadSizes[index]
+		if index != 0:
+			self.logger.info('using builder ' + builder.name + ' for '
+				+ scheduledBuild.port.versionedName + ', saving '
+				+ str(uploadSizes[0] - uploadSizes[index])
+				+ ' bytes of uploads')
+		return builder
+
+	def _prefetchNextBuild(self, builder):
+		"""Lets the builder upload the packages required by the build it is
+		   most likely to run next, while it is busy with the current one.
+		   That is the build the scheduling policy picks after the ones the
+		   idle builders will take."""
+
+		skip = len(self.availableBuilders)
+		candidates = list(self.scheduledBuilds)
+		nextBuild = None
+		while candidates and skip >= 0:
+			nextBuild = self.schedulingPolicy.selectBuild(candidates)
+			candidates.remove(nextBuild)
+			skip -= 1
+
+		if nextBuild is not None and skip < 0:
+			builder.prefetchPackages(nextBuild.requiredPackages)
+
+	def _packagesSize(self, packagePaths):
+		size = 0
+		for packagePath in packagePaths:
+			if packagePath not in self._packageSizes:
+				try:
+					self._packageSizes[packagePath] \
+						= os.path.getsize(packagePath)
+				except OSError:
+					self._packageSizes[packagePath] = 0
+			size += self._packageSizes[packagePath]
+		return size
 
 	def _persistBuildNumber(self):
 		with open(self.buildNumberFile, 'w') as buildNumberFile:
 			buildNumberFile.write(str(self.buildNumber))
 
 	def _packagesCompleted(self, packages, available):
-		completePackages = [] + packages
-		with self.buildableCondition:
-			notify = False
-
-			while len(completePackages) > 0:
-				package = completePackages.pop(0)
-				self.logger.info('package ' + package.versionedName + ' '
-					+ ('became available' if available else 'lost'))
-
-				stillBlockedBuilds = []
-				for blockedBuild in self.blockedBuilds:
-					blockedBuild.packageCompleted(package, available)
-					if blockedBuild.buildable or blockedBuild.lost:
-						notify = True
-						self.logger.info('scheduled build '
-							+ blockedBuild.port.versionedName + ' '
-							+ ('became buildable' if available else 'lost'))
-
-						if blockedBuild.buildable:
-							self.scheduledBuilds.append(blockedBuild)
-						else:
-							# the build was lost, propagate lost packages
-							self.lostBuilds.append(blockedBuild)
-							completePackages += blockedBuild.port.packages
-					else:
-						stillBlockedBuilds.append(blockedBuild)
-
-				self.blockedBuilds = stillBlockedBuilds
+		completePackages = deque(packages)
+		while len(completePackages) > 0:
+			package = completePackages.popleft()
+			self.logger.info('package ' + package.versionedName + ' '
+				+ ('became available' if available else 'lost'))
+
+			# only the builds waiting for the package are affected, in the
+			# order they were scheduled
+			for blockedBuild in self._buildsWaitingFor.pop(
+					package.versionedName, []):
+				if blockedBuild not in self.blockedBuilds:
+					continue
 
-			if notify:
-				self.buildableCondition.notify()
+				blockedBuild.packageCompleted(package, available)
+				if blockedBuild.buildable or blockedBuild.lost:
+					self.logger.info('scheduled build '
+						+ blockedBuild.port.versionedName + ' '
+						+ ('became buildable' if available else 'lost'))
+
+					del self.blockedBuilds[blockedBuild]
+					if blockedBuild.buildable:
+						self.scheduledBuilds.append(blockedBuild)
+						self._journalBuild('buildBuildable', 'scheduled',
+							blockedBuild)
+					else:
+						# the build was lost, propagate lost packages
+						self.lostBuilds.append(blockedBuild)
+						self._journalBuild('buildLost', 'lost', blockedBuild)
+						completePackages += blockedBuild.port.packages
+				else:
+					# still blocked, but waiting for fewer packages
+					self._buildChanged(blockedBuild, 'blocked')
 
 	def _buildComplete(self, scheduledBuild, buildSuccess, listToUse):
-		with self.buildableCondition:
-			if scheduledBuild in self.activeBuilds:
-				self.activeBuilds.remove(scheduledBuild)
-			listToUse.append(scheduledBuild)
+		if scheduledBuild in self.activeBuilds:
+			self.activeBuilds.remove(scheduledBuild)
+		listToUse.append(scheduledBuild)
 
 		self._packagesCompleted(scheduledBuild.port.packages, buildSuccess)
 
-	def _buildThread(self, builder, scheduledBuild, buildNumber):
-		self.logger.info('starting build ' + str(buildNumber) + ', '
-			+ scheduledBuild.port.versionedName + ' on builder '
-			+ builder.name)
-
-		scheduledBuild.buildNumbers.append(buildNumber)
-
-		builder.setBuild(scheduledBuild, buildNumber)
-		self._reportStatus()
-		startTime = time.time()
-
-		(buildSuccess, reschedule) = builder.runBuild()
+	def _buildFinished(self, builder, scheduledBuild, buildNumber, startTime,
+			future):
+		try:
+			(buildSuccess, reschedule) = future.result()
+		except Exception as exception:
+			# Unlike the failures a builder reports, an unexpected exception
+			# is likely to repeat: fail the build instead of rescheduling it
+			# endlessly and stop using the builder, its state is unknown.
+			self.logger.error('build ' + str(buildNumber) + ' on builder '
+				+ builder.name + ' raised: ' + str(exception))
+			(buildSuccess, reschedule) = (False, False)
+			builder.state = BuilderState.LOST
 
 		builder.unsetBuild()
+		del self.buildStartTimes[scheduledBuild]
 
 		self.logger.info('build ' + str(buildNumber) + ', '
 			+ scheduledBuild.port.versionedName + ' '
@@ -489,10 +661,9 @@ class BuildMaster(object):
 
 		if not buildSuccess and reschedule:
 			self.logger.info('transient error, rescheduling build')
-			with self.buildableCondition:
-				self.activeBuilds.remove(scheduledBuild)
-				self.scheduledBuilds.append(scheduledBuild)
-				self.buildableCondition.notify()
+			self.activeBuilds.remove(scheduledBuild)
+			self.scheduledBuilds.append(scheduledBuild)
+			self._journalBuild('buildRescheduled', 'scheduled', scheduledBuild)
 		else:
 			record = BuildRecord(scheduledBuild, startTime, buildSuccess,
 				builder.name)
@@ -501,32 +672,35 @@ class BuildMaster(object):
 					str(buildNumber) + '.json'), 'w') as outputFile:
 				outputFile.write(json.dumps(record.status))
 
+			self.history.addRecord(buildNumber, record.status)
 			self.buildHistory.append(record)
+			if buildSuccess:
+				self._journalBuild('buildCompleted', 'complete', scheduledBuild)
+			else:
+				self._journalBuild('buildFailed', 'failed', scheduledBuild)
 			self._buildComplete(scheduledBuild, buildSuccess,
 				self.completeBuilds if buildSuccess else self.failedBuilds)
 
-		with self.builderCondition:
-			if builder.state == BuilderState.LOST:
-				self.logger.error('builder ' + builder.name + ' lost')
-				self.activeBuilders.remove(builder)
-				self.lostBuilders.append(builder)
-			else:
-				if builder.state == BuilderState.RECONNECT:
-					self.logger.error(
-						'builder ' + builder.name + ' is reconnecting')
-
-				self.availableBuilders.append(builder)
+		if builder.state == BuilderState.LOST:
+			self.logger.error('builder ' + builder.name + ' lost')
+			self.activeBuilders.remove(builder)
+			self.lostBuilders.append(builder)
+			self._journalBuilder(builder, 'lost')
+		else:
+			if builder.state == BuilderState.RECONNECT:
+				self.logger.error(
+					'builder ' + builder.name + ' is reconnecting')
 
-			self.builderCondition.notify()
+			self.availableBuilders.append(builder)
+			self._journalBuilder(builder, 'idle')
 
 		self._reportStatus()
 
 	def _ensureConsistentSchedule(self):
-		buildingPackagesIDs = []
-		for scheduledBuild in self.scheduledBuilds + self.blockedBuilds:
+		buildingPackagesIDs = set()
+		for scheduledBuild in self.scheduledBuilds + list(self.blockedBuilds):
 			for package in scheduledBuild.port.packages:
-				if package.versionedName not in buildingPackagesIDs:
-					buildingPackagesIDs.append(package.versionedName)
+				buildingPackagesIDs.add(package.versionedName)
 
 		brokenBuilds = []
 		for blockedBuild in self.blockedBuilds:
@@ -540,10 +714,10 @@ class BuildMaster(object):
 
 		for brokenBuild in brokenBuilds:
 			self._buildComplete(brokenBuild, False, self.lostBuilds)
+			self._journalBuild('buildLost', 'lost', brokenBuild)
 
 		for lostBuild in self.lostBuilds:
-			if lostBuild in self.blockedBuilds:
-				self.blockedBuilds.remove(lostBuild)
+			self.blockedBuilds.pop(lostBuild, None)
 
 	@property
 	def status(self):
@@ -569,7 +743,8 @@ class BuildMaster(object):
 			'portsTreeHead': self.portsTreeHead,
 			'buildStatus': self.buildStatus,
 			'startTime': self.startTime,
-			'endTime': self.endTime
+			'endTime': self.endTime,
+			'estimates': self._estimates(time.time())
 		}
 
 	@property
@@ -602,6 +777,12 @@ class BuildMaster(object):
 				'lost': len(self.lostBuilders),
 				'total': len(self.activeBuilders) + len(self.lostBuilders)
 			},
+			'packageTransfers': {
+				'uploadedBytes': self.uploadedBytes,
+				'cachedBytes': self.cachedBytes,
+				'affinitySavedBytes': self.affinitySavedBytes
+			},
+			'estimates': self._estimates(now),
 			'duration': (now - self.startTime) if self.startTime else None,
 			'pkg_hour': int(pkgCount * 3600
 				/ (now - self.startTime)) if self.startTime else None,
@@ -609,14 +790,70 @@ class BuildMaster(object):
 				/ (now - impulseTime)) if impulsePkgCount else None
 		}
 
-	def _setBuildStatus(self, buildStatus):
+	def _setBuildStatus(self, buildStatus, force=False):
 		if buildStatus != self.buildStatus:
 			important('Update: ' + buildStatus)
 			self.buildStatus = buildStatus
-		self._reportStatus()
-
-	def _reportStatus(self):
-		if not self.reporter:
+			self.journal.append('buildrunStatus', buildStatus=buildStatus,
+				startTime=self.startTime, endTime=self.endTime)
+		elif not force:
 			return
-		with self.statusLock:
-			self.reporter.updateBuildrun(self.buildNumber, self.status)
+		self._reportStatus(force)
+
+	def _journalBuild(self, eventType, listName, build):
+		self.journal.append(eventType, list=listName, build=build.status)
+		self._buildChanged(build, listName)
+
+	def _buildChanged(self, build, listName):
+		"""Remembers the build, now in the given list, as changed for the
+		   next status report"""
+
+		# keep the builds in the order of their last change
+		self._changedBuilds.pop(build, None)
+		self._changedBuilds[build] = listName
+
+	def _journalBuilder(self, builder, listName):
+		# only what changes with the state of the builder, the rest of its
+		# status (like the packages cached on it) is left to the snapshots
+		self.journal.append('builderState', list=listName,
+			builder={key: value for key, value in builder.status.items()
+				if key in ('name', 'state', 'currentBuild')})
+
+	def _reportStatus(self, force=False):
+		"""Hands a snapshot of the status to the reporter. Unless forced,
+		   this happens at most once per statusReportInterval, a change
+		   within the interval is reported when it has passed. The status
+		   journal is flushed along with it."""
+
+		now = time.monotonic()
+		if not force and now < self._nextStatusReport:
+			self._statusReportPending = True
+			return
+
+		self._statusReportPending = False
+		self._nextStatusReport = now + self.statusReportInterval
+
+		status = self.status
+		if force or self.journal.snapshotDue:
+			self.journal.writeSnapshot(status)
+		else:
+			self.journal.flush()
+
+		changedBuilds = {}
+		for build, listName in self._changedBuilds.items():
+			buildStatus = build.status
+			changedBuilds[buildStatus['port']['revisionedName']] \
+				= (listName, buildStatus)
+		self._changedBuilds = {}
+
+		if self.reporter:
+			self.reporter.updateBuildrun(self.buildrunNumber, status,
+				changedBuilds)
+
+	def _pendingStatusReportDelay(self):
+		"""Returns the time until a pending status report is due, or None
+		   if there is none"""
+
+		if not self._statusReportPending:
+			return None
+		return max(0, self._nextStatusReport - time.monotonic())
@@ -10,11 +10,13 @@ import os
 import stat
 import time
 
+from ..ChunkedLog import ChunkedLogHandler
 from .Builder import BuilderState
 
 
 class LocalBuilder(object):
-	def __init__(self, name, packageRepository, outputBaseDir, options):
+	def __init__(self, name, packageRepository, outputBaseDir, options,
+			logRouter):
 		self.type = "LocalBuilder"
 		self.options = options
 		self.name = name
@@ -23,6 +25,7 @@ class LocalBuilder(object):
 		self.packageRepository = packageRepository
 		self.state = BuilderState.AVAILABLE
 		self.currentBuild = None
+		self.logRouter = logRouter
 
 		self.buildOutputDir = os.path.join(outputBaseDir, 'builds')
 		if not os.path.isdir(self.buildOutputDir):
@@ -32,26 +35,19 @@ class LocalBuilder(object):
 		self.buildLogger.setLevel(logging.DEBUG)
 
 	def setBuild(self, scheduledBuild, buildNumber):
-		logHandler = logging.FileHandler(os.path.join(self.buildOutputDir,
+		logHandler = ChunkedLogHandler(os.path.join(self.buildOutputDir,
 				str(buildNumber) + '.log'))
 		logHandler.setFormatter(logging.Formatter('%(message)s'))
 		self.buildLogger.addHandler(logHandler)
-		filter = ThreadFilter()
-		logHandler.addFilter(filter)
-		logging.getLogger("buildLogger").setLevel(logging.DEBUG)
-		logging.getLogger("buildLogger").addHandler(logHandler)
 
 		self.currentBuild = {
 			'build': scheduledBuild,
 			'status': scheduledBuild.status,
 			'number': buildNumber,
 			'logHandler': logHandler,
-			'logFilter': filter,
 			'startTime': None,
-			'phase': 'setup',
-			'lines': 0
+			'phase': 'setup'
 		}
-		filter.setBuild(self.currentBuild)
 
 	@property
 	def status(self):
@@ -64,11 +60,20 @@ class LocalBuilder(object):
 			} if self.currentBuild else None
 		}
 
+	def missingPackages(self, packagePaths):
+		# the packages are used in place, nothing needs to be transferred
+		return []
+
+	def prefetchPackages(self, packagePaths):
+		pass
+
 	def unsetBuild(self):
 		self.buildLogger.removeHandler(self.currentBuild['logHandler'])
-		logging.getLogger("buildLogger").removeHandler(
-			self.currentBuild['logHandler'])
+		self.logRouter.removeThreadHandler(self.currentBuild['logHandler'])
+		self.currentBuild['logHandler'].close()
 		self.currentBuild = None
 
 	def runBuild(self):
 		scheduledBuild = self.currentBuild['build']
+		# the build runs in this thread, route what it logs to the build log
+		self.logRouter.setThreadHandler(self.currentBuild['logHandler'])
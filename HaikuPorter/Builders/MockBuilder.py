@@ -26,6 +26,12 @@ class MockBuilder(object):
 			'number': buildNumber
 		}
 
+	def missingPackages(self, packagePaths):
+		return []
+
+	def prefetchPackages(self, packagePaths):
+		pass
+
 	def unsetBuild(self):
 		self.currentBuild = None
 
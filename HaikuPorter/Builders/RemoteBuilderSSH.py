@@ -5,6 +5,7 @@
 # Distributed under the terms of the MIT License.
 
 import base64
+import codecs
 import errno
 import io
 import json
@@ -12,9 +13,12 @@ import logging
 import os
 import socket
 import stat
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # These usages kinda need refactored
+from ..ChunkedLog import ChunkedLogHandler
 from ..ConfigParser import ConfigParser
 from ..Configuration import Configuration
 from ..Options import getOption
@@ -26,12 +30,19 @@ except ImportError:
 	paramiko = None
 
 class RemoteBuilderSSH(object):
+	# the maximum size of the blocks of command output written to the log
+	outputBlockSize = 64 * 1024
+
+	# the maximum length of the remote command lines built from lists of
+	# packages, well below the argument size limit of the builders
+	maxCommandLength = 32 * 1024
+
 	def __init__(self, configFilePath, packageRepository, outputBaseDir,
 			portsTreeOriginURL, portsTreeHead):
 		self._loadConfig(configFilePath)
 		self.type = "RemoteBuilderSSH"
 		self.availablePackages = []
-		self.visiblePackages = []
+		self.visiblePackages = set()
 		self.portsTreeOriginURL = portsTreeOriginURL
 		self.portsTreeHead = portsTreeHead
 		self.packageRepository = packageRepository
@@ -39,6 +50,20 @@ class RemoteBuilderSSH(object):
 		self.sshClient = None
 		self.jumpClient = None
 
+		# uploads to the package cache run in parallel, each upload thread
+		# with its own SFTP channel on the ssh transport
+		self._uploadExecutor = ThreadPoolExecutor(
+			max_workers=int(self.config['ssh']['uploadChannels']),
+			thread_name_prefix='upload ' + self.name)
+		self._uploadThreadState = threading.local()
+		self._uploadLock = threading.Lock()
+		self._pendingUploads = {}
+
+		# packages to prefetch once the uploads of the current build have
+		# been started, so that they don't queue up in front of them
+		self._buildUploadsPending = False
+		self._deferredPrefetch = None
+
 		if not paramiko:
 			raise Exception('paramiko unavailable')
 
@@ -87,6 +112,8 @@ class RemoteBuilderSSH(object):
 				raise Exception('missing ssh ' + x + ' for builder ' + self.name)
 		if 'port' not in self.config['ssh']:
 			self.config['ssh']['port'] = 22
+		if 'uploadChannels' not in self.config['ssh']:
+			self.config['ssh']['uploadChannels'] = 4
 
 		# Set path to our trusted known hosts
 		self.config['ssh']['knownHostsFile'] = os.path.join(os.path.dirname(configFilePath),
@@ -250,13 +277,20 @@ class RemoteBuilderSSH(object):
 		try:
 			self._clearVisiblePackages()
 
-			for entry in self._listDir(
-					self.config['portstree']['packagesCachePath']):
+			cachePath = self.config['portstree']['packagesCachePath']
+			for entry in self._listDir(cachePath):
+				if entry.endswith('.hpkg.upload'):
+					self.logger.info('removing partial upload ' + entry
+						+ ' from cache')
+					self.sftpClient.remove(cachePath + '/' + entry)
+					continue
+
 				if not entry.endswith('.hpkg'):
 					continue
 
-				if entry not in self.availablePackages:
-					self.availablePackages.append(entry)
+				with self._uploadLock:
+					if entry not in self.availablePackages:
+						self.availablePackages.append(entry)
 		except Exception as exception:
 			self.logger.error('failed to get available packages: '
 				+ str(exception))
@@ -277,7 +311,8 @@ class RemoteBuilderSSH(object):
 				'removing obsolete package {} from cache'.format(entry))
 			entryPath = cachePath + '/' + entry
 			self.sftpClient.remove(entryPath)
-			self.availablePackages.remove(entry)
+			with self._uploadLock:
+				self.availablePackages.remove(entry)
 
 	def _setupForBuilding(self):
 		if self.state == BuilderState.AVAILABLE:
@@ -296,9 +331,17 @@ class RemoteBuilderSSH(object):
 		self.state = BuilderState.AVAILABLE
 		return True
 
+	def missingPackages(self, packagePaths):
+		"""Returns those of the given packages that are not in the package
+		   cache of the builder, i.e. that would have to be uploaded"""
+
+		availablePackages = set(self.availablePackages)
+		return [packagePath for packagePath in packagePaths
+			if os.path.basename(packagePath) not in availablePackages]
+
 	def setBuild(self, scheduledBuild, buildNumber):
-		logHandler = logging.FileHandler(os.path.join(self.buildOutputDir,
-				str(buildNumber) + '.log'), encoding='utf-8')
+		logHandler = ChunkedLogHandler(os.path.join(self.buildOutputDir,
+				str(buildNumber) + '.log'))
 		logHandler.setFormatter(logging.Formatter('%(message)s'))
 		self.buildLogger.addHandler(logHandler)
 
@@ -309,10 +352,18 @@ class RemoteBuilderSSH(object):
 			'logHandler': logHandler
 		}
 
+		with self._uploadLock:
+			self._buildUploadsPending = True
+
 	def unsetBuild(self):
 		self.buildLogger.removeHandler(self.currentBuild['logHandler'])
+		self.currentBuild['logHandler'].close()
 		self.currentBuild = None
 
+		with self._uploadLock:
+			self._buildUploadsPending = False
+			self._deferredPrefetch = None
+
 	def runBuild(self):
 		scheduledBuild = self.currentBuild['build']
 		buildSuccess = False
@@ -323,10 +374,9 @@ class RemoteBuilderSSH(object):
 				return (False, True)
 
 			self._purgePort(scheduledBuild)
-			self._clearVisiblePackages()
-			for requiredPackage in scheduledBuild.requiredPackages:
-				self._makePackageAvailable(requiredPackage)
-				self._makePackageVisible(requiredPackage)
+			self._makePackagesAvailable(scheduledBuild.requiredPackages)
+			self._startDeferredPrefetch()
+			self._setVisiblePackages(scheduledBuild.requiredPackages)
 
 			self.buildLogger.info('building port '
 				+ scheduledBuild.port.versionedName)
@@ -348,12 +398,10 @@ class RemoteBuilderSSH(object):
 				+ scheduledBuild.port.versionedName + '"')
 
 			self.buildLogger.info('running command: ' + command)
-			self.buildLogger.propagate = False
 
 			(output, channel) = self._remoteCommand(command)
 			self._appendOutputToLog(output)
 
-			self.buildLogger.propagate = True
 			exitStatus = channel.recv_exit_status()
 			self.buildLogger.info('command exit status: ' + str(exitStatus))
 
@@ -364,7 +412,7 @@ class RemoteBuilderSSH(object):
 			if exitStatus != 0:
 				reschedule = False
 				self._purgePort(scheduledBuild)
-				self._clearVisiblePackages()
+				self._collectBuiltPackages()
 				raise Exception('build failure')
 
 			for package in scheduledBuild.port.packages:
@@ -378,7 +426,7 @@ class RemoteBuilderSSH(object):
 						remoteFile)
 
 			self._purgePort(scheduledBuild)
-			self._clearVisiblePackages()
+			self._collectBuiltPackages()
 			self.buildLogger.info('build completed successfully')
 			buildSuccess = True
 			reschedule = False
@@ -425,9 +473,6 @@ class RemoteBuilderSSH(object):
 		channel.exec_command(command)
 		return (output, channel)
 
-	def _symlink(self, sourcePath, destPath):
-		self.sftpClient.symlink(sourcePath, destPath)
-
 	def _move(self, sourcePath, destPath):
 		self.sftpClient.posix_rename(sourcePath, destPath)
 
@@ -460,32 +505,119 @@ class RemoteBuilderSSH(object):
 		self._appendOutputToLog(output)
 
 	def _appendOutputToLog(self, output):
+		"""Writes the output of the remote command directly to the build log,
+		   in blocks as they arrive instead of line by line through the
+		   logger"""
+
+		log = self.currentBuild['logHandler'].log
+		decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
 		with output:
+			# nothing has been read through the file, so its buffer is empty
+			# and the channel can be read directly, which unlike the file
+			# returns whatever has arrived without waiting for more
 			while True:
-				line = output.readline()
-				if not line:
-					return
+				data = output.channel.recv(self.outputBlockSize)
+				if not data:
+					break
 
-				self.buildLogger.info(
-					line[:-1].decode('utf-8', errors='replace'))
+				log.write(decoder.decode(data))
 
-	def _makePackageAvailable(self, packagePath):
-		packageName = os.path.basename(packagePath)
-		if packageName in self.availablePackages:
+		log.write(decoder.decode(b'', True))
+
+	def prefetchPackages(self, packagePaths):
+		"""Starts uploading those of the given packages to the builder cache
+		   that aren't there yet, without waiting for the uploads. While a
+		   build is set whose own uploads haven't been started yet, that is
+		   deferred until they have been, so the build doesn't wait for the
+		   prefetch."""
+
+		if self.state != BuilderState.AVAILABLE:
 			return
 
-		self.logger.info('upload package ' + packageName + ' to builder cache')
+		with self._uploadLock:
+			if self._buildUploadsPending:
+				self._deferredPrefetch = packagePaths
+				return
+
+		for packagePath in packagePaths:
+			self._startUpload(packagePath)
+
+	def _startDeferredPrefetch(self):
+		with self._uploadLock:
+			self._buildUploadsPending = False
+			packagePaths = self._deferredPrefetch
+			self._deferredPrefetch = None
+
+		if packagePaths:
+			self.prefetchPackages(packagePaths)
+
+	def _makePackagesAvailable(self, packagePaths):
+		uploads = [self._startUpload(packagePath)
+			for packagePath in packagePaths]
+		for upload in uploads:
+			if upload is not None:
+				upload.result()
+
+	def _startUpload(self, packagePath):
+		"""Returns the future of the upload of the given package to the
+		   builder cache, or None if the package is already there"""
 
+		packageName = os.path.basename(packagePath)
+		with self._uploadLock:
+			if packageName in self.availablePackages:
+				return None
+
+			upload = self._pendingUploads.get(packageName)
+			if upload is None:
+				self.logger.info('upload package ' + packageName
+					+ ' to builder cache')
+				upload = self._uploadExecutor.submit(self._uploadPackage,
+					packagePath)
+				self._pendingUploads[packageName] = upload
+			return upload
+
+	def _uploadPackage(self, packagePath):
+		packageName = os.path.basename(packagePath)
 		entryPath \
 			= self.config['portstree']['packagesCachePath'] + '/' + packageName
 		uploadPath = entryPath + '.upload'
 
-		with self.sftpClient.file(uploadPath, 'w') as remoteFile:
-			self.packageRepository.readPackage(packagePath, remoteFile)
+		try:
+			sftpClient = self._uploadClient()
+			try:
+				# the package only appears in the cache once it is complete
+				with sftpClient.file(uploadPath, 'w') as remoteFile:
+					remoteFile.set_pipelined(True)
+					self.packageRepository.readPackage(packagePath, remoteFile)
+				sftpClient.posix_rename(uploadPath, entryPath)
+			except Exception:
+				try:
+					sftpClient.remove(uploadPath)
+				except Exception:
+					pass
+				raise
+		except Exception as exception:
+			self.logger.error('failed to upload package ' + packageName
+				+ ': ' + str(exception))
+			with self._uploadLock:
+				del self._pendingUploads[packageName]
+			raise
+
+		with self._uploadLock:
+			self.availablePackages.append(packageName)
+			del self._pendingUploads[packageName]
 
-		self._move(uploadPath, entryPath)
+	def _uploadClient(self):
+		"""Returns the SFTP client of the current upload thread, opening a
+		   new channel if there is none on the current connection"""
 
-		self.availablePackages.append(packageName)
+		transport = self.sshClient.get_transport()
+		sftpClient = getattr(self._uploadThreadState, 'sftpClient', None)
+		if (sftpClient is None
+				or sftpClient.get_channel().get_transport() is not transport):
+			sftpClient = paramiko.SFTPClient.from_transport(transport)
+			self._uploadThreadState.sftpClient = sftpClient
+		return sftpClient
 
 	def _clearVisiblePackages(self):
 		basePath = self.config['portstree']['packagesPath']
@@ -503,28 +635,115 @@ class RemoteBuilderSSH(object):
 				self.logger.info('moving real package ' + entry + ' to builder cache')
 				cacheEntryPath = cachePath + '/' + entry
 				self._move(entryPath, cacheEntryPath)
-				self.availablePackages.append(entry)
+				with self._uploadLock:
+					self.availablePackages.append(entry)
 
-		self.visiblePackages = []
+		self.visiblePackages = set()
 
-	def _makePackageVisible(self, packagePath):
-		packageName = os.path.basename(packagePath)
-		if packageName in self.visiblePackages:
+	def _setVisiblePackages(self, packagePaths):
+		"""Makes exactly the given packages visible from the builder cache.
+		   Only the symlinks that differ from the currently visible packages
+		   are added or removed, in as few remote commands as the length
+		   limit of their command lines allows."""
+
+		basePath = self.config['portstree']['packagesPath']
+		cachePath = self.config['portstree']['packagesCachePath']
+
+		packageNames = set(os.path.basename(packagePath)
+			for packagePath in packagePaths)
+		removals = sorted(self.visiblePackages - packageNames)
+		additions = sorted(packageNames - self.visiblePackages)
+		if not removals and not additions:
 			return
 
-		self.logger.info('making package ' + packageName + ' visible from builder cache')
-		self._symlink(
-			self.config['portstree']['packagesCachePath'] + '/' + packageName,
-			self.config['portstree']['packagesPath'] + '/' + packageName)
+		self.logger.info('making ' + str(len(additions)) + ' packages visible'
+			+ ' and hiding ' + str(len(removals)) + ' from builder cache')
+
+		changeDirectory = 'cd "' + basePath + '"'
+		maxPartLength = self.maxCommandLength - len(changeDirectory) - 4
+		parts = (self._commandParts('rm -f', ['"' + entry + '"'
+					for entry in removals], '', maxPartLength)
+			+ self._commandParts('ln -sf', ['"' + cachePath + '/' + entry
+					+ '"' for entry in additions], ' .', maxPartLength))
+
+		commands = []
+		command = changeDirectory
+		for part in parts:
+			if (command != changeDirectory and len(command) + 4 + len(part)
+					> self.maxCommandLength):
+				commands.append(command)
+				command = changeDirectory
+			command += ' && ' + part
+		commands.append(command)
+
+		for command in commands:
+			(output, channel) = self._remoteCommand(command)
+			with output:
+				output.read()
+			if channel.recv_exit_status() != 0:
+				# the visible packages are unknown now, the build is
+				# rescheduled and they are cleared when setting up the
+				# builder again
+				raise Exception('failed to update visible packages')
+
+		self.visiblePackages = packageNames
+
+	@staticmethod
+	def _commandParts(program, arguments, suffix, maxLength):
+		"""Splits the invocation of the program with the given arguments
+		   into invocations no longer than maxLength"""
+
+		parts = []
+		part = None
+		for argument in arguments:
+			if (part is not None
+					and len(part) + 1 + len(argument) + len(suffix)
+						> maxLength):
+				parts.append(part + suffix)
+				part = None
+			if part is None:
+				part = program
+			part += ' ' + argument
+		if part is not None:
+			parts.append(part + suffix)
+		return parts
+
+	def _collectBuiltPackages(self):
+		"""Moves the packages a build has created, i.e. the ones in the
+		   packages directory that aren't symlinks, into the builder cache"""
+
+		basePath = self.config['portstree']['packagesPath']
+		cachePath = self.config['portstree']['packagesCachePath']
 
-		self.visiblePackages.append(packageName)
+		command = ('cd "' + basePath + '" && for entry in *.hpkg; do'
+			+ ' if [ -f "$entry" ] && [ ! -L "$entry" ]; then'
+			+ ' mv -f "$entry" "' + cachePath + '/" || exit 1;'
+			+ ' echo "$entry"; fi;'
+			+ ' done')
+		(output, channel) = self._remoteCommand(command)
+		with output:
+			entries = output.read().decode('utf-8', errors='replace').split()
+		if channel.recv_exit_status() != 0:
+			raise Exception('failed to move built packages to builder cache')
+
+		for entry in entries:
+			self.logger.info('moved real package ' + entry
+				+ ' to builder cache')
+			with self._uploadLock:
+				if entry not in self.availablePackages:
+					self.availablePackages.append(entry)
 
 	@property
 	def status(self):
+		# the list is changed by the upload threads, the status is reported
+		# and compared later and must not change with it
+		with self._uploadLock:
+			availablePackages = list(self.availablePackages)
+
 		return {
 			'name': self.name,
 			'state': self.state,
-			'availablePackages': self.availablePackages,
+			'availablePackages': availablePackages,
 			'connectionErrors': self.connectionErrors,
 			'maxConnectionErrors': self.maxConnectionErrors,
 			'currentBuild': {
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021, Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+
+# -- Modules ------------------------------------------------------------------
+
+import gzip
+import json
+import logging
+import os
+import threading
+
+# -- ChunkedLog class ---------------------------------------------------------
+
+class ChunkedLog(object):
+	"""A log written in chunks of (at least) chunkSize bytes, which are
+	   compressed once they are complete, along with an index of the
+	   chunks. A reader can thus fetch the tail or any window of the log
+	   without fetching all of it.
+
+	   For a log with the path <path> these files are written:
+	   - <path>.gz: the complete chunks, each one as a separate gzip member,
+	     so the file as a whole is a valid gzip file of the log
+	   - <path>.<n>: the uncompressed chunk n that is still being written
+	   - <path>.index: a JSON object with the chunks in <path>.gz (as lists
+	     of compressed offset, compressed size, first line, line count and
+	     uncompressed size), the number of lines in them, the name of the
+	     current chunk file and whether the log is complete
+
+	   Chunks end at line boundaries. The index is replaced atomically and
+	   always refers to existing data."""
+
+	chunkSize = 1024 * 1024
+
+	def __init__(self, path):
+		self.path = path
+		self.compressedPath = path + '.gz'
+		self.indexPath = path + '.index'
+
+		self._lock = threading.Lock()
+		self._chunks = []
+		self._compressedSize = 0
+		self._lineCount = 0
+		self._chunkNumber = 0
+		self._chunkData = bytearray()
+		self._chunkLineCount = 0
+
+		open(self.compressedPath, 'wb').close()
+		self._chunkFile = open(self._chunkPath(self._chunkNumber), 'wb')
+		self._writeIndex()
+
+	def write(self, text):
+		data = text.encode('utf-8', errors='replace')
+		with self._lock:
+			if self._chunkFile is None:
+				return
+
+			self._chunkFile.write(data)
+			self._chunkFile.flush()
+			self._chunkData += data
+			self._chunkLineCount += data.count(b'\n')
+
+			if len(self._chunkData) >= self.chunkSize:
+				# end the chunk after its last complete line
+				end = self._chunkData.rfind(b'\n') + 1
+				if end > 0:
+					self._sealChunk(end, True)
+
+	def close(self):
+		"""Compresses what is left of the log and marks it complete"""
+
+		with self._lock:
+			if self._chunkFile is None:
+				return
+
+			if self._chunkData:
+				self._sealChunk(len(self._chunkData), False)
+			else:
+				self._chunkFile.close()
+				self._chunkFile = None
+				self._writeIndex()
+				os.remove(self._chunkPath(self._chunkNumber))
+
+	def _chunkPath(self, chunkNumber):
+		return self.path + '.' + str(chunkNumber)
+
+	def _sealChunk(self, end, startNext):
+		data = bytes(self._chunkData[:end])
+		remainder = self._chunkData[end:]
+
+		compressed = gzip.compress(data, mtime=0)
+		with open(self.compressedPath, 'ab') as compressedFile:
+			compressedFile.write(compressed)
+
+		# chunks end after the last line break, so the lines are all in here
+		self._chunks.append([self._compressedSize, len(compressed),
+			self._lineCount, self._chunkLineCount, len(data)])
+		self._compressedSize += len(compressed)
+		self._lineCount += self._chunkLineCount
+
+		self._chunkFile.close()
+		self._chunkFile = None
+		sealedChunkPath = self._chunkPath(self._chunkNumber)
+		self._chunkNumber += 1
+		self._chunkData = remainder
+		self._chunkLineCount = 0
+		if startNext:
+			self._chunkFile = open(self._chunkPath(self._chunkNumber), 'wb')
+			self._chunkFile.write(remainder)
+			self._chunkFile.flush()
+
+		# only remove the sealed chunk once the index doesn't refer to it
+		self._writeIndex()
+		os.remove(sealedChunkPath)
+
+	def _writeIndex(self):
+		index = {
+			'chunkSize': self.chunkSize,
+			'chunks': self._chunks,
+			'lineCount': self._lineCount,
+			'openChunk': os.path.basename(self._chunkPath(self._chunkNumber))
+				if self._chunkFile is not None else None,
+			'complete': self._chunkFile is None
+		}
+
+		tempFile = self.indexPath + '.temp'
+		with open(tempFile, 'w') as indexFile:
+			indexFile.write(json.dumps(index))
+		os.rename(tempFile, self.indexPath)
+
+# -- ChunkedLogHandler class --------------------------------------------------
+
+class ChunkedLogHandler(logging.Handler):
+	"""Logging handler writing to a ChunkedLog, closing the handler
+	   completes the log"""
+
+	def __init__(self, path):
+		super().__init__()
+		self.log = ChunkedLog(path)
+
+	def emit(self, record):
+		try:
+			self.log.write(self.format(record) + '\n')
+		except Exception:
+			self.handleError(record)
+
+	def close(self):
+		self.log.close()
+		super().close()
@@ -8,9 +8,13 @@
 import functools
 from subprocess import CalledProcessError, check_output
 
+from .DeclarativeEvaluator import (DeclarativeEvaluator,
+                                   UnsupportedConstructError)
+from .Options import getOption
 from .RecipeTypes import (Architectures, Extendable, LinesOfText,
                           MachineArchitecture, Phase, ProvidesList,
                           RequiresList, Status, YesNo)
+from .ShellEvaluator import ShellEvaluator, ShellEvaluatorError
 from .ShellScriptlets import configFileEvaluatorScript, getShellVariableSetters
 from .Utils import filteredEnvironment, sysExit, warn
 
@@ -19,27 +23,13 @@ from .Utils import filteredEnvironment, sysExit, warn
 class ConfigParser(object):
 	def __init__(self, filename, attributes, shellVariables):
 
-		## REFACTOR environment setup and conf location into a single function
-		## that then calls the ConfigParser and either passes in the file path
-		## or the contents of the file
-
-		# set up the shell environment -- we want it to inherit some of our
-		# variables
-		shellEnv = filteredEnvironment()
-		shellEnv['recipePhases'] = ' '.join(Phase.getAllowedValues())
-
 		# execute the config file via the shell ....
-		supportedKeysString = '|'.join(attributes.keys())
-		shellVariables = shellVariables.copy()
-		shellVariables['supportedKeysPattern'] = supportedKeysString
-		shellVariables['fileToParse'] = filename
-
-		wrapperScript = (getShellVariableSetters(shellVariables)
-						 + configFileEvaluatorScript)
-		try:
-			output = check_output(['bash', '-c', wrapperScript], env=shellEnv).decode('utf-8')
-		except (OSError, CalledProcessError):
-			sysExit("Can't evaluate config file: " + filename)
+		evaluator = getOption('recipeEvaluator')
+		if evaluator == 'python' and getOption('lint'):
+			# only bash checks the syntax of the function bodies
+			evaluator = 'persistent'
+		output = self._evaluate(filename, attributes, shellVariables,
+			evaluator)
 
 		# ... and collect the resulting configurations (one per line)
 
@@ -217,6 +207,100 @@ class ConfigParser(object):
 				# for key in entries:
 				#		print key + " = " + str(entries[key])
 
+	@staticmethod
+	def _evaluate(filename, attributes, shellVariables, evaluator):
+		"""Evaluates the config file with the given evaluator and returns the
+		   output of configFileEvaluatorScript. Evaluators that can't handle
+		   the file fall back to the next one in the order 'python',
+		   'persistent', 'oneshot'."""
+
+		shellVariables = ConfigParser._evaluatorVariables(filename, attributes,
+			shellVariables)
+
+		output = None
+		if evaluator == 'python':
+			output = ConfigParser._evaluateDeclaratively(shellVariables)
+			evaluator = 'persistent'
+		if output is None and evaluator == 'persistent':
+			output = ConfigParser._evaluateInCoprocess(filename, shellVariables)
+		if output is None:
+			output = ConfigParser._evaluateInNewShell(filename, shellVariables)
+		return output
+
+	@staticmethod
+	def compareEvaluators(filename, attributes, shellVariables):
+		"""Evaluates the config file with the python evaluator as well as with
+		   bash, returns both outputs (the former being None if the file needs
+		   bash)"""
+
+		shellVariables = ConfigParser._evaluatorVariables(filename, attributes,
+			shellVariables)
+		bashOutput = ConfigParser._evaluateInCoprocess(filename, shellVariables)
+		if bashOutput is None:
+			bashOutput = ConfigParser._evaluateInNewShell(filename,
+				shellVariables)
+		return ConfigParser._evaluateDeclaratively(shellVariables), bashOutput
+
+	@staticmethod
+	def _evaluatorVariables(filename, attributes, shellVariables):
+		shellVariables = shellVariables.copy()
+		shellVariables['supportedKeysPattern'] = '|'.join(attributes.keys())
+		shellVariables['fileToParse'] = filename
+		return shellVariables
+
+	@staticmethod
+	def _evaluateDeclaratively(shellVariables):
+		"""Evaluates the config file without a shell. Returns None if the
+		   file uses shell features that require a real shell."""
+
+		try:
+			return DeclarativeEvaluator(shellVariables).evaluate()
+		except (OSError, UnicodeDecodeError, UnsupportedConstructError):
+			return None
+
+	@staticmethod
+	def _evaluateInNewShell(filename, shellVariables):
+		"""Evaluates the config file by running a new bash process"""
+
+		## REFACTOR environment setup and conf location into a single function
+		## that then calls the ConfigParser and either passes in the file path
+		## or the contents of the file
+
+		# set up the shell environment -- we want it to inherit some of our
+		# variables
+		shellEnv = filteredEnvironment()
+		shellEnv['recipePhases'] = ' '.join(Phase.getAllowedValues())
+
+		wrapperScript = (getShellVariableSetters(shellVariables)
+						 + configFileEvaluatorScript)
+		try:
+			return check_output(['bash', '-c', wrapperScript],
+				env=shellEnv).decode('utf-8')
+		except (OSError, CalledProcessError):
+			sysExit("Can't evaluate config file: " + filename)
+
+	@staticmethod
+	def _evaluateInCoprocess(filename, shellVariables):
+		"""Evaluates the config file with one of the persistent bash
+		   coprocesses. Returns None if the coprocess failed, in which case
+		   the caller should fall back to a new shell."""
+
+		evaluator = None
+		try:
+			evaluator = ShellEvaluator.acquire()
+			status, output = evaluator.evaluate(shellVariables)
+		except (OSError, ShellEvaluatorError) as exception:
+			if evaluator is not None:
+				evaluator.close()
+			warn('persistent shell evaluation of %s failed (%s), falling back'
+				% (filename, exception))
+			return None
+
+		ShellEvaluator.release(evaluator)
+		if status != 0:
+			sysExit("Can't evaluate config file: " + filename)
+		return output
+
 	def getEntriesForExtension(self, extension):
 		if extension in self.entriesByExtension:
 			return self.entriesByExtension[extension]
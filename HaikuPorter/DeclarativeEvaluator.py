@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013 Oliver Tappe
+# Distributed under the terms of the MIT License.
+
+# -- Modules ------------------------------------------------------------------
+
+import codecs
+import re
+
+from .RecipeTypes import Phase
+from .Utils import filteredEnvironment
+
+# -- UnsupportedConstructError class ------------------------------------------
+
+class UnsupportedConstructError(Exception):
+	"""Raised when a config file uses a shell feature that the declarative
+	   evaluator doesn't implement, such that it has to be evaluated by bash"""
+	pass
+
+# -- DeclarativeEvaluator class -----------------------------------------------
+
+class DeclarativeEvaluator(object):
+	"""Evaluates config files that consist only of variable assignments and
+	   function definitions without starting a shell. The output is the same
+	   as the one produced by configFileEvaluatorScript. Anything beyond
+	   that subset (command substitution, conditionals, loops, commands,
+	   heredocs at the top level, etc.) raises UnsupportedConstructError."""
+
+	_namePattern = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+	_assignmentPattern = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)=')
+	_functionPattern = re.compile(
+		r'([A-Za-z_][A-Za-z0-9_]*)[ \t]*\(\)\s*\{[ \t]*\n')
+	_functionEndPattern = re.compile(r'\}[ \t]*(#.*)?$')
+	_heredocPattern = re.compile(r'<<(-?)[ \t]*([\'"]?)(\w+)\2')
+	_updateRevisionVariablesPattern = re.compile(
+		r'updateRevisionVariables(?=[ \t;\n]|$)')
+	_plainTextPattern = re.compile(r'[^ \t\n;\'"\\$`()|&<>~:]+')
+	_quotedTextPattern = re.compile(r'[^"\\$`]+')
+
+	# variables that have a special meaning to bash or the evaluator script
+	_specialVariablePattern = re.compile(
+		r'(BASH\w*|LC_\w+|CDPATH|COLUMNS|DIRSTACK|ENV|EPOCH\w+|EUID|FUNCNAME'
+		r'|GLOBIGNORE|GROUPS|HISTFILE|HOME|HOSTNAME|HOSTTYPE|IFS|LANG|LINENO'
+		r'|LINES|MACHTYPE|OLDPWD|OPT\w+|OSTYPE|PATH|PIPESTATUS|POSIXLY_CORRECT'
+		r'|PPID|PS[0-4]|PWD|RANDOM|REPLY|SECONDS|SHELL\w*|SHLVL|SRANDOM|TMOUT'
+		r'|UID|key|value|NL|supportedKeys|phase)$')
+
+	def __init__(self, shellVariables):
+		self.variables = filteredEnvironment()
+		self.variables['recipePhases'] = ' '.join(Phase.getAllowedValues())
+		self.variables.update(shellVariables)
+
+		# mirror the "revisionVariables" set up by getShellVariableSetters()
+		revisionVariables = [name for name, value in shellVariables.items()
+			if '$REVISION' in value]
+		if revisionVariables:
+			self.variables['revisionVariables'] = ' '.join(revisionVariables)
+
+		self.functions = set()
+		self.keysPattern = re.compile('(%s)(_[0-9a-zA-Z_]+)?$'
+			% shellVariables['supportedKeysPattern'])
+
+	def evaluate(self):
+		"""Evaluates the config file given by shellVariables['fileToParse'],
+		   returns the output"""
+
+		with codecs.open(self.variables['fileToParse'], 'r', 'utf-8') as f:
+			self._text = f.read()
+		self._pos = 0
+
+		while True:
+			self._skipBlanks()
+			if self._pos >= len(self._text):
+				break
+
+			char = self._text[self._pos]
+			if char == '\n':
+				self._pos += 1
+			elif char == '#':
+				self._skipComment()
+			else:
+				match = self._functionPattern.match(self._text, self._pos)
+				if match:
+					self.functions.add(match.group(1))
+					self._skipFunctionBody(match.end())
+				else:
+					self._evaluateSimpleCommand()
+
+		output = []
+		for key in sorted(self.variables.keys()):
+			if self.keysPattern.match(key):
+				output.append('%s=%s\n'
+					% (key, self.variables[key].replace('\n', '\\n')))
+		for phase in Phase.getAllowedValues():
+			if phase in self.functions:
+				output.append('%s_DEFINED=1\n' % phase)
+		return ''.join(output)
+
+	def _unsupported(self, what):
+		line = self._text.count('\n', 0, self._pos) + 1
+		raise UnsupportedConstructError('%s in line %d' % (what, line))
+
+	def _skipBlanks(self):
+		text = self._text
+		while self._pos < len(text):
+			if text[self._pos] in ' \t':
+				self._pos += 1
+			elif text.startswith('\\\n', self._pos):
+				self._pos += 2
+			else:
+				break
+
+	def _skipComment(self):
+		end = self._text.find('\n', self._pos)
+		self._pos = len(self._text) if end < 0 else end
+
+	def _skipFunctionBody(self, start):
+		"""Skips to the closing brace of a function, which is expected at the
+		   start of a line, as the function body itself doesn't matter until
+		   the recipe gets built"""
+
+		lines = self._text[start:].split('\n')
+		offset = start
+		hasCommands = False
+		heredocDelimiter = None
+		stripTabs = False
+		for line in lines:
+			self._pos = offset
+			offset += len(line) + 1
+			if heredocDelimiter is not None:
+				if line == heredocDelimiter or (stripTabs
+						and line.lstrip('\t') == heredocDelimiter):
+					heredocDelimiter = None
+				continue
+
+			if self._functionEndPattern.match(line):
+				if not hasCommands:
+					self._unsupported('empty function body')
+				self._pos = min(offset, len(self._text))
+				return
+
+			if not line.strip() or line.strip().startswith('#'):
+				continue
+			hasCommands = True
+
+			heredocs = self._heredocPattern.findall(line.replace('<<<', ''))
+			if len(heredocs) > 1:
+				self._unsupported('multiple heredocs')
+			if heredocs:
+				stripTabs = heredocs[0][0] == '-'
+				heredocDelimiter = heredocs[0][2]
+
+		self._unsupported('unterminated function')
+
+	def _evaluateSimpleCommand(self):
+		text = self._text
+		match = self._updateRevisionVariablesPattern.match(text, self._pos)
+		if match:
+			self._pos = match.end()
+			self._updateRevisionVariables()
+		else:
+			while True:
+				match = self._assignmentPattern.match(text, self._pos)
+				if not match:
+					self._unsupported('command')
+				name = match.group(1)
+				if self._specialVariablePattern.match(name):
+					self._unsupported('assignment to ' + name)
+				self._pos = match.end()
+				self.variables[name] = self._parseWord()
+
+				self._skipBlanks()
+				if self._pos >= len(text) or text[self._pos] in '\n;#':
+					break
+
+		# the command must be terminated by a newline, a comment or a ';'
+		self._skipBlanks()
+		if self._pos < len(text):
+			char = text[self._pos]
+			if char == ';':
+				self._pos += 1
+				self._skipBlanks()
+				if self._pos < len(text) and text[self._pos] in ';&|':
+					self._unsupported('operator')
+			elif char not in '\n#':
+				self._unsupported('command')
+
+	def _updateRevisionVariables(self):
+		"""Re-expands the variables referring to $REVISION just like the
+		   shell function of the same name in configFileEvaluatorScript"""
+
+		if 'revisionVariables' not in self.variables:
+			return
+
+		text, pos = self._text, self._pos
+		try:
+			for variable in self.variables['revisionVariables'].split():
+				self._text = '"%s"' % self.variables.get(variable, '')
+				self._pos = 0
+				value = self._parseWord()
+				if self._pos != len(self._text):
+					self._unsupported('quote in revision variable')
+				self.variables[variable] = value
+		finally:
+			self._text, self._pos = text, pos
+		del self.variables['revisionVariables']
+
+	def _parseWord(self):
+		"""Parses the value of an assignment, performing quote removal and
+		   variable expansion"""
+
+		text = self._text
+		start = self._pos
+		parts = []
+		while self._pos < len(text):
+			char = text[self._pos]
+			if char in ' \t\n;':
+				break
+
+			if char == "'":
+				end = text.find("'", self._pos + 1)
+				if end < 0:
+					self._unsupported('unterminated quote')
+				parts.append(text[self._pos + 1:end])
+				self._pos = end + 1
+			elif char == '"':
+				parts.append(self._parseDoubleQuoted())
+			elif char == '\\':
+				if self._pos + 1 >= len(text):
+					self._unsupported('trailing backslash')
+				if text[self._pos + 1] != '\n':
+					parts.append(text[self._pos + 1])
+				self._pos += 2
+			elif char == '$':
+				parts.append(self._parseExpansion(False))
+			elif char == '~':
+				# tilde expansion applies at the start and after a colon
+				if self._pos == start or text[self._pos - 1] == ':':
+					self._unsupported('tilde expansion')
+				parts.append(char)
+				self._pos += 1
+			elif char == ':':
+				parts.append(char)
+				self._pos += 1
+			elif char in '`()|&<>':
+				self._unsupported("'%s'" % char)
+			else:
+				match = self._plainTextPattern.match(text, self._pos)
+				parts.append(match.group(0))
+				self._pos = match.end()
+
+		return ''.join(parts)
+
+	def _parseDoubleQuoted(self):
+		text = self._text
+		self._pos += 1
+		parts = []
+		while self._pos < len(text):
+			char = text[self._pos]
+			if char == '"':
+				self._pos += 1
+				return ''.join(parts)
+
+			if char == '\\':
+				if self._pos + 1 >= len(text):
+					break
+				nextChar = text[self._pos + 1]
+				if nextChar in '$`"\\':
+					parts.append(nextChar)
+				elif nextChar != '\n':
+					parts.append(char + nextChar)
+				self._pos += 2
+			elif char == '$':
+				parts.append(self._parseExpansion(True))
+			elif char == '`':
+				self._unsupported('command substitution')
+			else:
+				match = self._quotedTextPattern.match(text, self._pos)
+				parts.append(match.group(0))
+				self._pos = match.end()
+
+		self._unsupported('unterminated quote')
+
+	def _parseExpansion(self, quoted):
+		"""Expands $name or ${name}, anything more elaborate is left to bash"""
+
+		text = self._text
+		nextPos = self._pos + 1
+		nextChar = text[nextPos] if nextPos < len(text) else ''
+
+		if nextChar == '{':
+			end = text.find('}', nextPos)
+			if end < 0:
+				self._unsupported('unterminated parameter expansion')
+			name = text[nextPos + 1:end]
+			if not self._namePattern.fullmatch(name):
+				self._unsupported('parameter expansion')
+			self._pos = end + 1
+		else:
+			match = self._namePattern.match(text, nextPos)
+			if not match:
+				# a lone '$' is taken literally
+				if nextChar in ('', ' ', '\t', '\n') or (quoted
+						and nextChar == '"'):
+					self._pos = nextPos
+					return '$'
+				self._unsupported('special parameter or substitution')
+			name = match.group(0)
+			self._pos = match.end()
+
+		# unknown variables might be set by bash itself (e.g. $PWD)
+		if name not in self.variables:
+			self._unsupported('unknown variable ' + name)
+		return self.variables[name]
@@ -8,10 +8,14 @@
 import os
 import re
 import subprocess
+import threading
+import time
+from collections import deque
+from operator import attrgetter
 
 from .Options import getOption
 from .PackageInfo import PackageInfo, ResolvableExpression
-from .ProvidesManager import ProvidesManager
+from .ProvidesManager import ProvidesManager, ProvidesOverlay
 from .ShellScriptlets import getScriptletPrerequirements
 from .Utils import printError, sysExit, warn
 
@@ -25,17 +29,25 @@ class RestartDependencyResolutionException(Exception):
 # -- PackageNode class --------------------------------------------------------
 
 class PackageNode(object):
-	def __init__(self, packageInfo, isBuildhostPackage):
+	def __init__(self, packageInfo, isBuildhostPackage, realPath=None):
 		self.packageInfo = packageInfo
-		self.realPath = os.path.realpath(packageInfo.path)
+		self.realPath = (realPath if realPath is not None
+			else os.path.realpath(packageInfo.path))
 		self.isBuildhostPackage = isBuildhostPackage
 		self.dependencyCount = 0
 
 	def __eq__(self, other):
-		return (self.packageInfo.name == other.packageInfo.name
-			and self.packageInfo.version == other.packageInfo.version
-			and self.realPath == other.realPath
-			and self.isBuildhostPackage == other.isBuildhostPackage)
+		return self.key == other.key
+
+	def __hash__(self):
+		return hash(self.key)
+
+	@property
+	def key(self):
+		"""identifies the node, packages with the same name and version
+		   that refer to the same file are considered the same"""
+		return (self.packageInfo.name, self.packageInfo.version, self.realPath,
+			self.isBuildhostPackage)
 
 	def __str__(self):
 		return '%s-%s :: %s ::%s' % (self.packageInfo.name,
@@ -61,7 +73,7 @@ class DependencyResolver(object):
 	packageInfoCache = {}
 
 	def __init__(self, buildPlatform, requiresTypes, repositories, **kwargs):
-		self._providesManager = ProvidesManager()
+		self._providesManager = ProvidesOverlay()
 		self._platform = buildPlatform
 		self._requiresTypes = requiresTypes.copy()
 		self._repositories = repositories
@@ -70,11 +82,23 @@ class DependencyResolver(object):
 		self._presentDependencyPackages = kwargs.get(
 			'presentDependencyPackages', None)
 		self._quiet = kwargs.get('quiet', False)
-		self._satisfiedPackagesCache = []
-
-		self._populateProvidesManager()
+		self._satisfiedPackagesCache = set()
+		self._presentDependencyPackagesSet = set()
+		self._realPaths = {}
+		self._implicitProvides = {}
+		self._scriptletPrerequirements = None
 
 	def determineRequiredPackagesFor(self, dependencyInfoFiles):
+		repositoryProvides = RepositoryProvides.acquire(self._repositories,
+			self._parsePackageInfo)
+		self._providesManager.base = repositoryProvides.providesManager
+		try:
+			return self._determineRequiredPackagesFor(dependencyInfoFiles)
+		finally:
+			self._providesManager.base = None
+			repositoryProvides.release()
+
+	def _determineRequiredPackagesFor(self, dependencyInfoFiles):
 		packageInfos = [
 			self._parsePackageInfo(dif, True) for dif in dependencyInfoFiles
 		]
@@ -85,14 +109,15 @@ class DependencyResolver(object):
 				self._packageNodes = []
 				if self._presentDependencyPackages:
 					del self._presentDependencyPackages[:]
+				self._presentDependencyPackagesSet.clear()
 
-				self._pending = [
-					PackageNode(pi, False) for pi in packageInfos
-				]
+				self._pending = deque(
+					self._createPackageNode(pi, False) for pi in packageInfos
+				)
 
-				self._traversed = set([
-					str(packageNode) for packageNode in self._pending
-				])
+				self._traversed = set(
+					packageNode.key for packageNode in self._pending
+				)
 
 				self._buildDependencyGraph()
 				break
@@ -113,27 +138,14 @@ class DependencyResolver(object):
 			node.path for node in self._packageNodes
 		]
 
-		self._satisfiedPackagesCache += result
+		self._satisfiedPackagesCache.update(result)
 		return result
 
-	def _populateProvidesManager(self):
-		for repository in self._repositories:
-			for entry in os.listdir(repository):
-				if not (entry.endswith('.DependencyInfo')
-						or entry.endswith('.hpkg')
-						or entry.endswith('.PackageInfo')):
-					continue
-				packageInfo = self._parsePackageInfo(repository + '/' + entry,
-					not entry.endswith('.hpkg'))
-				if packageInfo is None:
-					continue
-				self._providesManager.addProvidesFromPackageInfo(packageInfo)
-
 	def _buildDependencyGraph(self):
 		numberOfInitialPackages = len(self._pending)
 		numberOfHandledPackages = 0
 		while self._pending:
-			packageNode = self._pending.pop(0)
+			packageNode = self._pending.popleft()
 
 			if 'REQUIRES' in self._requiresTypes:
 				self._addAllImmediateRequiresOf(packageNode)
@@ -155,24 +167,10 @@ class DependencyResolver(object):
 				self._requiresTypes.append('REQUIRES')
 
 	def _sortPackageNodesTopologically(self):
-		sortedPackageNodes = []
-		while self._packageNodes:
-			lowestDependencyCount = 1000000
-			nodesWithLowestDependencyCount = []
-			for node in self._packageNodes:
-				if lowestDependencyCount > node.dependencyCount:
-					lowestDependencyCount = node.dependencyCount
-					nodesWithLowestDependencyCount = [node]
-				elif lowestDependencyCount == node.dependencyCount:
-					nodesWithLowestDependencyCount.append(node)
-
-			sortedPackageNodes += nodesWithLowestDependencyCount
-			self._packageNodes = [
-				node for node in self._packageNodes
-				if node not in nodesWithLowestDependencyCount
-			]
-
-		self._packageNodes = sortedPackageNodes
+		# Nodes with fewer (non-hpkg) dependencies come first, nodes with the
+		# same number of dependencies keep the order they have been added in
+		# (the sort is stable).
+		self._packageNodes.sort(key=attrgetter('dependencyCount'))
 
 	def _addAllImmediateRequiresOf(self, requiredPackageInfo):
 		packageInfo = requiredPackageInfo.packageInfo
@@ -205,17 +203,26 @@ class DependencyResolver(object):
 				'test-requires', False)
 
 	def _addScriptletPrerequiresOf(self, requiredPackageInfo):
-		scriptletPrerequirements = getScriptletPrerequirements()
-		for requires in scriptletPrerequirements:
-			self._addImmediate(requiredPackageInfo,
-				ResolvableExpression(requires), 'scriptlet-prerequires', True)
+		if self._scriptletPrerequirements is None:
+			self._scriptletPrerequirements = [
+				ResolvableExpression(requires)
+				for requires in getScriptletPrerequirements()
+			]
+		for requires in self._scriptletPrerequirements:
+			self._addImmediate(requiredPackageInfo, requires,
+				'scriptlet-prerequires', True)
 
-	def _addImmediate(self, parent, requires, typeString, forBuildhost):
-		implicitProvides = []
-		if self._platform:
-			implicitProvides = self._platform.getImplicitProvides(forBuildhost)
+	def _getImplicitProvides(self, forBuildhost):
+		if forBuildhost not in self._implicitProvides:
+			implicitProvides = set()
+			if self._platform:
+				implicitProvides.update(
+					self._platform.getImplicitProvides(forBuildhost))
+			self._implicitProvides[forBuildhost] = implicitProvides
+		return self._implicitProvides[forBuildhost]
 
-		isImplicit = requires.name in implicitProvides
+	def _addImmediate(self, parent, requires, typeString, forBuildhost):
+		isImplicit = requires.name in self._getImplicitProvides(forBuildhost)
 		# Skip, if this is one of the implicit provides of the build platform,
 		# unless we are collecting the source packages for the bootstrap, in
 		# case of which we try to add all requires (as in that case the actual
@@ -266,35 +273,173 @@ class DependencyResolver(object):
 		if provides.packageInfo.path in self._satisfiedPackagesCache:
 			return
 
-		requiredPackageInfo = PackageNode(provides.packageInfo, forBuildhost)
+		requiredPackageInfo = self._createPackageNode(provides.packageInfo,
+			forBuildhost)
 		if requiredPackageInfo.path.endswith('.hpkg'):
 			if (self._presentDependencyPackages is not None
 				and requiredPackageInfo.path
-					not in self._presentDependencyPackages):
+					not in self._presentDependencyPackagesSet):
 				self._presentDependencyPackages.append(requiredPackageInfo.path)
+				self._presentDependencyPackagesSet.add(
+					requiredPackageInfo.path)
 
 			self._addPackageNode(requiredPackageInfo, not self._stopAtHpkgs)
 		else:
 			parent.bumpDependencyCount()
 			self._addPackageNode(requiredPackageInfo, True)
 
+	def _createPackageNode(self, packageInfo, forBuildhost):
+		path = packageInfo.path
+		realPath = self._realPaths.get(path)
+		if realPath is None:
+			realPath = os.path.realpath(path)
+			self._realPaths[path] = realPath
+		return PackageNode(packageInfo, forBuildhost, realPath)
+
 	def _addPackageNode(self, requiredPackageInfo, addToPending):
-		if str(requiredPackageInfo) not in self._traversed:
-			self._traversed.add(str(requiredPackageInfo))
+		if requiredPackageInfo.key not in self._traversed:
+			self._traversed.add(requiredPackageInfo.key)
 			self._packageNodes.append(requiredPackageInfo)
 			if addToPending:
 				self._pending.append(requiredPackageInfo)
 
-	def _parsePackageInfo(self, packageInfoFile, fatal):
-		if packageInfoFile in DependencyResolver.packageInfoCache:
-			return DependencyResolver.packageInfoCache[packageInfoFile]
+	@staticmethod
+	def _parsePackageInfo(packageInfoFile, fatal):
+		# package files may be replaced during a session, so the cached
+		# package info is only used as long as the file is unchanged
+		try:
+			stat = os.stat(packageInfoFile)
+			signature = (stat.st_size, stat.st_mtime_ns)
+		except OSError:
+			signature = None
+
+		cached = DependencyResolver.packageInfoCache.get(packageInfoFile)
+		if cached is not None and cached[0] == signature:
+			return cached[1]
 
 		try:
 			packageInfo = PackageInfo(packageInfoFile)
-			DependencyResolver.packageInfoCache[packageInfoFile] = packageInfo
+			DependencyResolver.packageInfoCache[packageInfoFile] \
+				= (signature, packageInfo)
 		except subprocess.CalledProcessError:
 			message = 'failed to parse "%s"' % packageInfoFile
 			sysExit(message) if fatal else warn(message)
 			return None
 
 		return packageInfo
+
+# -- RepositoryProvides class -------------------------------------------------
+
+class RepositoryProvides(object):
+	"""The provides of all packages in a list of repositories. They are
+	   shared by all resolvers using the same repositories during a session
+	   and only the packages that have been added, changed or removed since
+	   the last use are (re-)parsed.
+
+	   The instances are reference counted: one that is in use is never
+	   modified, if it needs an update, a copy of it is updated instead."""
+
+	_instances = {}
+	_lock = threading.Lock()
+
+	# directories that have been modified shortly before they were scanned
+	# are scanned again, as the modification time has a limited resolution
+	_modificationTimeSlack = 2 * 1000 * 1000 * 1000
+
+	def __init__(self, repositories):
+		self.repositories = tuple(repositories)
+		self.providesManager = ProvidesManager()
+		self._referenceCount = 0
+		self._scannedDirectories = {}
+		self._files = {}
+
+	@classmethod
+	def acquire(cls, repositories, parsePackageInfo):
+		"""Returns the up-to-date provides of the given repositories, which
+		   must be handed back via release()"""
+
+		with cls._lock:
+			key = tuple(repositories)
+			instance = cls._instances.get(key)
+			if instance is None:
+				instance = cls._instances[key] = RepositoryProvides(key)
+
+			staleRepositories = instance._staleRepositories()
+			if staleRepositories:
+				if instance._referenceCount > 0:
+					instance = cls._instances[key] = instance._copy()
+				instance._update(staleRepositories, parsePackageInfo)
+
+			instance._referenceCount += 1
+			return instance
+
+	def release(self):
+		with RepositoryProvides._lock:
+			self._referenceCount -= 1
+
+	def _copy(self):
+		clone = RepositoryProvides(self.repositories)
+		clone.providesManager = self.providesManager.copy()
+		clone._scannedDirectories = dict(self._scannedDirectories)
+		clone._files = dict(self._files)
+		return clone
+
+	def _staleRepositories(self):
+		staleRepositories = []
+		for repository in self.repositories:
+			scanned = self._scannedDirectories.get(repository)
+			if scanned is None:
+				staleRepositories.append(repository)
+				continue
+
+			modificationTime, scanTime = scanned
+			try:
+				currentModificationTime = os.stat(repository).st_mtime_ns
+			except OSError:
+				currentModificationTime = None
+			if (currentModificationTime != modificationTime
+				or scanTime - modificationTime
+					< RepositoryProvides._modificationTimeSlack):
+				staleRepositories.append(repository)
+		return staleRepositories
+
+	def _update(self, staleRepositories, parsePackageInfo):
+		for rank, repository in enumerate(self.repositories):
+			if repository not in staleRepositories:
+				continue
+
+			scanTime = time.time_ns()
+			modificationTime = os.stat(repository).st_mtime_ns
+
+			# the size and modification time of all package files, in
+			# directory order
+			files = {}
+			with os.scandir(repository) as entries:
+				for entry in entries:
+					if not (entry.name.endswith('.DependencyInfo')
+							or entry.name.endswith('.hpkg')
+							or entry.name.endswith('.PackageInfo')):
+						continue
+					stat = entry.stat()
+					files[repository + '/' + entry.name] = (stat.st_size,
+						stat.st_mtime_ns)
+
+			knownFiles = self._files.get(repository, {})
+			for path, signature in knownFiles.items():
+				if files.get(path) == signature:
+					continue
+				if self.providesManager.hasProvidesOf(path):
+					self.providesManager.removeProvidesOfSource(path)
+
+			for path, signature in files.items():
+				if knownFiles.get(path) == signature:
+					continue
+				packageInfo = parsePackageInfo(path,
+					not path.endswith('.hpkg'))
+				if packageInfo is not None:
+					self.providesManager.addProvidesFromPackageInfo(
+						packageInfo, rank)
+
+			self._files[repository] = files
+			self._scannedDirectories[repository] = (modificationTime,
+				scanTime)
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013-2014 Haiku, Inc.
+# Distributed under the terms of the MIT License.
+
+# -- Modules ------------------------------------------------------------------
+
+import os
+import pickle
+import sqlite3
+import threading
+
+# -- HpkgInfoCache class ------------------------------------------------------
+
+class HpkgInfoCache(object):
+	"""Persistent cache of the package infos extracted from hpkg files, kept
+	   in a sqlite database keyed by the path of the package.
+
+	   Entries are validated lazily when they are looked up, by comparing the
+	   size, mtime and inode of the package file with the ones it had when
+	   the entry was stored. Package files that have been stubbed (truncated
+	   to zero size after being uploaded to a storage backend) keep their
+	   entry. Entries of packages that have disappeared or changed are
+	   removed by a background thread.
+
+	   The package infos handed out are shared between all lookups of the
+	   same package and must not be modified."""
+
+	fileName = 'hpkgInfoCache.db'
+
+	# the pickle stream used by earlier versions, imported once
+	legacyFileName = 'hpkgInfoCache'
+
+	_schema = '''
+		CREATE TABLE IF NOT EXISTS hpkgInfos (
+			path TEXT PRIMARY KEY,
+			size INTEGER NOT NULL,
+			mtime INTEGER NOT NULL,
+			inode INTEGER NOT NULL,
+			content BLOB NOT NULL
+		);
+	'''
+
+	def __init__(self, directory):
+		self.directory = directory
+		self.path = os.path.join(directory, HpkgInfoCache.fileName)
+		self._connection = None
+		self._lock = threading.RLock()
+		self._entries = {}
+		self._compactionThread = None
+
+	@staticmethod
+	def signatureOf(path):
+		"""Returns the signature of the file with the given path that entries
+		   are validated against, raises OSError if there is no such file"""
+
+		stat = os.stat(path)
+		return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+	def get(self, path):
+		"""Returns the package info (a dictionary of attributes) stored for
+		   the given package, or None if there is none or it is outdated"""
+
+		try:
+			signature = HpkgInfoCache.signatureOf(path)
+		except OSError:
+			return None
+
+		with self._lock:
+			entry = self._entries.get(path)
+			if entry is None:
+				rows = self._execute('SELECT size, mtime, inode, content '
+					'FROM hpkgInfos WHERE path = ?', (path, ))
+				if not rows:
+					return None
+				size, mtime, inode, content = rows[0]
+				entry = ((size, mtime, inode), pickle.loads(content))
+				self._entries[path] = entry
+
+			if entry[0] != signature and signature[0] != 0:
+				del self._entries[path]
+				return None
+			return entry[1]
+
+	def put(self, path, packageInfo):
+		"""Stores the package info (a dictionary of attributes) of the given
+		   package"""
+
+		signature = HpkgInfoCache.signatureOf(path)
+		packageInfo = dict(packageInfo)
+		with self._lock:
+			self._execute('INSERT OR REPLACE INTO hpkgInfos '
+				'VALUES (?, ?, ?, ?, ?)', (path, ) + signature
+					+ (pickle.dumps(packageInfo, pickle.HIGHEST_PROTOCOL), ))
+			self._entries[path] = (signature, packageInfo)
+
+	def _execute(self, statement, parameters=()):
+		if self._connection is None:
+			self._connection = self._connect()
+			self._importLegacyCache()
+			self._startCompaction()
+		return self._connection.execute(statement, parameters).fetchall()
+
+	def _connect(self):
+		if not os.path.exists(self.directory):
+			os.makedirs(self.directory, exist_ok=True)
+		connection = sqlite3.connect(self.path, timeout=60,
+			isolation_level=None, check_same_thread=False)
+		connection.execute('PRAGMA journal_mode = WAL')
+		connection.execute('PRAGMA synchronous = NORMAL')
+		connection.executescript(self._schema)
+		return connection
+
+	def _importLegacyCache(self):
+		"""Moves the valid entries of the pickle stream used by earlier
+		   versions into the database"""
+
+		legacyPath = os.path.join(self.directory, self.legacyFileName)
+		if not os.path.exists(legacyPath):
+			return
+
+		self._connection.execute('BEGIN')
+		with open(legacyPath, 'rb') as cacheFile:
+			while True:
+				try:
+					entry = pickle.load(cacheFile)
+				except EOFError:
+					break
+				path = entry.pop('path', None)
+				modifiedTime = entry.pop('modifiedTime', None)
+				try:
+					signature = HpkgInfoCache.signatureOf(path)
+				except (OSError, TypeError):
+					continue
+				if (modifiedTime is None or signature[0] != 0
+						and signature[1] / 1e9 > modifiedTime):
+					continue
+				entry['path'] = path
+				self._connection.execute('INSERT OR REPLACE INTO hpkgInfos '
+					'VALUES (?, ?, ?, ?, ?)', (path, ) + signature
+						+ (pickle.dumps(entry, pickle.HIGHEST_PROTOCOL), ))
+		self._connection.execute('COMMIT')
+
+		os.remove(legacyPath)
+		if os.path.exists(legacyPath + '.backup'):
+			os.remove(legacyPath + '.backup')
+
+	def _startCompaction(self):
+		self._compactionThread = threading.Thread(target=self._compact,
+			name='hpkgInfoCache compaction', daemon=True)
+		self._compactionThread.start()
+
+	def _compact(self):
+		"""Removes the entries of packages that no longer exist or have
+		   changed since the entry was stored"""
+
+		connection = self._connect()
+		try:
+			staleEntries = []
+			for row in connection.execute(
+					'SELECT path, size, mtime, inode FROM hpkgInfos'):
+				try:
+					signature = HpkgInfoCache.signatureOf(row[0])
+				except OSError:
+					staleEntries.append(row)
+					continue
+				if signature != tuple(row[1:]) and signature[0] != 0:
+					staleEntries.append(row)
+
+			# only remove entries that haven't been replaced meanwhile
+			if staleEntries:
+				connection.execute('BEGIN')
+				connection.executemany('DELETE FROM hpkgInfos WHERE path = ? '
+					'AND size = ? AND mtime = ? AND inode = ?', staleEntries)
+				connection.execute('COMMIT')
+		except sqlite3.Error:
+			pass
+		finally:
+			connection.close()
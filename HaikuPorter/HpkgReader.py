@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013-2014 Haiku, Inc.
+# Distributed under the terms of the MIT License.
+
+# -- Modules ------------------------------------------------------------------
+
+import struct
+import zlib
+
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+# -- HpkgFormatError class ----------------------------------------------------
+
+class HpkgFormatError(Exception):
+	"""Raised for package files that can't be read by the HpkgReader"""
+	pass
+
+# -- HPKG definitions (see headers/os/package/hpkg/HPKGDefs.h) ----------------
+
+hpkgMagic = b'hpkg'
+hpkgVersion = 2
+
+# the v2 header, all fields are big endian
+hpkgHeader = struct.Struct('>4sHHQHHIQQIIIIQQQ')
+
+compressionNone = 0
+compressionZlib = 1
+compressionZstd = 2
+
+attributeTypeInt = 1
+attributeTypeUint = 2
+attributeTypeString = 3
+attributeTypeRaw = 4
+
+stringEncodingInline = 0
+stringEncodingTable = 1
+rawEncodingInline = 0
+rawEncodingHeap = 1
+
+attributeIdPackageName = 15
+attributeIdPackageFlags = 20
+attributeIdPackageArchitecture = 21
+attributeIdPackageVersionMajor = 22
+attributeIdPackageVersionMinor = 23
+attributeIdPackageVersionMicro = 24
+attributeIdPackageVersionRevision = 25
+attributeIdPackageProvides = 28
+attributeIdPackageRequires = 29
+attributeIdPackageSupplements = 30
+attributeIdPackageConflicts = 31
+attributeIdPackageFreshens = 32
+attributeIdPackageReplaces = 33
+attributeIdPackageResolvableOperator = 34
+attributeIdPackageVersionPreRelease = 36
+attributeIdPackageProvidesCompatible = 37
+attributeIdPackageInstallPath = 40
+attributeIdPackageBasePackage = 41
+
+architectureNames = ['any', 'x86', 'x86_gcc2', 'source', 'x86_64', 'ppc',
+	'arm', 'm68k', 'sparc', 'arm64', 'riscv64']
+
+operatorNames = ['<', '<=', '==', '!=', '>=', '>']
+
+# -- HpkgReader class ---------------------------------------------------------
+
+class HpkgReader(object):
+	"""Reads the package attributes of a package file (hpkg format version 2)
+	   without invoking the package command.
+
+	   Versions, provides and the resolvable expressions are returned as
+	   strings formatted like `package list -i` prints them."""
+
+	def __init__(self, path):
+		self.path = path
+
+		self.name = None
+		self.version = None
+		self.architecture = None
+		self.installPath = None
+		self.basePackage = None
+		self.flags = 0
+		self.provides = []
+		self.requires = []
+		self.supplements = []
+		self.conflicts = []
+		self.freshens = []
+		self.replaces = []
+
+		with open(path, 'rb') as packageFile:
+			self._file = packageFile
+			try:
+				self._readHeader()
+				self._readPackageAttributes()
+			except (struct.error, IndexError, ValueError, zlib.error) as error:
+				raise HpkgFormatError('%s: broken package file (%s)'
+					% (path, error))
+			finally:
+				self._file = None
+
+	def _readHeader(self):
+		data = self._file.read(hpkgHeader.size)
+		if len(data) < hpkgHeader.size:
+			raise HpkgFormatError('%s: not a package file' % self.path)
+
+		(magic, headerSize, version, totalSize, minorVersion,
+			self._heapCompression, self._heapChunkSize,
+			self._heapSizeCompressed, self._heapSizeUncompressed,
+			self._attributesLength, self._attributesStringsLength,
+			self._attributesStringsCount, reserved, tocLength,
+			tocStringsLength, tocStringsCount) = hpkgHeader.unpack(data)
+
+		if magic != hpkgMagic:
+			raise HpkgFormatError('%s: not a package file' % self.path)
+		if version != hpkgVersion:
+			raise HpkgFormatError('%s: unsupported package format version %d'
+				% (self.path, version))
+		if self._heapCompression == compressionZstd and zstandard is None:
+			raise HpkgFormatError('%s: zstd compressed package, but the '
+				'zstandard module is not available' % self.path)
+		if self._heapCompression not in (compressionNone, compressionZlib,
+				compressionZstd):
+			raise HpkgFormatError('%s: unsupported heap compression %d'
+				% (self.path, self._heapCompression))
+		if (self._attributesLength > self._heapSizeUncompressed
+				or self._heapChunkSize == 0):
+			raise HpkgFormatError('%s: broken package header' % self.path)
+
+		self._heapOffset = headerSize
+
+	def _readHeapData(self, offset, length):
+		"""Returns length bytes of the uncompressed heap, starting at the
+		   given offset"""
+
+		chunkSize = self._heapChunkSize
+		chunkCount = (self._heapSizeUncompressed + chunkSize - 1) // chunkSize
+		firstChunk = offset // chunkSize
+		lastChunk = (offset + length - 1) // chunkSize
+
+		if self._heapCompression == compressionNone:
+			chunkOffsets = [index * chunkSize for index in range(chunkCount)]
+			chunkOffsets.append(self._heapSizeUncompressed)
+		else:
+			# the compressed heap is followed by the compressed sizes (minus
+			# one) of all chunks but the last one
+			tableSize = (chunkCount - 1) * 2
+			heapDataSize = self._heapSizeCompressed - tableSize
+			self._file.seek(self._heapOffset + heapDataSize)
+			sizes = struct.unpack('>%dH' % (chunkCount - 1),
+				self._file.read(tableSize))
+			chunkOffsets = [0]
+			for size in sizes:
+				chunkOffsets.append(chunkOffsets[-1] + size + 1)
+			chunkOffsets.append(heapDataSize)
+
+		data = bytearray()
+		for index in range(firstChunk, lastChunk + 1):
+			compressedSize = chunkOffsets[index + 1] - chunkOffsets[index]
+			uncompressedSize = min(chunkSize,
+				self._heapSizeUncompressed - index * chunkSize)
+			self._file.seek(self._heapOffset + chunkOffsets[index])
+			chunk = self._file.read(compressedSize)
+			if len(chunk) != compressedSize:
+				raise HpkgFormatError('%s: truncated package file' % self.path)
+
+			# chunks that don't shrink are stored uncompressed
+			if compressedSize < uncompressedSize:
+				if self._heapCompression == compressionZlib:
+					chunk = zlib.decompress(chunk)
+				else:
+					try:
+						chunk = zstandard.ZstdDecompressor().decompress(chunk,
+							max_output_size=uncompressedSize)
+					except zstandard.ZstdError as error:
+						raise HpkgFormatError('%s: broken heap chunk %d (%s)'
+							% (self.path, index, error))
+			if len(chunk) != uncompressedSize:
+				raise HpkgFormatError('%s: broken heap chunk %d'
+					% (self.path, index))
+			data += chunk
+
+		start = offset - firstChunk * chunkSize
+		return bytes(data[start:start + length])
+
+	def _readPackageAttributes(self):
+		# the package attributes section is the last part of the heap, it
+		# starts with the strings table
+		section = self._readHeapData(
+			self._heapSizeUncompressed - self._attributesLength,
+			self._attributesLength)
+
+		self._strings = []
+		position = 0
+		for _ in range(self._attributesStringsCount):
+			end = section.index(b'\0', position)
+			self._strings.append(section[position:end].decode('utf-8'))
+			position = end + 1
+
+		self._data = section
+		self._position = self._attributesStringsLength
+		for attribute in self._readAttributeList():
+			self._handlePackageAttribute(*attribute)
+
+	def _readAttributeList(self):
+		"""Returns the list of attributes (as (id, value, children) tuples) at
+		   the current position, up to the terminating zero tag"""
+
+		attributes = []
+		while True:
+			tag = self._readUnsignedLEB128()
+			if tag == 0:
+				return attributes
+
+			tag -= 1
+			attributeID = tag >> 7
+			value = self._readAttributeValue((tag >> 4) & 0x7,
+				(tag >> 1) & 0x7)
+			children = self._readAttributeList() if tag & 1 else []
+			attributes.append((attributeID, value, children))
+
+	def _readAttributeValue(self, attributeType, encoding):
+		if attributeType in (attributeTypeInt, attributeTypeUint):
+			size = 1 << encoding
+			value = int.from_bytes(
+				self._data[self._position:self._position + size], 'big',
+				signed=attributeType == attributeTypeInt)
+			self._position += size
+			return value
+
+		if attributeType == attributeTypeString:
+			if encoding == stringEncodingTable:
+				return self._strings[self._readUnsignedLEB128()]
+			end = self._data.index(b'\0', self._position)
+			value = self._data[self._position:end].decode('utf-8')
+			self._position = end + 1
+			return value
+
+		if attributeType == attributeTypeRaw:
+			size = self._readUnsignedLEB128()
+			if encoding == rawEncodingHeap:
+				return self._readHeapData(self._readUnsignedLEB128(), size)
+			value = self._data[self._position:self._position + size]
+			self._position += size
+			return value
+
+		raise HpkgFormatError('%s: invalid attribute type %d'
+			% (self.path, attributeType))
+
+	def _readUnsignedLEB128(self):
+		result = 0
+		shift = 0
+		while True:
+			byte = self._data[self._position]
+			self._position += 1
+			result |= (byte & 0x7f) << shift
+			if not byte & 0x80:
+				return result
+			shift += 7
+
+	def _handlePackageAttribute(self, attributeID, value, children):
+		if attributeID == attributeIdPackageName:
+			self.name = value
+		elif attributeID == attributeIdPackageVersionMajor:
+			self.version = self._versionString(value, children)
+		elif attributeID == attributeIdPackageArchitecture:
+			if value >= len(architectureNames):
+				raise HpkgFormatError('%s: invalid architecture %d'
+					% (self.path, value))
+			self.architecture = architectureNames[value]
+		elif attributeID == attributeIdPackageInstallPath:
+			self.installPath = value
+		elif attributeID == attributeIdPackageBasePackage:
+			self.basePackage = value
+		elif attributeID == attributeIdPackageFlags:
+			self.flags = value
+		elif attributeID == attributeIdPackageProvides:
+			self.provides.append(self._providesString(value, children))
+		elif attributeID == attributeIdPackageRequires:
+			self.requires.append(self._expressionString(value, children))
+		elif attributeID == attributeIdPackageSupplements:
+			self.supplements.append(self._expressionString(value, children))
+		elif attributeID == attributeIdPackageConflicts:
+			self.conflicts.append(self._expressionString(value, children))
+		elif attributeID == attributeIdPackageFreshens:
+			self.freshens.append(self._expressionString(value, children))
+		elif attributeID == attributeIdPackageReplaces:
+			self.replaces.append(value)
+
+	def _versionString(self, major, children):
+		minor = micro = preRelease = None
+		revision = 0
+		for attributeID, value, _ in children:
+			if attributeID == attributeIdPackageVersionMinor:
+				minor = value
+			elif attributeID == attributeIdPackageVersionMicro:
+				micro = value
+			elif attributeID == attributeIdPackageVersionPreRelease:
+				preRelease = value
+			elif attributeID == attributeIdPackageVersionRevision:
+				revision = value
+
+		version = major
+		if minor:
+			version += '.' + minor
+			if micro:
+				version += '.' + micro
+		if preRelease:
+			version += '~' + preRelease
+		if revision > 0:
+			version += '-' + str(revision)
+		return version
+
+	def _providesString(self, name, children):
+		result = name
+		for attributeID, value, versionChildren in children:
+			if attributeID == attributeIdPackageVersionMajor:
+				result += ' = ' + self._versionString(value, versionChildren)
+		for attributeID, value, versionChildren in children:
+			if attributeID == attributeIdPackageProvidesCompatible:
+				result += ' (compatible >= %s)' \
+					% self._versionString(value, versionChildren)
+		return result
+
+	def _expressionString(self, name, children):
+		operator = version = None
+		for attributeID, value, versionChildren in children:
+			if attributeID == attributeIdPackageResolvableOperator:
+				if value >= len(operatorNames):
+					raise HpkgFormatError('%s: invalid operator %d'
+						% (self.path, value))
+				operator = operatorNames[value]
+			elif attributeID == attributeIdPackageVersionMajor:
+				version = self._versionString(value, versionChildren)
+
+		if operator is None or version is None:
+			return name
+		return '%s %s %s' % (name, operator, version)
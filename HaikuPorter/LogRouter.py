@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021, Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+
+# -- Modules ------------------------------------------------------------------
+
+import logging
+import threading
+
+# -- LogRouter class ----------------------------------------------------------
+
+class LogRouter(logging.Handler):
+	"""Logging handler passing each record on to the handler registered for
+	   the thread that logged it. Records of other threads go to the given
+	   fallback handlers, usually the ones the logger had before.
+
+	   This replaces adding a handler with a thread filter to the shared
+	   logger for every build: a record costs a single lookup however many
+	   builds are running, and the handlers of the logger never change while
+	   records are being logged."""
+
+	def __init__(self, fallbackHandlers=()):
+		super().__init__()
+		self.fallbackHandlers = list(fallbackHandlers)
+		self._handlers = {}
+		self._handlersLock = threading.Lock()
+
+	def setThreadHandler(self, handler):
+		"""Routes the records logged by the current thread to the given
+		   handler"""
+
+		with self._handlersLock:
+			self._handlers[threading.get_ident()] = handler
+
+	def removeThreadHandler(self, handler):
+		"""Stops routing records to the given handler, from any thread"""
+
+		with self._handlersLock:
+			self._handlers = {ident: threadHandler
+				for ident, threadHandler in self._handlers.items()
+				if threadHandler is not handler}
+
+	def handle(self, record):
+		# no locking needed, the handler does its own
+		handler = self._handlers.get(threading.get_ident())
+		if handler is not None:
+			return handler.handle(record)
+
+		for fallbackHandler in self.fallbackHandlers:
+			if record.levelno >= fallbackHandler.level:
+				fallbackHandler.handle(record)
+		return bool(self.fallbackHandlers)
+
+	def emit(self, record):
+		self.handle(record)
@@ -99,6 +99,7 @@ class Main(object):
 			or self.options.analyzeDependencies
 			or self.options.checkPackageRepositoryConsistency
 			or self.options.checkRepositoryConsistency
+			or self.options.verifyRecipeEvaluator
 			or self.options.checkPortsReleases)
 
 		# init build platform
@@ -129,6 +130,11 @@ class Main(object):
 				self.repository.checkRepositoryConsistency(self.options.verbose)
 			return
 
+		if self.options.verifyRecipeEvaluator:
+			self._createRepositoryIfNeeded(True)
+			self.repository.verifyRecipeEvaluator()
+			return
+
 		if self.options.purgeStalePorts:
 			self._createRepositoryIfNeeded(self.options.quiet)
 			self.repository.purgeStalePorts()
@@ -145,7 +151,7 @@ class Main(object):
 				self.repository, self.options.quiet, self.options.verbose)
 
 			if self.options.prunePackageRepository:
-				packageRepository.prune()
+				packageRepository.prune(self.options.pruneDryRun)
 
 			if self.options.checkPackageRepositoryConsistency:
 				packageRepository.checkPackageRepositoryConsistency()
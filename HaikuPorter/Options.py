@@ -286,6 +286,17 @@ def parseOptions():
 		dest='noSystemPackages', default=False,
 		help='do not use system packages to resolve dependencies')
 
+	advanced_flags.add_option('--recipe-evaluator', action='store',
+		type='choice', choices=['oneshot', 'persistent', 'python'],
+		dest='recipeEvaluator', default='python',
+		help='how recipes are evaluated: "oneshot" starts a new shell per '
+			'recipe, "persistent" reuses long-lived shells, "python" (the '
+			'default) evaluates plain assignments without any shell and '
+			'falls back to "persistent" for everything else')
+	advanced_flags.add_option('--verify-recipe-evaluator', action='store_true',
+		dest='verifyRecipeEvaluator', default=False,
+		help='evaluate all recipes with both the python evaluator and bash '
+			'and report any differences')
 	advanced_flags.add_option('--repository-update', action='store_true',
 		dest='repositoryUpdate', default=False,
 		help='update dependency infos in the repository')
@@ -304,6 +315,10 @@ def parseOptions():
 	advanced_flags.add_option('--prune-package-repository', action='store_true',
 		dest='prunePackageRepository', default=False,
 		help='prune the package repository')
+	advanced_flags.add_option('--prune-dry-run', action='store_true',
+		dest='pruneDryRun', default=False,
+		help='only list the packages --prune-package-repository would '
+			'obsolete')
 	advanced_flags.add_option('--create-package-repository', action='store',
 		type='string', dest='createPackageRepository', default=None,
 		help='create a package repository at the given output path')
@@ -344,11 +359,21 @@ def parseOptions():
 	buildmaster_flags.add_option('--build-master-output-dir', action='store',
 		type='string', dest='buildMasterOutputDir', default=None,
 		help='specifies where build master output shall be written')
+	buildmaster_flags.add_option('--build-master-records-dir', action='store',
+		type='string', dest='buildMasterRecordsDir', default=None,
+		help='specifies a directory with the build records of earlier '
+			'buildruns to initialize the build history from')
 	buildmaster_flags.add_option('--reporting-uri', action='store', type='string',
 		dest='reportingURI', default=None,
 		help='specifies an optional remote reporting server (ex: mongodb://)')
 	buildmaster_flags.add_option('--local-builders', action='store', type='int',
 		dest='localBuilders', default=0, help='number of local builders (native Haiku only)')
+	buildmaster_flags.add_option('--build-scheduling', action='store',
+		type='choice', choices=['critical-path', 'fifo'],
+		dest='buildScheduling', default='critical-path',
+		help='the order in which buildable ports are built: "critical-path" '
+			'(the default) prefers ports with long chains of dependent '
+			'builds, "fifo" builds them in the order they became buildable')
 
 	parser.add_option_group(basic_actions)
 	parser.add_option_group(basic_flags)
@@ -28,7 +28,8 @@ from .RecipeTypes import Architectures, Status
 from .ShellScriptlets import getScriptletPrerequirements
 from .Utils import (ensureCommandIsAvailable, escapeForPackageInfo,
                     haikuporterRepoUrl, haikuportsRepoUrl, info,
-                    naturalCompare, sysExit, touchFile, warn)
+                    naturalCompare, readStringFromFile, storeStringInFile,
+                    sysExit, touchFile, warn)
 
 # -- The supported package types ----------------------------------------------
 
@@ -482,58 +483,65 @@ class Package(object):
 		architecture = kwargs.get('architecture', self.architecture)
 		fakeProvides = kwargs.get('fakeProvides', False)
 
+		dependencyInfo = {
+			'name': self.name,
+			'version': self.version,
+			'architecture': architecture,
+			'provides': self.recipeKeys['PROVIDES'],
+			'requires': [],
+			'buildRequires': [],
+			'buildPrerequires': [],
+			'testRequires': []
+		}
+
+		if fakeProvides:
+			dependencyInfo['provides'] = []
+
+		requiresKeyMap = {
+			'BUILD_REQUIRES': 'buildRequires',
+			'BUILD_PREREQUIRES': 'buildPrerequires',
+			'TEST_REQUIRES': 'testRequires',
+			'REQUIRES': 'requires',
+			'SCRIPTLET_PREREQUIRES': 'buildPrerequires',
+		}
+		for requiresKey in requiresToUse:
+			if requiresKey == 'SCRIPTLET_PREREQUIRES':
+				# Add prerequirements for executing chroot scriptlets.
+				# For cross-built packages, pass in the target machine name,
+				# but take care to not do that for packages that implement
+				# the cross-building themselves (i.e. binutils and gcc),
+				# as those are running in the context of the build machine.
+				targetMachineTripleAsName = self.targetMachineTripleAsName
+				if (Configuration.isCrossBuildRepository()
+					and '_cross_' in self.name):
+					targetMachineTripleAsName = ''
+				requiresForKey = getScriptletPrerequirements(
+					targetMachineTripleAsName)
+			else:
+				requiresForKey = self.recipeKeys[requiresKey]
+
+			requiresList = dependencyInfo[requiresKeyMap[requiresKey]]
+			for require in requiresForKey:
+				require = require.partition('#')[0].strip()
+				if require and require not in requiresList:
+					requiresList.append(require)
+
+		dependencyInfoString = json.dumps(dependencyInfo, sort_keys=True,
+			indent=4, separators=(',', ' : ')) + '\n'
+
+		# Leave an unchanged file alone, such that consumers of the
+		# repository don't see spurious updates.
+		if (os.path.isfile(dependencyInfoPath)
+			and not os.path.islink(dependencyInfoPath)
+			and readStringFromFile(dependencyInfoPath) == dependencyInfoString):
+			return
+
 		# If it exists, remove the file first. Otherwise we might write to the
 		# wrong file, if it is a symlink.
-		if os.path.exists(dependencyInfoPath):
+		if os.path.lexists(dependencyInfoPath):
 			os.remove(dependencyInfoPath)
 
-		with codecs.open(dependencyInfoPath, 'w', 'utf-8') as infoFile:
-			dependencyInfo = {
-				'name': self.name,
-				'version': self.version,
-				'architecture': architecture,
-				'provides': self.recipeKeys['PROVIDES'],
-				'requires': [],
-				'buildRequires': [],
-				'buildPrerequires': [],
-				'testRequires': []
-			}
-
-			if fakeProvides:
-				dependencyInfo['provides'] = []
-
-			requiresKeyMap = {
-				'BUILD_REQUIRES': 'buildRequires',
-				'BUILD_PREREQUIRES': 'buildPrerequires',
-				'TEST_REQUIRES': 'testRequires',
-				'REQUIRES': 'requires',
-				'SCRIPTLET_PREREQUIRES': 'buildPrerequires',
-			}
-			for requiresKey in requiresToUse:
-				if requiresKey == 'SCRIPTLET_PREREQUIRES':
-					# Add prerequirements for executing chroot scriptlets.
-					# For cross-built packages, pass in the target machine name,
-					# but take care to not do that for packages that implement
-					# the cross-building themselves (i.e. binutils and gcc),
-					# as those are running in the context of the build machine.
-					targetMachineTripleAsName = self.targetMachineTripleAsName
-					if (Configuration.isCrossBuildRepository()
-						and '_cross_' in self.name):
-						targetMachineTripleAsName = ''
-					requiresForKey = getScriptletPrerequirements(
-						targetMachineTripleAsName)
-				else:
-					requiresForKey = self.recipeKeys[requiresKey]
-
-				requiresList = dependencyInfo[requiresKeyMap[requiresKey]]
-				for require in requiresForKey:
-					require = require.partition('#')[0].strip()
-					if require and require not in requiresList:
-						requiresList.append(require)
-
-			json.dump(dependencyInfo, infoFile, sort_keys=True,
-				indent=4, separators=(',', ' : '))
-			infoFile.write('\n')
+		storeStringInFile(dependencyInfoString, dependencyInfoPath)
 
 # -- A source package ---------------------------------------------------------
 
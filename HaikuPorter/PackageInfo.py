@@ -8,24 +8,15 @@
 import codecs
 import json
 import os
-import pickle
-import shutil
 import re
-from copy import deepcopy
+import threading
 from subprocess import check_output
 
 from .Configuration import Configuration
+from .HpkgInfoCache import HpkgInfoCache
+from .HpkgReader import HpkgFormatError, HpkgReader
 from .Utils import sysExit
 
-def pickleCacheBackup():
-	hpkgCacheDir = Configuration.getRepositoryPath()
-	hpkgCachePath = os.path.join(hpkgCacheDir, 'hpkgInfoCache')
-	hpkgCachePathBackup = os.path.join(hpkgCacheDir, 'hpkgInfoCache.backup')
-	if os.path.exists(hpkgCachePath):
-		if os.path.exists(hpkgCachePathBackup):
-			os.remove(hpkgCachePathBackup)
-		shutil.copy(hpkgCachePath, hpkgCachePathBackup)
-
 # -- Resolvable class ---------------------------------------------------------
 
 class Resolvable(object):
@@ -74,8 +65,7 @@ class ResolvableExpression(object):
 
 class PackageInfo(object):
 	hpkgCache = None
-	hpkgCacheDir = None
-	hpkgCachePath = None
+	_hpkgCacheLock = threading.Lock()
 
 	def __init__(self, path):
 		self.path = path
@@ -92,60 +82,64 @@ class PackageInfo(object):
 		return self.name + '-' + self.version
 
 	@classmethod
-	def _initializeCache(cls):
-		cls.hpkgCache = {}
-		cls.hpkgCacheDir = Configuration.getRepositoryPath()
-		cls.hpkgCachePath = os.path.join(cls.hpkgCacheDir, 'hpkgInfoCache')
-		if not os.path.exists(cls.hpkgCachePath):
+	def _getHpkgCache(cls):
+		with cls._hpkgCacheLock:
+			if cls.hpkgCache is None:
+				cls.hpkgCache = HpkgInfoCache(
+					Configuration.getRepositoryPath())
+			return cls.hpkgCache
+
+	def _parseFromHpkgOrPackageInfoFile(self, silent=False):
+		if not self.path.endswith('.hpkg'):
+			self._parsePackageListing(self._listPackage(silent))
 			return
 
-		prune = False
-		with open(cls.hpkgCachePath, 'rb') as cacheFile:
-			while True:
-				try:
-					entry = pickle.load(cacheFile)
-					path = entry['path']
-					if not os.path.exists(path) \
-						or (os.path.getsize(path) != 0 \
-							and os.path.getmtime(path) > entry['modifiedTime']):
-						prune = True
-						continue
-
-					cls.hpkgCache[path] = entry
-				except EOFError:
-					break
-
-		if prune:
-			with open(cls.hpkgCachePath, 'wb') as cacheFile:
-				for entry in cls.hpkgCache.values():
-					pickle.dump(entry, cacheFile, pickle.HIGHEST_PROTOCOL)
+		# the attributes are shared with the cache, so they are not copied
+		cached = PackageInfo._getHpkgCache().get(self.path)
+		if cached is not None:
+			self.__dict__.update(cached)
+			return
 
-	@classmethod
-	def _writeToCache(cls, packageInfo):
-		cls.hpkgCache[packageInfo['path']] = deepcopy(packageInfo)
-		if not os.path.exists(cls.hpkgCacheDir):
-			os.makedirs(cls.hpkgCacheDir)
+		try:
+			self._parseFromHpkgFile()
+		except HpkgFormatError:
+			# leave packages the reader can't handle to the package command
+			self._parsePackageListing(self._listPackage(silent))
 
-		with open(cls.hpkgCachePath, 'ab') as cacheFile:
-			pickle.dump(packageInfo, cacheFile, pickle.HIGHEST_PROTOCOL)
+		PackageInfo._getHpkgCache().put(self.path, self.__dict__)
 
-	def _parseFromHpkgOrPackageInfoFile(self, silent=False):
-		if self.path.endswith('.hpkg'):
-			if PackageInfo.hpkgCache is None:
-				PackageInfo._initializeCache()
+	def _parseFromHpkgFile(self):
+		reader = HpkgReader(self.path)
 
-			if self.path in PackageInfo.hpkgCache:
-				self.__dict__ = deepcopy(PackageInfo.hpkgCache[self.path])
-				return
+		# get various single-occurrence fields
+		for fieldName in ['name', 'version', 'architecture']:
+			if not getattr(reader, fieldName):
+				sysExit('Failed to get %s of package "%s"'
+					% (fieldName, self.path))
+		self.name = reader.name
+		self.version = reader.version
+		self.architecture = reader.architecture
+		self.installPath = reader.installPath
+
+		# get provides and requires (no buildrequires or -prerequires exist)
+		self.provides = [Resolvable(p) for p in reader.provides]
+		self.requires = [
+			ResolvableExpression(r, True) for r in reader.requires
+		]
+		self.buildRequires = []
+		self.buildPrerequires = []
+		self.testRequires = []
+
+	def _listPackage(self, silent):
+		"""Returns an attribute listing of the package/package info file"""
 
-		# get an attribute listing of the package/package info file
 		args = [Configuration.getPackageCommand(), 'list', '-i', self.path]
 		if silent:
 			with open(os.devnull, "w") as devnull:
-				output = check_output(args, stderr=devnull).decode('utf-8')
-		else:
-			output = check_output(args).decode('utf-8')
+				return check_output(args, stderr=devnull).decode('utf-8')
+		return check_output(args).decode('utf-8')
 
+	def _parsePackageListing(self, output):
 		# get various single-occurrence fields
 		self.name = self._extractField(output, 'name')
 		self.version = self._extractField(output, 'version')
@@ -166,10 +160,6 @@ class PackageInfo(object):
 				self.requires.append(ResolvableExpression(line[9:].lstrip(),
 					True))
 
-		if self.path.endswith('.hpkg'):
-			self.modifiedTime = os.path.getmtime(self.path)
-			PackageInfo._writeToCache(self.__dict__)
-
 	def _parseFromDependencyInfoFile(self):
 		with codecs.open(self.path, 'r', 'utf-8') as fh:
 			dependencyInfo = json.load(fh)
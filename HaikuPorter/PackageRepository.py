@@ -11,12 +11,14 @@ import json
 import os
 import shutil
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from .Configuration import Configuration
 from .DependencyResolver import DependencyResolver
 from .Options import getOption
 from .PackageInfo import PackageInfo
-from .Utils import info, prefixLines, sysExit, versionCompare, warn
+from .Utils import VersionKey, info, prefixLines, sysExit, warn
 
 # -- PackageRepository class --------------------------------------------------
 
@@ -41,10 +43,44 @@ class PackageRepository(object):
 		self._storageBackendInitialized = False
 		self._storageBackend = None
 
-	def prune(self):
-		self.obsoletePackagesWithoutPort()
-		self.obsoletePackagesNewerThanActiveVersion()
-		self.obsoletePackagesWithNewerVersions()
+		# package infos by path, along with the stat signature of the package
+		# they were read from
+		self._packageInfos = {}
+		self._packageInfosLock = threading.Lock()
+
+	def prune(self, dryRun=False):
+		self._obsoletePackages(self.prunePlan(), dryRun)
+
+	def prunePlan(self, checks=None):
+		"""Returns the packages to be obsoleted by the given checks (all of
+		   them by default) as a list of (path, reason) in the order the
+		   checks are listed. Each check only sees the packages that are left
+		   over by the previous ones. The package infos are only collected
+		   once and the active port of each port only looked up once."""
+
+		if checks is None:
+			checks = [self._packagesWithoutPort,
+				self._packagesNewerThanActiveVersion,
+				self._packagesWithNewerVersions]
+
+		activePorts = {}
+		def activePortFor(packageName):
+			portName = self.repository.getPortNameForPackageName(packageName)
+			if portName not in activePorts:
+				activePorts[portName] = self.repository.getActivePort(portName)
+			return activePorts[portName]
+
+		packages = list(self.packageInfos())
+
+		plan = []
+		for check in checks:
+			obsoletions = check(packages, activePortFor)
+			obsoletePaths = set(path for path, _ in obsoletions)
+			packages = [package for package in packages
+				if package.path not in obsoletePaths]
+			plan += obsoletions
+
+		return plan
 
 	def packageName(self, packagePath):
 		return os.path.basename(packagePath)
@@ -113,20 +149,59 @@ class PackageRepository(object):
 		os.rename(temporaryPath, packagePath)
 
 	def packageInfoList(self, packageSpec=None):
-		result = []
-		for package in self.packageList(packageSpec):
-			try:
-				packageInfo = PackageInfo(package)
-			except Exception as exception:
-				warn('failed to get info of {}: {}'.format(package, exception))
-				continue
-
-			if packageInfo.architecture not in self.architectures:
-				continue
+		return list(self.packageInfos(packageSpec))
+
+	def packageInfos(self, packageSpec=None):
+		"""Yields the infos of the packages for the supported architectures in
+		   the order of packageList(). The infos are loaded on a pool of
+		   worker threads, so the first ones can be processed while the
+		   remaining ones are still being loaded."""
+
+		packages = self.packageList(packageSpec)
+		jobs = min(getOption('jobs'), len(packages))
+		if jobs > 1:
+			executor = ThreadPoolExecutor(jobs)
+			results = executor.map(self._loadPackageInfo, packages)
+		else:
+			executor = None
+			results = map(self._loadPackageInfo, packages)
+
+		try:
+			for package, packageInfo in zip(packages, results):
+				if isinstance(packageInfo, Exception):
+					warn('failed to get info of {}: {}'.format(package,
+						packageInfo))
+					continue
 
-			result.append(packageInfo)
+				if packageInfo.architecture not in self.architectures:
+					continue
 
-		return result
+				yield packageInfo
+		finally:
+			if executor is not None:
+				executor.shutdown(cancel_futures=True)
+
+	def _loadPackageInfo(self, packagePath):
+		"""Returns the info of the given package, reusing the one read before
+		   if the package hasn't changed since, or the exception that occurred
+		   while reading it"""
+
+		try:
+			packageStat = os.stat(packagePath)
+			signature = (packageStat.st_size, packageStat.st_mtime_ns,
+				packageStat.st_ino)
+			with self._packageInfosLock:
+				cached = self._packageInfos.get(packagePath)
+			if cached is not None and cached[0] == signature:
+				return cached[1]
+
+			packageInfo = PackageInfo(packagePath)
+		except Exception as exception:
+			return exception
+
+		with self._packageInfosLock:
+			self._packageInfos[packagePath] = (signature, packageInfo)
+		return packageInfo
 
 	def obsoletePackage(self, path, reason=None):
 		packageFileName = self.packageName(path)
@@ -144,43 +219,74 @@ class PackageRepository(object):
 	def obsoletePackagesWithoutPort(self):
 		"""remove packages that have no corresponding port"""
 
-		for package in self.packageInfoList():
-			portName = self.repository.getPortNameForPackageName(package.name)
-			activePort = self.repository.getActivePort(portName)
-			if not activePort:
-				self.obsoletePackage(package.path, 'no port for it exists')
+		self._obsoletePackages(self.prunePlan([self._packagesWithoutPort]))
 
 	def obsoletePackagesNewerThanActiveVersion(self):
 		"""remove packages newer than what their active port version produces"""
 
-		for package in self.packageInfoList():
-			portName = self.repository.getPortNameForPackageName(package.name)
-			activePort = self.repository.getActivePort(portName)
+		self._obsoletePackages(
+			self.prunePlan([self._packagesNewerThanActiveVersion]))
+
+	def obsoletePackagesWithNewerVersions(self):
+		"""remove all packages where newer version packages are available"""
+
+		self._obsoletePackages(
+			self.prunePlan([self._packagesWithNewerVersions]))
+
+	def _obsoletePackages(self, plan, dryRun=False):
+		"""Obsoletes the packages of the given plan (see prunePlan()) in one
+		   go, after listing them. With dryRun they are only listed."""
+
+		if dryRun:
+			for path, reason in plan:
+				print('\twould obsolete package {}: {}'.format(
+					self.packageName(path), reason))
+			return
+
+		if not self.quiet:
+			for path, reason in plan:
+				print('\tobsoleting package {}: {}'.format(
+					self.packageName(path), reason))
+
+		for path, _ in plan:
+			os.rename(path,
+				os.path.join(self.obsoleteDir, self.packageName(path)))
+
+	def _packagesWithoutPort(self, packages, activePortFor):
+		return [(package.path, 'no port for it exists')
+			for package in packages if not activePortFor(package.name)]
+
+	def _packagesNewerThanActiveVersion(self, packages, activePortFor):
+		result = []
+		for package in packages:
+			activePort = activePortFor(package.name)
 			if not activePort:
 				continue
 
-			if versionCompare(package.version, activePort.fullVersion) > 0:
-				self.obsoletePackage(package.path,
-					'newer than active {}'.format(activePort.fullVersion))
+			if VersionKey(package.version) > VersionKey(activePort.fullVersion):
+				result.append((package.path,
+					'newer than active {}'.format(activePort.fullVersion)))
 
-	def obsoletePackagesWithNewerVersions(self):
-		"""remove all packages where newer version packages are available"""
+		return result
 
+	def _packagesWithNewerVersions(self, packages, activePortFor):
+		result = []
 		newestPackages = dict()
 		reason = 'newer version {} available'
-		for package in self.packageInfoList():
+		for package in packages:
 			if package.name in newestPackages:
 				newest = newestPackages[package.name]
-				if versionCompare(newest.version, package.version) > 0:
-					self.obsoletePackage(package.path,
-						reason.format(newest.version))
+				if VersionKey(newest.version) > VersionKey(package.version):
+					result.append((package.path,
+						reason.format(newest.version)))
 					continue
 
-				self.obsoletePackage(newest.path,
-					reason.format(package.version))
+				result.append((newest.path, reason.format(package.version)))
 
 			newestPackages[package.name] = package
 
+		return result
+
 	def createPackageRepository(self, outputPath):
 		packageRepoCommand = Configuration.getPackageRepoCommand()
 		if not packageRepoCommand:
@@ -301,7 +407,7 @@ class PackageRepository(object):
 		resolver = DependencyResolver(None, ['REQUIRES'], repositories,
 			quiet=True)
 
-		for package in self.packageInfoList():
+		for package in self.packageInfos():
 			if self.verbose:
 				print('checking package {}'.format(package.path))
 
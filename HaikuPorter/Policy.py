@@ -11,7 +11,7 @@ import re
 from subprocess import check_output
 
 from .ConfigParser import ConfigParser
-from .Configuration import Configuration
+from .PackageInfo import PackageInfo
 from .Utils import isCommandAvailable, sysExit, warn
 
 allowedWritableTopLevelDirectories = [
@@ -370,24 +370,13 @@ class Policy(object):
 			return None
 
 	def _getPackageProvides(self, package):
-		# get the package listing
 		try:
-			with open(os.devnull, "w") as devnull:
-				output = check_output(
-					[Configuration.getPackageCommand(), 'list', package],
-					stderr=devnull).decode('utf-8')
+			packageInfo = PackageInfo(package)
 		except:
 			return None
 
-		# extract the provides
-		provides = []
-		for line in output.split('\n'):
-			index = line.find('provides:')
-			if index >= 0:
-				index += 9
-				provides.append(line[index:].strip())
-
-		return self._parseResolvableExpressionList(provides)
+		return self._parseResolvableExpressionList(
+			[str(provides) for provides in packageInfo.provides])
 
 	def _checkMisplacedDevelopLibraries(self):
 		libDir = os.path.join(self.package.packagingDir,
@@ -13,7 +13,7 @@
 # -- Modules ------------------------------------------------------------------
 
 import codecs
-import json
+import hashlib
 import os
 import re
 import shutil
@@ -77,7 +77,8 @@ class Port(object):
 	testRequiresTypes = buildRequiresTypes + ['TEST_REQUIRES']
 
 	_repositoryDir = None
-	_recipeCacheDirName = 'recipeCache'
+	_repositoryStore = None
+	_availableLicenses = None
 
 	def __init__(self, name, version, category, baseDir, outputDir,
 		globalShellVariables, policy, secondaryArchitecture=None):
@@ -109,13 +110,12 @@ class Port(object):
 		self.recipeFilePath = self.baseDir + '/' + self.baseName + '-' \
 			+ self.version + '.recipe'
 
-		self.dependencyInfoMarkerName = self.versionedName + '.DependencyInfoMarker'
-
 		self.revision = None
 		self.fullVersion = None
 		self.revisionedName = None
 
 		self.definedPhases = []
+		self._recipeHash = None
 
 		# build dictionary of variables to inherit to shell
 		self.shellVariables = {
@@ -173,16 +173,19 @@ class Port(object):
 		self.requiresUpdater = None
 
 	@classmethod
-	def setRepositoryDir(cls, repsitoryDir):
+	def setRepositoryDir(cls, repsitoryDir, repositoryStore=None):
 		cls._repositoryDir = repsitoryDir
+		cls._repositoryStore = repositoryStore
 
 	def temporaryRepositoryDir(self, repsitoryDir):
 		class TemporaryRepositorySetter(object):
 			def __enter__(_):
 				self._repositoryDir = repsitoryDir
+				self._repositoryStore = None
 
 			def __exit__(*_):
 				del self._repositoryDir
+				del self._repositoryStore
 
 		return TemporaryRepositorySetter()
 
@@ -227,16 +230,26 @@ class Port(object):
 
 		self._parseRecipeFile(showWarnings)
 
-	def validateRecipeFile(self, showWarnings=False):
-		"""Validate the syntax and contents of the recipe file"""
+	def compareRecipeEvaluators(self):
+		"""Evaluates the recipe with the python evaluator as well as with bash,
+		   returns both outputs (the former being None if the recipe needs
+		   bash)"""
+
+		self.shellVariables['SOURCE_DIR'] = self.baseName + '-' + self.version
+		self._prepareRecipeFile()
+		return ConfigParser.compareEvaluators(self.preparedRecipeFile,
+			self._recipeAttributes(), self.shellVariables)
+
+	def _prepareRecipeFile(self):
+		"""Copies the recipe file into the work directory, preparing it for
+		   use by the config file evaluator"""
 
-		## REFACTOR this into a separate method
 		if not os.path.exists(self.recipeFilePath):
 			sysExit(self.name + ' version ' + self.version + ' not found.')
 
-		# copy the recipe file and prepare it for use
 		if not os.path.exists(os.path.dirname(self.preparedRecipeFile)):
-			os.makedirs(os.path.dirname(self.preparedRecipeFile))
+			os.makedirs(os.path.dirname(self.preparedRecipeFile),
+				exist_ok=True)
 
 		with codecs.open(self.recipeFilePath, 'r', 'utf-8') as fi:
 			with codecs.open(self.preparedRecipeFile, 'w', 'utf-8') as fo:
@@ -245,13 +258,22 @@ class Port(object):
 					newline = p.sub(r'\1; updateRevisionVariables ', line)
 					fo.write(newline)
 
-		# adjust recipe attributes for meta ports
+	def _recipeAttributes(self):
+		"""Returns the recipe attributes, adjusted for meta ports"""
+
 		recipeAttributes = getRecipeAttributes()
 		if self.isMetaPort:
 			recipeAttributes['HOMEPAGE']['required'] = False
 			recipeAttributes['SOURCE_URI']['required'] = False
+		return recipeAttributes
+
+	def validateRecipeFile(self, showWarnings=False):
+		"""Validate the syntax and contents of the recipe file"""
+
+		self._prepareRecipeFile()
 
 		# parse the recipe file
+		recipeAttributes = self._recipeAttributes()
 		recipeConfig = ConfigParser(self.preparedRecipeFile, recipeAttributes,
 									self.shellVariables)
 		extensions = recipeConfig.extensions
@@ -507,21 +529,88 @@ class Port(object):
 	def writeDependencyInfosIntoRepository(self):
 		"""Write one DependencyInfo-file per package into the repository"""
 		self.parseRecipeFileIfNeeded()
+		store = self._repositoryStore
 		for package in self.packages:
 			package.writeDependencyInfoIntoRepository(self._repositoryDir)
+			if store is not None:
+				store.setDependencyInfo(package.versionedName,
+					self.versionedName)
 
-		dependencyInfoMarkerFile = os.path.join(self._repositoryDir, self.dependencyInfoMarkerName)
-		touchFile(dependencyInfoMarkerFile)
+		if store is not None:
+			store.setDependencyInfoMarker(self.versionedName, self.recipeHash)
 
 	def removeDependencyInfosFromRepository(self):
 		"""Remove all DependencyInfo-files for this port from the repository"""
 		self.parseRecipeFileIfNeeded()
+		store = self._repositoryStore
 		for package in self.packages:
 			package.removeDependencyInfoFromRepository(self._repositoryDir)
+			if store is not None:
+				store.removeDependencyInfo(package.versionedName)
+
+		if store is not None:
+			store.removeDependencyInfoMarker(self.versionedName)
 
-		dependencyInfoMarkerFile = os.path.join(self._repositoryDir, self.dependencyInfoMarkerName)
-		if os.path.exists(dependencyInfoMarkerFile):
-			os.remove(dependencyInfoMarkerFile)
+	@property
+	def recipeHash(self):
+		"""A hash over everything the evaluation of the recipe depends on: the
+		   recipe itself, its patches, the available licenses and the relevant
+		   global settings"""
+
+		if self._recipeHash is None:
+			recipeHash = hashlib.sha256()
+			with open(self.recipeFilePath, 'rb') as recipeFile:
+				recipeHash.update(recipeFile.read())
+
+			# the patches referenced by PATCHES are only known once the recipe
+			# has been evaluated, so all patches of the port are included
+			if self.patchesDir and os.path.exists(self.patchesDir):
+				for patchFilePath in self._patchFilePaths():
+					recipeHash.update(b'\0patch\0' + os.path.relpath(
+						patchFilePath, self.patchesDir).encode('utf-8') + b'\0')
+					with open(patchFilePath, 'rb') as patchFile:
+						recipeHash.update(patchFile.read())
+
+			licenses = list(self._availableLicenseNames())
+			if self.licensesDir and os.path.exists(self.licensesDir):
+				licenses += os.listdir(self.licensesDir)
+
+			recipeHash.update(('\0licenses\0%s\0%s\0%s\0%s' % (
+				'|'.join(sorted(licenses)), self.effectiveTargetArchitecture,
+				self.secondaryArchitecture, Configuration.getPackager())
+				).encode('utf-8'))
+			self._recipeHash = recipeHash.hexdigest()
+
+		return self._recipeHash
+
+	def _patchFilePaths(self):
+		"""Returns the paths of all files in the patches directory (and its
+		   subdirectories), sorted"""
+
+		patchFilePaths = []
+		for directory, subdirectories, fileNames in os.walk(self.patchesDir):
+			subdirectories.sort()
+			patchFilePaths += [os.path.join(directory, fileName)
+				for fileName in sorted(fileNames)]
+		return patchFilePaths
+
+	@staticmethod
+	def _availableLicenseNames():
+		"""Returns the names of the licenses provided by the build platform,
+		   which are cached as long as their directory isn't modified"""
+
+		licensesDirectory = buildPlatform.getLicensesDirectory()
+		try:
+			modificationTime = os.stat(licensesDirectory).st_mtime_ns
+		except OSError:
+			return []
+
+		cacheKey = (licensesDirectory, modificationTime)
+		availableLicenses = Port._availableLicenses
+		if availableLicenses is None or availableLicenses[0] != cacheKey:
+			availableLicenses = (cacheKey, os.listdir(licensesDirectory))
+			Port._availableLicenses = availableLicenses
+		return availableLicenses[1]
 
 	@property
 	def mainPackage(self):
@@ -975,34 +1064,33 @@ class Port(object):
 		return os.path.exists('%s/flag.%s-%s' % (self.workDir, name, index))
 
 	def _validateOrLoadFromCache(self, showWarnings):
-		recipeCacheDir = os.path.join(self._repositoryDir,
-			Port._recipeCacheDirName)
-		recipeCacheFile = os.path.join(recipeCacheDir, self.name + '-'
-			+ self.version + '-' + self.effectiveTargetArchitecture)
-
-		if (os.path.exists(self.preparedRecipeFile)
-			and os.path.exists(recipeCacheFile)
-			and os.path.getmtime(recipeCacheFile)
-				>= os.path.getmtime(self.recipeFilePath)):
-			with codecs.open(recipeCacheFile, 'r', 'utf-8') as cacheFile:
-				cached = json.loads(cacheFile.read())
+		store = self._repositoryStore
+		if store is None:
+			return self.validateRecipeFile(showWarnings)
+
+		cacheID = (self.name + '-' + self.version + '-'
+			+ self.effectiveTargetArchitecture)
+
+		# the cache is valid as long as the recipe hash is unchanged, which
+		# (unlike the mtime) survives a fresh checkout of the tree
+		if os.path.exists(self.preparedRecipeFile):
+			cached = store.getCachedRecipe(cacheID, self.recipeHash)
+			if cached is not None:
 				if 'exception' in cached:
 					sysExit(cached['exception'])
-				return cached
-
-		if not os.path.exists(recipeCacheDir):
-			os.makedirs(recipeCacheDir)
+				return cached['recipeKeysByExtension'], cached['definedPhases']
 
 		try:
 			recipeKeysByExtension, definedPhases \
 				= self.validateRecipeFile(showWarnings)
 		except SystemExit as exception:
-			with codecs.open(recipeCacheFile, 'w', 'utf-8') as cacheFile:
-				cacheFile.write(json.dumps({'exception': str(exception)}))
+			store.setCachedRecipe(cacheID, self.versionedName, self.recipeHash,
+				{'exception': str(exception)})
 			raise
 
-		with codecs.open(recipeCacheFile, 'w', 'utf-8') as cacheFile:
-			cacheFile.write(json.dumps((recipeKeysByExtension, definedPhases)))
+		store.setCachedRecipe(cacheID, self.versionedName, self.recipeHash,
+			{'recipeKeysByExtension': recipeKeysByExtension,
+				'definedPhases': definedPhases})
 
 		return recipeKeysByExtension, definedPhases
 
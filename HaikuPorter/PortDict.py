@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013 Oliver Tappe
+# Distributed under the terms of the MIT License.
+
+# -- Modules ------------------------------------------------------------------
+
+from collections.abc import MutableMapping
+
+from .Port import Port
+
+# -- PortDict class -----------------------------------------------------------
+
+class PortDict(MutableMapping):
+	"""Maps port-IDs to ports. Ports are only defined up front and the
+	   corresponding Port object is created when it is accessed for the
+	   first time, as creating all of them is rather expensive."""
+
+	def __init__(self, shellVariables, policy):
+		self._shellVariables = shellVariables
+		self._policy = policy
+		self._definitions = {}
+		self._ports = {}
+
+	def define(self, name, version, category, baseDir, outputDir,
+			secondaryArchitecture=None):
+		"""Defines the port with the given attributes (see Port.__init__),
+		   returns its port-ID"""
+
+		portID = name + '-' + version
+		if secondaryArchitecture:
+			portID = name + '_' + secondaryArchitecture + '-' + version
+		self._definitions[portID] = (name, version, category, baseDir,
+			outputDir, secondaryArchitecture)
+		self._ports.pop(portID, None)
+		return portID
+
+	def definition(self, portID):
+		"""Returns the tuple given to define() for the port with the given
+		   ID, without creating the port"""
+
+		return self._definitions[portID]
+
+	def category(self, portID):
+		return self._definitions[portID][2]
+
+	def __getitem__(self, portID):
+		port = self._ports.get(portID)
+		if port is None:
+			(name, version, category, baseDir, outputDir,
+				secondaryArchitecture) = self._definitions[portID]
+			port = Port(name, version, category, baseDir, outputDir,
+				self._shellVariables, self._policy, secondaryArchitecture)
+
+			# another thread may have been faster
+			port = self._ports.setdefault(portID, port)
+		return port
+
+	def __setitem__(self, portID, port):
+		self._definitions[portID] = (port.baseName, port.version,
+			port.category, port.baseDir, port.outputDir,
+			port.secondaryArchitecture)
+		self._ports[portID] = port
+
+	def __delitem__(self, portID):
+		del self._definitions[portID]
+		self._ports.pop(portID, None)
+
+	def __contains__(self, portID):
+		return portID in self._definitions
+
+	def __iter__(self):
+		return iter(self._definitions)
+
+	def __len__(self):
+		return len(self._definitions)
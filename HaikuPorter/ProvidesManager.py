@@ -6,18 +6,36 @@
 
 # -- Modules ------------------------------------------------------------------
 
+from bisect import bisect_left, bisect_right
+from itertools import count
+from math import inf
+from operator import attrgetter
+
 from . import BuildPlatform
 from .Configuration import Configuration
 from .Options import getOption
 from .PackageInfo import PackageInfo, Resolvable
-from .Utils import versionCompare
+from .Utils import VersionKey
+
+# the order in which provides have been added, across all managers
+_additionCounter = count()
 
 # -- ProvidesInfo class -------------------------------------------------------
 
 class ProvidesInfo(Resolvable):
-	def __init__(self, packageInfo, providesString):
+	def __init__(self, packageInfo, providesString, source, rank=0):
 		super(ProvidesInfo, self).__init__(providesString)
 		self.packageInfo = packageInfo
+		self.source = source
+		self.isHpkg = (packageInfo.path.endswith('.hpkg')
+			if isinstance(packageInfo, PackageInfo) else False)
+		self.versionKey = VersionKey(self.version) if self.version else None
+		self.compatibleVersionKey = (VersionKey(self.compatibleVersion)
+			if self.compatibleVersion else None)
+
+		# provides with a lower rank take precedence, within the same rank
+		# the ones added earlier do
+		self.sequence = (rank, next(_additionCounter))
 
 	@property
 	def packageID(self):
@@ -27,27 +45,152 @@ class ProvidesInfo(Resolvable):
 	def path(self):
 		return self.packageInfo.path
 
+# -- ProvidesIndex class ------------------------------------------------------
+
+class ProvidesIndex(object):
+	"""All provides of one name, ordered by precedence. The versioned ones
+	   are additionally kept sorted by version, separately for hpkgs and all
+	   others, such that the provides matching a version constraint can be
+	   found by bisection. Removed provides are only remembered as such and
+	   get dropped once they make up half of the entries."""
+
+	def __init__(self):
+		self._entries = []
+		self._partitions = {
+			False: ([], []),
+			True: ([], []),
+		}
+		self._removed = set()
+
+	def copy(self):
+		clone = ProvidesIndex()
+		clone._entries = list(self._entries)
+		for hpkgs, (keys, providesList) in self._partitions.items():
+			clone._partitions[hpkgs] = (list(keys), list(providesList))
+		clone._removed = set(self._removed)
+		return clone
+
+	def add(self, provides):
+		index = bisect_right(self._entries, provides.sequence,
+			key=attrgetter('sequence'))
+		self._entries.insert(index, provides)
+
+		if provides.versionKey is not None:
+			keys, providesList = self._partitions[provides.isHpkg]
+			key = (provides.versionKey, provides.sequence)
+			index = bisect_right(keys, key)
+			keys.insert(index, key)
+			providesList.insert(index, provides)
+
+	def remove(self, provides):
+		self._removed.add(provides)
+		if len(self._removed) * 2 > len(self._entries):
+			self._compact()
+
+	def _compact(self):
+		removed = self._removed
+		self._entries = [
+			provides for provides in self._entries if provides not in removed
+		]
+		for keys, providesList in self._partitions.values():
+			liveIndices = [
+				index for index, provides in enumerate(providesList)
+				if provides not in removed
+			]
+			keys[:] = [keys[index] for index in liveIndices]
+			providesList[:] = [providesList[index] for index in liveIndices]
+		self._removed = set()
+
+	def _isVisible(self, provides, skipHpkgs, excludedSources):
+		return not (provides in self._removed
+			or (skipHpkgs and provides.isHpkg)
+			or provides.source in excludedSources)
+
+	def first(self, skipHpkgs, excludedSources):
+		"""Returns the provides with the highest precedence"""
+
+		for provides in self._entries:
+			if self._isVisible(provides, skipHpkgs, excludedSources):
+				return provides
+		return None
+
+	def all(self, skipHpkgs, excludedSources):
+		return [
+			provides for provides in self._entries
+			if self._isVisible(provides, skipHpkgs, excludedSources)
+		]
+
+	def matching(self, operator, versionKey, hpkgs, excludedSources):
+		"""Returns the versioned provides of hpkgs (or of all others) that
+		   satisfy the given operator and version, ordered by version"""
+
+		keys, providesList = self._partitions[hpkgs]
+		# the sequences of all provides with this version, including the
+		# ones with rank inf added to an overlay, are within these bounds
+		low = bisect_left(keys, (versionKey, ))
+		high = bisect_left(keys, (versionKey, (inf, inf)))
+		if operator == '<':
+			candidates = providesList[:low]
+		elif operator == '<=':
+			candidates = providesList[:high]
+		elif operator == '==':
+			candidates = providesList[low:high]
+		elif operator == '!=':
+			candidates = providesList[:low] + providesList[high:]
+		elif operator == '>=':
+			candidates = providesList[low:]
+		elif operator == '>':
+			candidates = providesList[high:]
+		else:
+			raise KeyError(operator)
+
+		return [
+			provides for provides in candidates
+			if self._isVisible(provides, False, excludedSources)
+				and not (provides.compatibleVersionKey
+					and provides.compatibleVersionKey > versionKey)
+		]
+
 # -- ProvidesManager class ----------------------------------------------------
 
 class ProvidesManager(object):
+	# the rank of provides added via addProvidesFromPackageInfo()
+	additionRank = 0
+
 	def __init__(self):
 		self._providesMap = {}
 		self._providesSourceMap = {}
 		self.architectures = [BuildPlatform.buildPlatform.targetArchitecture,
 			'any', 'source']
 
+	def copy(self):
+		clone = ProvidesManager()
+		clone.architectures = list(self.architectures)
+		clone._providesMap = {
+			name: providesIndex.copy()
+			for name, providesIndex in self._providesMap.items()
+		}
+		clone._providesSourceMap = {
+			source: list(providesList)
+			for source, providesList in self._providesSourceMap.items()
+		}
+		return clone
+
 	def addProvidesFromPackage(self, package):
 		for providesString in package.recipeKeys['PROVIDES']:
-			self._addPackageProvidesInfo(package.revisionedName, providesString)
+			self._addPackageProvidesInfo(package.revisionedName, providesString,
+				self.additionRank)
 
-	def addProvidesFromPackageInfo(self, packageInfo):
+	def addProvidesFromPackageInfo(self, packageInfo, rank=None):
 		if (packageInfo.architecture not in self.architectures
 			and not (Configuration.isCrossBuildRepository()
 				and '_cross_' in packageInfo.path)):
 			return
 
+		if rank is None:
+			rank = self.additionRank
 		for provides in packageInfo.provides:
-			self._addPackageProvidesInfo(packageInfo, str(provides))
+			self._addPackageProvidesInfo(packageInfo, str(provides), rank)
 
 	def getMatchingProvides(self, resolvableExpression, anyHpkg=False,
 		ignoreBase=False):
@@ -56,57 +199,73 @@ class ProvidesManager(object):
 		version = resolvableExpression.version
 		base = resolvableExpression.base
 
-		if name not in self._providesMap:
+		providesIndexes = self._providesIndexesFor(name)
+		if not providesIndexes:
 			return None
 
 		updateDependencies = getOption('updateDependencies')
 		missingDependencies = getOption('missingDependencies')
 
-		providesList = self._providesMap[name]
+		skipHpkgs = not ignoreBase and base
 
-		found = None
-		foundIsHpkg = False
-		for provides in providesList:
-			provideIsHpkg = (provides.packageInfo.path.endswith('.hpkg')
-				if isinstance(provides.packageInfo, PackageInfo) else False)
-			if not ignoreBase and base and provideIsHpkg:
-				continue
-			if not operator:
-				if not updateDependencies and not missingDependencies:
-					return provides
-				if (found is None or
-					(anyHpkg and provideIsHpkg) or
-					(provideIsHpkg and not foundIsHpkg and
-						(missingDependencies or found.version is None
-							or versionCompare(provides.version, found.version) >= 0))):
-					found = provides
-					foundIsHpkg = provideIsHpkg
-				continue
-			if not provides.version:
-				continue
-			matches = {
-				'<':	lambda compareResult: compareResult < 0,
-				'<=':	lambda compareResult: compareResult <= 0,
-				'==':	lambda compareResult: compareResult == 0,
-				'!=':	lambda compareResult: compareResult != 0,
-				'>=':	lambda compareResult: compareResult >= 0,
-				'>':	lambda compareResult: compareResult > 0,
-			}[operator](versionCompare(provides.version, version))
-			if not matches:
-				continue
-			if (provides.compatibleVersion
-				and versionCompare(provides.compatibleVersion, version) > 0):
-				continue
+		candidates = []
+		if not operator:
 			if not updateDependencies and not missingDependencies:
+				candidates = [
+					providesIndex.first(skipHpkgs, excludedSources)
+					for providesIndex, excludedSources in providesIndexes
+				]
+				return min(filter(None, candidates),
+					key=attrgetter('sequence'), default=None)
+			for providesIndex, excludedSources in providesIndexes:
+				candidates += providesIndex.all(skipHpkgs, excludedSources)
+		else:
+			versionKey = VersionKey(version)
+			for providesIndex, excludedSources in providesIndexes:
+				candidates += providesIndex.matching(operator, versionKey,
+					False, excludedSources)
+				if not skipHpkgs:
+					candidates += providesIndex.matching(operator, versionKey,
+						True, excludedSources)
+			if not updateDependencies and not missingDependencies:
+				return min(candidates, key=attrgetter('sequence'),
+					default=None)
+
+		return self._preferredProvides(candidates, anyHpkg,
+			missingDependencies)
+
+	def _providesIndexesFor(self, name):
+		"""Returns a list of (ProvidesIndex, excluded sources) to look up
+		   the provides with the given name in"""
+
+		if name not in self._providesMap:
+			return []
+		return [(self._providesMap[name], frozenset())]
+
+	@staticmethod
+	def _preferredProvides(candidates, anyHpkg, missingDependencies):
+		"""Picks the provides to use when updating or fetching missing
+		   dependencies: hpkgs are preferred over the provides with the
+		   highest precedence (unless it is an older version), with anyHpkg
+		   the hpkg with the lowest precedence is used"""
+
+		if not candidates:
+			return None
+
+		first = min(candidates, key=attrgetter('sequence'))
+		hpkgs = [provides for provides in candidates if provides.isHpkg]
+		if not hpkgs:
+			return first
+		if anyHpkg:
+			return max(hpkgs, key=attrgetter('sequence'))
+		if first.isHpkg:
+			return first
+
+		for provides in sorted(hpkgs, key=attrgetter('sequence')):
+			if (missingDependencies or first.version is None
+				or provides.versionKey >= first.versionKey):
 				return provides
-			if (found is None or
-				(anyHpkg and provideIsHpkg) or
-				(provideIsHpkg and not foundIsHpkg and
-					(missingDependencies or found.version is None
-						or versionCompare(provides.version, found.version) >= 0))):
-				found = provides
-				foundIsHpkg = provideIsHpkg
-		return found
+		return first
 
 	@staticmethod
 	def _providesSource(packageInfo):
@@ -114,22 +273,61 @@ class ProvidesManager(object):
 			else packageInfo
 
 
-	def _addPackageProvidesInfo(self, packageInfo, providesString):
-		provides = ProvidesInfo(packageInfo, providesString.strip())
-
+	def _addPackageProvidesInfo(self, packageInfo, providesString, rank):
 		source = self._providesSource(packageInfo)
+		provides = ProvidesInfo(packageInfo, providesString.strip(), source,
+			rank)
+
 		if source in self._providesSourceMap:
 			self._providesSourceMap[source].append(provides)
 		else:
 			self._providesSourceMap[source] = [provides]
 
-		if provides.name in self._providesMap:
-			self._providesMap[provides.name].append(provides)
-		else:
-			self._providesMap[provides.name] = [provides]
+		if provides.name not in self._providesMap:
+			self._providesMap[provides.name] = ProvidesIndex()
+		self._providesMap[provides.name].add(provides)
+
+	def hasProvidesOf(self, source):
+		return source in self._providesSourceMap
 
 	def removeProvidesOfPackageInfo(self, packageInfo):
-		source = self._providesSource(packageInfo)
+		self.removeProvidesOfSource(self._providesSource(packageInfo))
+
+	def removeProvidesOfSource(self, source):
 		providesList = self._providesSourceMap.pop(source)
 		for provides in providesList:
 			self._providesMap[provides.name].remove(provides)
+
+# -- ProvidesOverlay class ----------------------------------------------------
+
+class ProvidesOverlay(ProvidesManager):
+	"""Changes to a (shared) base ProvidesManager that are only visible
+	   through the overlay. Provides added to the overlay take precedence
+	   after all of the base, removing provides of the base only hides them,
+	   the base itself is never modified."""
+
+	additionRank = inf
+
+	def __init__(self, base=None):
+		super(ProvidesOverlay, self).__init__()
+		self.base = base
+		self._hiddenSources = set()
+
+	def _providesIndexesFor(self, name):
+		if self.base is not None and not self._providesMap \
+				and not self._hiddenSources:
+			return self.base._providesIndexesFor(name)
+
+		providesIndexes = super(ProvidesOverlay, self)._providesIndexesFor(name)
+		if self.base is not None:
+			providesIndexes += [
+				(providesIndex, self._hiddenSources)
+				for providesIndex, _ in self.base._providesIndexesFor(name)
+			]
+		return providesIndexes
+
+	def removeProvidesOfSource(self, source):
+		if self.hasProvidesOf(source):
+			super(ProvidesOverlay, self).removeProvidesOfSource(source)
+		else:
+			self._hiddenSources.add(source)
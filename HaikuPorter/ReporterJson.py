@@ -21,7 +21,7 @@ class ReporterJson(object):
 	def connected(self):
 		return True
 
-	def updateBuildrun(self, buildNumber, status):
+	def updateBuildrun(self, buildrunNumber, status, changedBuilds=None):
 		tempFile = self.filename + '.temp'
 		with open(tempFile, 'w') as outputFile:
 			outputFile.write(json.dumps(status))
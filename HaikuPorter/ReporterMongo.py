@@ -8,11 +8,22 @@
 from .Utils import info, warn
 
 try:
-	from pymongo import MongoClient
+	import pymongo
+	from pymongo import MongoClient, UpdateOne
 except ImportError:
 	MongoClient = None
 
 class ReporterMongo(object):
+	"""Reports the buildrun status to MongoDB.
+
+	   Only what changed since the previous update is sent: the top-level
+	   fields of the buildrun document that changed, the builds the build
+	   master reports as changed and the documents of the builders whose
+	   status changed. A build that moved to another list is pulled from the
+	   one it was reported in and pushed to the new one, otherwise it is
+	   updated in place. Whenever what has been reported is unknown, the
+	   complete status is written."""
+
 	def __init__(self, uri, branch, architecture):
 		self.uri = uri
 		self.branch = branch
@@ -22,6 +33,11 @@ class ReporterMongo(object):
 		else:
 			self.client = None
 
+		self._buildrunNumber = None
+		self._reportedFields = None
+		self._reportedBuildLists = {}
+		self._reportedBuilders = {}
+
 	def connected(self):
 		if self.client == None:
 			warn('pymongo unavailable')
@@ -34,21 +50,105 @@ class ReporterMongo(object):
 		info('connected to MongoDB @ ' + self.uri + ' for reporting')
 		return True
 
-	def updateBuildrun(self, buildNumber, status):
+	def updateBuildrun(self, buildrunNumber, status, changedBuilds=None):
+		"""Reports the status of the buildrun. changedBuilds maps the
+		   revisioned names of the builds that changed since the previous
+		   update to their list and status, if it is None the builds of the
+		   status are reported completely."""
+
+		if buildrunNumber != self._buildrunNumber:
+			self._buildrunNumber = buildrunNumber
+			self._reportedFields = None
+
 		db = self.client[self.branch + '-' + self.architecture]
-		buildrunCollection = db.buildruns
-		mdbStatus = status.copy()
-		mdbStatus["_id"] = buildNumber
-		buildrunCollection.update_one({'_id': buildNumber}, {"$set": mdbStatus}, upsert=True)
-		self._updateBuilders(status);
-		return
+		try:
+			if self._reportedFields is None or changedBuilds is None:
+				requests = self._completeUpdate(buildrunNumber, status)
+			else:
+				requests = self._buildrunUpdates(buildrunNumber, status,
+					changedBuilds)
+			if requests:
+				db.buildruns.bulk_write(requests, ordered=True)
+			self._updateBuilders(status)
+		except Exception:
+			# what has been reported is unknown, report everything next time
+			self._reportedFields = None
+			self._reportedBuilders = {}
+			raise
+
+	def _completeUpdate(self, buildrunNumber, status):
+		self._reportedFields = {key: value for key, value in status.items()
+			if key != 'builds'}
+		self._reportedBuildLists = {
+			build['port']['revisionedName']: listName
+			for listName, builds in status['builds'].items()
+			for build in builds
+		}
+		return [UpdateOne({'_id': buildrunNumber}, {'$set': status},
+			upsert=True)]
+
+	def _buildrunUpdates(self, buildrunNumber, status, changedBuilds):
+		"""Returns the update requests for the top-level fields of the
+		   status that changed since they were last reported and for the
+		   given changed builds"""
+
+		documentFilter = {'_id': buildrunNumber}
+		setFields = {}
+		for key, value in status.items():
+			if key == 'builds' or self._reportedFields.get(key) == value:
+				continue
+			setFields[key] = value
+			self._reportedFields[key] = value
+
+		pulls = {}
+		pushes = {}
+		inPlaceUpdates = []
+		for name, (listName, buildStatus) in changedBuilds.items():
+			reportedList = self._reportedBuildLists.get(name)
+			if reportedList == listName:
+				inPlaceUpdates.append(UpdateOne(documentFilter,
+					{'$set': {'builds.' + listName + '.$[build]': buildStatus}},
+					array_filters=[{'build.port.revisionedName': name}]))
+				continue
+
+			if reportedList is not None:
+				pulls.setdefault('builds.' + reportedList, []).append(name)
+			pushes.setdefault('builds.' + listName, []).append(buildStatus)
+			self._reportedBuildLists[name] = listName
+
+		# a field can't be pulled from and pushed to in the same update
+		requests = []
+		if pulls:
+			requests.append(UpdateOne(documentFilter, {'$pull': {
+				path: {'port.revisionedName': {'$in': names}}
+				for path, names in pulls.items()
+			}}))
+
+		update = {}
+		if pushes:
+			update['$push'] = {path: {'$each': builds}
+				for path, builds in pushes.items()}
+		if setFields:
+			update['$set'] = setFields
+		if update:
+			requests.append(UpdateOne(documentFilter, update))
+
+		return requests + inPlaceUpdates
 
 	def _updateBuilders(self, status):
-		db = self.client[self.branch + '-' + self.architecture]
-		builderCollection = db.builders
+		requests = []
 		for state in status["builders"].keys():
 			for builder in status["builders"][state]:
 				bldStatus = builder.copy()
 				bldStatus["_id"] = builder["name"]
 				bldStatus["status"] = state
-				builderCollection.update_one({'_id': builder["name"]}, {"$set": bldStatus}, upsert=True)
+				if self._reportedBuilders.get(builder["name"]) == bldStatus:
+					continue
+
+				self._reportedBuilders[builder["name"]] = bldStatus
+				requests.append(UpdateOne({'_id': builder["name"]},
+					{"$set": bldStatus}, upsert=True))
+
+		if requests:
+			db = self.client[self.branch + '-' + self.architecture]
+			db.builders.bulk_write(requests, ordered=False)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021, Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+
+# -- Modules ------------------------------------------------------------------
+
+import threading
+
+from .Utils import warn
+
+# -- ReporterQueue class ------------------------------------------------------
+
+class ReporterQueue(object):
+	"""Hands the status updates of a buildrun to a reporter on a background
+	   thread, so that whoever updates the status never waits for the disk
+	   or database I/O of the reporter.
+
+	   Updates are coalesced: if the reporter is still busy with one update
+	   when more arrive, only the latest status is reported, along with the
+	   builds that changed in any of them."""
+
+	def __init__(self, reporter):
+		self.reporter = reporter
+		self._condition = threading.Condition()
+		self._pendingUpdate = None
+		self._closed = False
+		self._thread = threading.Thread(target=self._run, name='reporter',
+			daemon=True)
+		self._thread.start()
+
+	def connected(self):
+		return self.reporter.connected()
+
+	def updateBuildrun(self, buildrunNumber, status, changedBuilds=None):
+		with self._condition:
+			if self._pendingUpdate is not None and changedBuilds is not None:
+				pendingChanges = self._pendingUpdate[2]
+				if pendingChanges is None:
+					changedBuilds = None
+				else:
+					# keep the builds in the order of their last change
+					for name in changedBuilds:
+						pendingChanges.pop(name, None)
+					pendingChanges.update(changedBuilds)
+					changedBuilds = pendingChanges
+
+			self._pendingUpdate = (buildrunNumber, status, changedBuilds)
+			self._condition.notify()
+
+	def close(self):
+		"""Reports the last pending update and stops the background thread"""
+
+		with self._condition:
+			self._closed = True
+			self._condition.notify()
+		self._thread.join()
+
+	def _run(self):
+		while True:
+			with self._condition:
+				while self._pendingUpdate is None and not self._closed:
+					self._condition.wait()
+				if self._pendingUpdate is None:
+					return
+
+				update = self._pendingUpdate
+				self._pendingUpdate = None
+
+			try:
+				self.reporter.updateBuildrun(*update)
+			except Exception as exception:
+				warn('failed to report buildrun status: ' + str(exception))
@@ -6,12 +6,13 @@
 # -- Modules ------------------------------------------------------------------
 
 import codecs
+import difflib
 import glob
 import json
 import os
 import re
 import shutil
-from functools import cmp_to_key
+from concurrent.futures import ThreadPoolExecutor
 from subprocess import check_call, check_output
 from textwrap import dedent
 
@@ -19,13 +20,16 @@ from .Configuration import Configuration
 from .DependencyResolver import DependencyResolver
 from .Options import getOption
 from .Port import Port
-from .Utils import prefixLines, sysExit, touchFile, versionCompare, warn
+from .PortDict import PortDict
+from .RepositoryStore import RepositoryStore
+from .Utils import (VersionKey, prefixLines, readStringFromFile, sysExit,
+                    warn)
 
 # -- Repository class ---------------------------------------------------------
 
 class Repository(object):
 
-	currentFormatVersion = 2
+	currentFormatVersion = 3
 
 	def __init__(self, treePath, outputDirectory, repositoryPath,
 			packagesPath, shellVariables,
@@ -42,10 +46,8 @@ class Repository(object):
 		self.verbose = verbose
 
 		self._formatVersionFilePath = self.path + '/.formatVersion'
-		self._portIdForPackageIdFilePath \
-			= self.path + '/.portIdForPackageIdMap'
-		self._portNameForPackageNameFilePath \
-			= self.path + '/.portNameForPackageNameMap'
+		self.store = RepositoryStore(
+			os.path.join(self.path, RepositoryStore.fileName))
 
 		# check repository format
 		formatVersion = self._readFormatVersion()
@@ -54,15 +56,19 @@ class Repository(object):
 					'\nis newer than the one supported by haikuporter.\n'
 					'Please upgrade haikuporter.' % self.path)
 
-		Port.setRepositoryDir(self.path)
+		Port.setRepositoryDir(self.path, self.store)
+
+		if (formatVersion == 2
+			and os.path.exists(self.path + '/.portIdForPackageIdMap')
+			and os.path.exists(self.path + '/.portNameForPackageNameMap')):
+			self._migrateFromFormatVersion2()
+			formatVersion = 3
 
 		# update repository if it exists and isn't empty, populate it otherwise
 		self._initAllPorts()
-		self._initPortForPackageMaps()
-		if (os.path.isdir(self.path) and os.listdir(self.path)
-			and os.path.exists(self._portIdForPackageIdFilePath)
-			and os.path.exists(self._portNameForPackageNameFilePath)
+		if (os.path.exists(self.store.path)
 			and formatVersion == Repository.currentFormatVersion):
+			self._initPortForPackageMaps()
 			if not getOption('noRepositoryUpdate'):
 				self._updateRepository()
 		else:
@@ -74,7 +80,7 @@ class Repository(object):
 					'repository ...')
 			self._populateRepository(preserveFlags)
 			self._writeFormatVersion()
-		self._writePortForPackageMaps()
+		self._writeTreeIndex()
 		self._activePorts = None
 
 	def getPortIdForPackageId(self, packageId):
@@ -209,11 +215,16 @@ class Repository(object):
 	def _initAllPorts(self):
 		# Collect all ports into a dictionary that can be keyed by
 		# name + '-' + version. Additionally, we keep a sorted list of
-		# available versions for each port name.
-		self._allPorts = {}
+		# available versions for each port name. The Port objects themselves
+		# are only created when they are accessed.
+		self._allPorts = PortDict(self.shellVariables, self.policy)
 		self._portVersionsByName = {}
 
-		## REFACTOR into separate methods
+		def addVersion(name, version):
+			if name not in self._portVersionsByName:
+				self._portVersionsByName[name] = [version]
+			else:
+				self._portVersionsByName[name].append(version)
 
 		# every existing input source package defines a port (which overrules
 		# any corresponding port in the recipe tree)
@@ -228,10 +239,7 @@ class Repository(object):
 
 				recipeName = os.path.basename(recipeFilePath)
 				name, version = recipeName[:-7].split('-')
-				if name not in self._portVersionsByName:
-					self._portVersionsByName[name] = [version]
-				else:
-					self._portVersionsByName[name].append(version)
+				addVersion(name, version)
 
 				portPath = os.path.dirname(recipeFilePath)
 				if self.outputDirectory == self.treePath:
@@ -239,120 +247,194 @@ class Repository(object):
 				else:
 					portOutputPath = self.outputDirectory \
 						+ '/input-source-packages/' + name
-				self._allPorts[name + '-' + version] \
-					= Port(name, version, '<source-package>', portPath,
-						portOutputPath, self.shellVariables,
-						self.policy)
+				self._allPorts.define(name, version, '<source-package>',
+					portPath, portOutputPath)
 
 		# collect ports from the recipe tree
-		for category in sorted(os.listdir(self.treePath)):
-			categoryPath = self.treePath + '/' + category
-			if (not os.path.isdir(categoryPath) or category[0] == '.'
-				or '-' not in category):
-				continue
-			for port in sorted(os.listdir(categoryPath)):
-				portPath = categoryPath + '/' + port
-				portOutputPath = (self.outputDirectory + '/' + category + '/'
-					+ port)
-				if not os.path.isdir(portPath) or port[0] == '.':
-					continue
-				for recipe in os.listdir(portPath):
-					recipePath = portPath + '/' + recipe
-					if (not os.path.isfile(recipePath)
-						or not recipe.endswith('.recipe')):
-						continue
-					portElements = recipe[:-7].split('-')
-					if len(portElements) == 2:
-						name, version = portElements
-						versionedName = name + '-' + version
-						if versionedName in self._allPorts:
-							# this version of the current port already was
-							# defined - skip
-							if not self.quiet and not getOption('doBootstrap'):
-								otherPort = self._allPorts[versionedName]
-								if otherPort.category == '<source-package>':
-									warn('%s/%s	 is overruled by input '
-										'source package' % (category,
-											versionedName))
-								else:
-									warn('%s/%s	 is overruled by duplicate '
-										'in %s - please remove one of them'
-										% (category, versionedName,
-											otherPort.category))
-							continue
-						if name not in self._portVersionsByName:
-							self._portVersionsByName[name] = [version]
+		for category, port, recipe in self._recipeTreeIndex():
+			portPath = self.treePath + '/' + category + '/' + port
+			portOutputPath = (self.outputDirectory + '/' + category + '/'
+				+ port)
+			portElements = recipe[:-7].split('-')
+			if len(portElements) == 2:
+				name, version = portElements
+				versionedName = name + '-' + version
+				if versionedName in self._allPorts:
+					# this version of the current port already was
+					# defined - skip
+					if not self.quiet and not getOption('doBootstrap'):
+						otherCategory = self._allPorts.category(versionedName)
+						if otherCategory == '<source-package>':
+							warn('%s/%s	 is overruled by input '
+								'source package' % (category,
+									versionedName))
 						else:
-							self._portVersionsByName[name].append(version)
-						self._allPorts[name + '-' + version] = Port(name,
-							version, category, portPath, portOutputPath,
-							self.shellVariables, self.policy)
-					else:
-						# invalid argument
-						if not self.quiet:
-							print("Warning: Couldn't parse port/version info: "
-								+ recipe)
-
-		# Create ports for the secondary architectures. Not all make sense or
+							warn('%s/%s	 is overruled by duplicate '
+								'in %s - please remove one of them'
+								% (category, versionedName,
+									otherCategory))
+					continue
+				addVersion(name, version)
+				self._allPorts.define(name, version, category, portPath,
+					portOutputPath)
+			else:
+				# invalid argument
+				if not self.quiet:
+					print("Warning: Couldn't parse port/version info: "
+						+ recipe)
+
+		# Define ports for the secondary architectures. Not all make sense or
 		# are supported, but we won't know until we have parsed the recipe file.
 		secondaryArchitectures = Configuration.getSecondaryTargetArchitectures()
 		if secondaryArchitectures:
-			for port in tuple(self._allPorts.values()):
+			for portID in tuple(self._allPorts.keys()):
+				(name, version, category, portPath, portOutputPath,
+					_) = self._allPorts.definition(portID)
 				for architecture in secondaryArchitectures:
-					newPort = Port(port.baseName, port.version, port.category,
-						port.baseDir, port.outputDir, self.shellVariables,
-						port.policy, architecture)
-					self._allPorts[newPort.versionedName] = newPort
-
-					name = newPort.name
-					version = newPort.version
-					if name not in self._portVersionsByName:
-						self._portVersionsByName[name] = [version]
-					else:
-						self._portVersionsByName[name].append(version)
+					self._allPorts.define(name, version, category, portPath,
+						portOutputPath, architecture)
+					addVersion(name + '_' + architecture, version)
 
 		# Sort version list of each port
 		for portName in list(self._portVersionsByName.keys()):
 			self._portVersionsByName[portName].sort(
-				key=cmp_to_key(versionCompare))
+				key=VersionKey)
+
+	def _recipeTreeIndex(self):
+		"""Returns a list of (category, port, recipe file name) for all
+		   recipes in the tree. The list is kept in the store together with
+		   the modification times of all directories that have been walked,
+		   such that an unchanged tree doesn't have to be walked again."""
+
+		self._treeIndexToWrite = None
+		if os.path.exists(self.store.path):
+			treeIndex = self.store.getTreeIndex(self.treePath)
+			if (treeIndex is not None
+				and self._treeDirectoriesAreUnchanged(
+					treeIndex['directories'])):
+				return treeIndex['recipes']
+
+		directories = {}
+		recipes = []
+
+		def scanDirectory(path):
+			directories[path] = os.stat(self.treePath + path).st_mtime_ns
+			with os.scandir(self.treePath + path) as entries:
+				return sorted(entries, key=lambda entry: entry.name)
+
+		for categoryEntry in scanDirectory(''):
+			category = categoryEntry.name
+			if (category[0] == '.' or '-' not in category
+				or not categoryEntry.is_dir()):
+				continue
+			for portEntry in scanDirectory('/' + category):
+				port = portEntry.name
+				if port[0] == '.' or not portEntry.is_dir():
+					continue
+				for recipeEntry in scanDirectory('/' + category + '/' + port):
+					recipe = recipeEntry.name
+					if recipe.endswith('.recipe') and recipeEntry.is_file():
+						recipes.append((category, port, recipe))
+
+		self._treeIndexToWrite = {'directories': directories,
+			'recipes': recipes}
+		return recipes
+
+	def _treeDirectoriesAreUnchanged(self, directories):
+		"""Adding, removing or renaming a category, port or recipe changes
+		   the modification time of the directory containing it"""
+
+		for path, mtime in directories.items():
+			try:
+				if os.stat(self.treePath + path).st_mtime_ns != mtime:
+					return False
+			except OSError:
+				return False
+		return True
+
+	def _writeTreeIndex(self):
+		if self._treeIndexToWrite is not None:
+			self.store.setTreeIndex(self.treePath, self._treeIndexToWrite)
+			self._treeIndexToWrite = None
 
 	def _initPortForPackageMaps(self):
 		"""Initialize dictionaries that map package names/IDs to port
 		   names/IDs"""
 
-		self._portIdForPackageId = {}
-		if os.path.exists(self._portIdForPackageIdFilePath):
-			try:
-				with open(self._portIdForPackageIdFilePath, 'r') as fh:
-					self._portIdForPackageId = json.load(fh)
-			except BaseException as e:
-				print(e)
+		self._portIdForPackageId = self.store.getMap(
+			RepositoryStore.portIdForPackageIdMap)
+		self._portNameForPackageName = self.store.getMap(
+			RepositoryStore.portNameForPackageNameMap)
 
-		self._portNameForPackageName = {}
-		if os.path.exists(self._portNameForPackageNameFilePath):
-			try:
-				with open(self._portNameForPackageNameFilePath, 'r') as fh:
-					self._portNameForPackageName = json.load(fh)
-			except BaseException as e:
-				print(e)
+	def _writePortForPackageMaps(self, oldPortIdForPackageId,
+			oldPortNameForPackageName):
+		"""Writes the changes to the dictionaries that map package names/IDs
+		   to port names/IDs into the store"""
 
-	def _writePortForPackageMaps(self):
-		"""Writes dictionaries that map package names/IDs to port
-		   names/IDs to a file"""
+		self.store.updateMap(RepositoryStore.portIdForPackageIdMap,
+			oldPortIdForPackageId, self._portIdForPackageId)
+		self.store.updateMap(RepositoryStore.portNameForPackageNameMap,
+			oldPortNameForPackageName, self._portNameForPackageName)
 
-		try:
-			with open(self._portIdForPackageIdFilePath, 'w') as fh:
-				json.dump(self._portIdForPackageId, fh, sort_keys=True,
-					indent=4, separators=(',', ' : '))
-		except BaseException as e:
-			print(e)
+	def _migrateFromFormatVersion2(self):
+		"""Moves the bookkeeping files of a repository in format version 2
+		   into the store, leaving the dependency-infos in place"""
 
-		try:
-			with open(self._portNameForPackageNameFilePath, 'w') as fh:
-				json.dump(self._portNameForPackageName, fh, sort_keys=True,
-					indent=4, separators=(',', ' : '))
-		except BaseException as e:
-			print(e)
+		if not self.quiet:
+			print('Migrating repository to format version %d ...'
+				% Repository.currentFormatVersion)
+
+		store = self.store
+		obsoleteFiles = [self.path + '/.portIdForPackageIdMap',
+			self.path + '/.portNameForPackageNameMap']
+		with store.transaction():
+			for fileName, mapName in [
+					('.portIdForPackageIdMap',
+						RepositoryStore.portIdForPackageIdMap),
+					('.portNameForPackageNameMap',
+						RepositoryStore.portNameForPackageNameMap)]:
+				with open(os.path.join(self.path, fileName), 'r') as fh:
+					store.updateMap(mapName, {}, json.load(fh))
+			portIdForPackageId = store.getMap(
+				RepositoryStore.portIdForPackageIdMap)
+
+			for dependencyInfo in glob.glob(self.path + '/*.DependencyInfo'):
+				packageID = os.path.basename(dependencyInfo)[:-15]
+				store.setDependencyInfo(packageID,
+					portIdForPackageId.get(packageID))
+
+			# markers and skipped flags contain the recipe hash, older ones
+			# are empty and will just cause the port to be reevaluated
+			for marker in glob.glob(self.path + '/*.DependencyInfoMarker'):
+				store.setDependencyInfoMarker(
+					os.path.basename(marker)[:-21], readStringFromFile(marker))
+				obsoleteFiles.append(marker)
+
+			skippedDir = os.path.join(self.path, '.skipped')
+			if os.path.isdir(skippedDir):
+				for portID in os.listdir(skippedDir):
+					store.setSkippedPort(portID, readStringFromFile(
+						os.path.join(skippedDir, portID)))
+
+			recipeCacheDir = os.path.join(self.path, 'recipeCache')
+			if os.path.isdir(recipeCacheDir):
+				for cacheID in os.listdir(recipeCacheDir):
+					try:
+						cached = json.loads(readStringFromFile(
+							os.path.join(recipeCacheDir, cacheID)))
+					except ValueError:
+						cached = None
+					if isinstance(cached, dict) and 'hash' in cached:
+						store.setCachedRecipe(cacheID,
+							cacheID[:cacheID.rindex('-')],
+							cached.pop('hash'), cached)
+
+		for obsoleteFile in obsoleteFiles:
+			os.remove(obsoleteFile)
+		for obsoleteDir in [skippedDir, recipeCacheDir]:
+			if os.path.isdir(obsoleteDir):
+				shutil.rmtree(obsoleteDir)
+		self._writeFormatVersion()
 
 	def _readFormatVersion(self):
 		"""Read format version of repository from file"""
@@ -383,6 +465,7 @@ class Repository(object):
 		"""Remove and refill the repository with all DependencyInfo-files from
 		   parseable recipes"""
 
+		self.store.close()
 		if os.path.exists(self.path):
 			shutil.rmtree(self.path)
 
@@ -397,11 +480,6 @@ class Repository(object):
 	def _updateRepository(self, explicitPortVersion=None, preserveFlags=True):
 		"""Update all DependencyInfo-files in the repository as needed"""
 
-		allPorts = self.allPorts
-
-		activePorts = []
-		updatedPorts = {}
-
 		# check for all known ports if their recipe has been changed
 		if os.path.exists(self.path):
 			if not self.quiet:
@@ -411,78 +489,55 @@ class Repository(object):
 			if not self.quiet:
 				print('Populating repository ...')
 
-		skippedDir = os.path.join(self.path, '.skipped')
-		if not os.path.exists(skippedDir):
-			os.mkdir(skippedDir)
+		oldPortIdForPackageId = dict(self._portIdForPackageId)
+		oldPortNameForPackageName = dict(self._portNameForPackageName)
 
-		for portName in sorted(self._portVersionsByName.keys(),
-				key=str.lower):
+		# The store is changed in one transaction per port, together with
+		# the files of the port, and one for each step after that. An
+		# interrupted update thereby leaves every port either updated or
+		# still to be updated, and the stale entry removal looks at the
+		# files on disk as well as the store.
+		activePorts = self._updateRepositoryContents(explicitPortVersion,
+			preserveFlags)
 
-			if explicitPortVersion and explicitPortVersion['name'] == portName:
-				versions = [explicitPortVersion['version']]
-				forceAllowUnstable = True
-			else:
-				versions = reversed(self._portVersionsByName[portName])
-				forceAllowUnstable = False
-
-			for version in versions:
-				portID = portName + '-' + version
-				port = allPorts[portID]
-				skippedFlag = os.path.join(skippedDir, portID)
-
-				# ignore recipes that were skipped last time unless they've
-				# been changed since then
-				if (os.path.exists(skippedFlag)
-					and (os.path.getmtime(port.recipeFilePath)
-						<= os.path.getmtime(skippedFlag))):
-					continue
+		with self.store.transaction():
+			self._writePortForPackageMaps(oldPortIdForPackageId,
+				oldPortNameForPackageName)
 
-				# update all dependency-infos of port if the recipe is newer
-				# than the dependency-info marker of that port
-				dependencyInfoMarkerFile = os.path.join(self.path,
-					port.dependencyInfoMarkerName)
-				if (os.path.exists(dependencyInfoMarkerFile)
-					and (os.path.getmtime(port.recipeFilePath)
-						<= os.path.getmtime(dependencyInfoMarkerFile))):
-					activePorts.append(portID)
-					break
+		# Note that removing stale dependency infos uses the port for package
+		# mappings to determine what to keep. This step must therefore come
+		# after the stale port for package mapping removal.
+		with self.store.transaction():
+			self._removeStaleDependencyInfos(activePorts)
 
-				# try to parse updated recipe
-				try:
-					port.parseRecipeFile(False, forceAllowUnstable,
-						forceAllowUnstable)
-
-					if not port.isBuildableOnTargetArchitecture(
-							forceAllowUnstable):
-						touchFile(skippedFlag)
-						if not self.quiet:
-							status = port.statusOnTargetArchitecture
-							print(('\t%s is still marked as %s on target '
-								+ 'architecture') % (portID, status))
-						continue
+		# Finally, remove any stale cached recipe.
+		with self.store.transaction():
+			self._removeStaleCachedRecipes(activePorts)
 
-					if os.path.exists(skippedFlag):
-						os.remove(skippedFlag)
+	def _updateRepositoryContents(self, explicitPortVersion, preserveFlags):
+		"""Updates the dependency infos of all ports and the port for package
+		   mappings, returns the IDs of the active ports"""
 
-					if not preserveFlags and port.checkFlag('build'):
-						if not self.quiet:
-							print('\t[build-flag reset]')
-						port.unsetFlag('build')
+		activePorts = []
+		updatedPorts = {}
 
-					if not self.quiet:
-						print('\tupdating dependency infos of ' + portID)
+		# Recipes are evaluated on a pool of worker threads (most of the time
+		# is spent waiting for bash to evaluate them), but the results are
+		# applied in the same order as a serial run would produce them, such
+		# that the repository contents and the output are identical.
+		portNames = sorted(self._portVersionsByName.keys(), key=str.lower)
 
-					port.writeDependencyInfosIntoRepository()
-					updatedPorts[portID] = port
-					break
+		def evaluate(portName):
+			return self._evaluatePortVersions(portName, explicitPortVersion)
 
-				except SystemExit as e:
-					# take notice of broken recipe file
-					touchFile(skippedFlag)
-					if not os.path.exists(dependencyInfoMarkerFile):
-						if not self.quiet:
-							print('\trecipe for %s is still broken:' % portID)
-							print(prefixLines('\t', e.code))
+		jobs = getOption('jobs')
+		if jobs > 1 and len(portNames) > 1:
+			with ThreadPoolExecutor(jobs) as executor:
+				self._applyPortEvaluations(executor.map(evaluate, portNames),
+					preserveFlags, activePorts, updatedPorts)
+		else:
+			self._applyPortEvaluations(map(evaluate, portNames),
+				preserveFlags, activePorts, updatedPorts)
 
 		# This also drops mappings for updated ports to remove any possibly
 		# removed sub-packages.
@@ -497,13 +552,111 @@ class Repository(object):
 					= port.name
 			activePorts.append(portID)
 
-		# Note that removing stale dependency infos uses the port for package
-		# mappings to determine what to keep. This step must therefore come
-		# after the stale port for package mapping removal.
-		self._removeStaleDependencyInfos(activePorts)
+		return activePorts
 
-		# Finally, remove any stale cached recipe.
-		self._removeStaleCachedRecipes(activePorts)
+	def _evaluatePortVersions(self, portName, explicitPortVersion):
+		"""Determine which version of the given port is the one that should
+		   go into the repository, parsing recipes as needed. Nothing is
+		   written to the repository here, instead a list of
+		   (portID, outcome, detail) tuples is returned, which is applied by
+		   _applyPortEvaluations()"""
+
+		if explicitPortVersion and explicitPortVersion['name'] == portName:
+			versions = [explicitPortVersion['version']]
+			forceAllowUnstable = True
+		else:
+			versions = reversed(self._portVersionsByName[portName])
+			forceAllowUnstable = False
+
+		evaluations = []
+		for version in versions:
+			portID = portName + '-' + version
+			port = self._allPorts[portID]
+
+			# ignore recipes that were skipped last time unless they've
+			# been changed since then
+			if self.store.getSkippedPort(portID) == port.recipeHash:
+				continue
+
+			# update all dependency-infos of port if the recipe has changed
+			# since the dependency-info marker of that port was written
+			dependencyInfoMarker = self.store.getDependencyInfoMarker(portID)
+			if dependencyInfoMarker == port.recipeHash:
+				evaluations.append((portID, 'current', None))
+				break
+
+			# try to parse updated recipe
+			try:
+				port.parseRecipeFile(False, forceAllowUnstable,
+					forceAllowUnstable)
+
+				if not port.isBuildableOnTargetArchitecture(
+						forceAllowUnstable):
+					evaluations.append((portID, 'unbuildable',
+						port.statusOnTargetArchitecture))
+					continue
+
+				evaluations.append((portID, 'updated', None))
+				break
+
+			except SystemExit as e:
+				# take notice of broken recipe file
+				evaluations.append((portID, 'broken',
+					None if dependencyInfoMarker is not None else e.code))
+
+		return evaluations
+
+	def _applyPortEvaluations(self, evaluationsByPort, preserveFlags,
+			activePorts, updatedPorts):
+		"""Apply the results of _evaluatePortVersions() to the repository, in
+		   the order they are given"""
+
+		for evaluations in evaluationsByPort:
+			with self.store.transaction():
+				self._applyEvaluations(evaluations, preserveFlags,
+					activePorts, updatedPorts)
+
+	def _applyEvaluations(self, evaluations, preserveFlags, activePorts,
+			updatedPorts):
+		"""Apply the evaluations of the versions of a single port"""
+
+		for portID, outcome, detail in evaluations:
+			port = self._allPorts[portID]
+
+			if outcome == 'current':
+				activePorts.append(portID)
+			elif outcome == 'unbuildable':
+				self.store.setSkippedPort(portID, port.recipeHash)
+				if not self.quiet:
+					print(('\t%s is still marked as %s on target '
+						+ 'architecture') % (portID, detail))
+			elif outcome == 'broken':
+				self.store.setSkippedPort(portID, port.recipeHash)
+				if detail is not None and not self.quiet:
+					print('\trecipe for %s is still broken:' % portID)
+					print(prefixLines('\t', detail))
+			elif outcome == 'updated':
+				self.store.removeSkippedPort(portID)
+
+				if not preserveFlags and port.checkFlag('build'):
+					if not self.quiet:
+						print('\t[build-flag reset]')
+					port.unsetFlag('build')
+
+				if not self.quiet:
+					print('\tupdating dependency infos of ' + portID)
+
+				port.writeDependencyInfosIntoRepository()
+				updatedPorts[portID] = port
+
+				# store the mappings of the port along with its dependency
+				# infos, such that those are never stale once committed
+				self.store.updateMap(RepositoryStore.portIdForPackageIdMap,
+					{}, {package.versionedName: port.versionedName
+						for package in port.packages})
+				self.store.updateMap(
+					RepositoryStore.portNameForPackageNameMap, {},
+					{package.name: port.name for package in port.packages})
 
 	def _removeStaleDependencyInfos(self, activePorts):
 		"""check for any dependency-infos that no longer have a corresponding
@@ -511,32 +664,35 @@ class Repository(object):
 
 		if not self.quiet:
 			print("Looking for stale dependency-infos ...")
-		dependencyInfos = glob.glob(self.path + '/*.DependencyInfo')
-		for dependencyInfo in dependencyInfos:
+		# the files are looked at as well, in case they got out of sync with
+		# the store
+		packageIDs = set(self.store.dependencyInfoPackageIDs())
+		for dependencyInfo in glob.glob(self.path + '/*.DependencyInfo'):
 			dependencyInfoFileName = os.path.basename(dependencyInfo)
-			packageID \
-				= dependencyInfoFileName[:dependencyInfoFileName.rindex('.')]
+			packageIDs.add(
+				dependencyInfoFileName[:dependencyInfoFileName.rindex('.')])
+
+		for packageID in sorted(packageIDs):
 			portID = self.getPortIdForPackageId(packageID)
 
 			if not portID or portID not in activePorts:
+				dependencyInfoFileName = packageID + '.DependencyInfo'
 				if not self.quiet:
 					print('\tremoving ' + dependencyInfoFileName)
-				os.remove(dependencyInfo)
+				dependencyInfo = os.path.join(self.path, dependencyInfoFileName)
+				if os.path.exists(dependencyInfo):
+					os.remove(dependencyInfo)
+				self.store.removeDependencyInfo(packageID)
 
 				if not getOption('noPackageObsoletion'):
 					# obsolete corresponding package, if any
 					self._removePackagesForDependencyInfo(dependencyInfo)
 
-		dependencyInfoMarkers = glob.glob(self.path + '/*.DependencyInfoMarker')
-		for dependencyInfoMarker in dependencyInfoMarkers:
-			dependencyInfoMarkerFileName = os.path.basename(dependencyInfoMarker)
-			portID \
-				= dependencyInfoMarkerFileName[:dependencyInfoMarkerFileName.rindex('.')]
-
-			if not portID or portID not in activePorts:
+		for portID in self.store.dependencyInfoMarkerPortIDs():
+			if portID not in activePorts:
 				if not self.quiet:
-					print('\tremoving ' + dependencyInfoMarkerFileName)
-				os.remove(dependencyInfoMarker)
+					print('\tremoving ' + portID + '.DependencyInfoMarker')
+				self.store.removeDependencyInfoMarker(portID)
 
 	def _removeStaleCachedRecipes(self, activePorts):
 		"""check for any cached recipe that no longer have a corresponding
@@ -544,17 +700,11 @@ class Repository(object):
 
 		if not self.quiet:
 			print("Looking for stale cached recipes ...")
-		recipeCacheDir = os.path.join(self.path, Port._recipeCacheDirName)
-		cachedRecipes = glob.glob(recipeCacheDir + '/*-*-*')
-		for cachedRecipe in cachedRecipes:
-			cachedRecipeFileName = os.path.basename(cachedRecipe)
-			packageID = cachedRecipeFileName[:cachedRecipeFileName.rindex('-')]
-			portID = self.getPortIdForPackageId(packageID)
-
-			if not portID or portID not in activePorts:
+		for cacheID, portID in self.store.cachedRecipes():
+			if portID not in activePorts:
 				if not self.quiet:
-					print('\tremoving ' + cachedRecipeFileName)
-				os.remove(cachedRecipe)
+					print('\tremoving ' + cacheID)
+				self.store.removeCachedRecipe(cacheID)
 
 	def _removePackagesForDependencyInfo(self, dependencyInfo):
 		"""remove all packages for the given dependency-info"""
@@ -678,6 +828,37 @@ class Repository(object):
 					print('{}:\n{}\n'.format(package.revisionedName,
 							prefixLines('\t', str(error))))
 
+	def verifyRecipeEvaluator(self):
+		"""Evaluates all recipes with the python evaluator as well as with
+		   bash and reports any difference in the outputs."""
+
+		declarativeCount = 0
+		differenceCount = 0
+		for portID in sorted(self._allPorts.keys(), key=str.lower):
+			port = self._allPorts[portID]
+			try:
+				pythonOutput, bashOutput = port.compareRecipeEvaluators()
+			except SystemExit as e:
+				print('{}: {}'.format(portID, e.code))
+				continue
+
+			if pythonOutput is None:
+				continue
+			declarativeCount += 1
+
+			if pythonOutput != bashOutput:
+				differenceCount += 1
+				print('{} differs:'.format(portID))
+				for line in difflib.unified_diff(bashOutput.splitlines(),
+						pythonOutput.splitlines(), 'bash', 'python',
+						lineterm=''):
+					print('\t' + line)
+
+		print('{} of {} recipes evaluated without bash, {} differences'.format(
+			declarativeCount, len(self._allPorts), differenceCount))
+		if differenceCount:
+			sysExit('python and bash evaluation of recipes differ')
+
 	def purgeStalePorts(self):
 		"""Purges work dirs and downloads for ports which don't exist any more."""
 
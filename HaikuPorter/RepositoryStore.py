@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013 Oliver Tappe
+# Distributed under the terms of the MIT License.
+
+# -- Modules ------------------------------------------------------------------
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# -- RepositoryStore class ----------------------------------------------------
+
+class RepositoryStore(object):
+	"""The bookkeeping of a repository (format version 3): the
+	   dependency-infos present (the files themselves are read by path),
+	   dependency-info markers, skipped ports, cached recipes, the
+	   port-for-package maps and the index of the recipe tree, all kept in a
+	   single sqlite database.
+
+	   The store may be used from several threads, all of them share one
+	   connection that is serialized by a lock. Only one thread at a time
+	   can have a transaction open, other threads entering one wait for it
+	   to end. Statements other threads execute outside of a transaction
+	   while one is open become part of it, which the parallel evaluation
+	   of recipes during a repository update relies on."""
+
+	fileName = 'repository.db'
+
+	# names of the tables containing the port-for-package maps
+	portIdForPackageIdMap = 'portIdForPackageId'
+	portNameForPackageNameMap = 'portNameForPackageName'
+
+	_schema = '''
+		CREATE TABLE IF NOT EXISTS dependencyInfos (
+			packageID TEXT PRIMARY KEY,
+			portID TEXT
+		);
+		CREATE INDEX IF NOT EXISTS dependencyInfosByPortID
+			ON dependencyInfos (portID);
+		CREATE TABLE IF NOT EXISTS dependencyInfoMarkers (
+			portID TEXT PRIMARY KEY,
+			recipeHash TEXT NOT NULL
+		);
+		CREATE TABLE IF NOT EXISTS skippedPorts (
+			portID TEXT PRIMARY KEY,
+			recipeHash TEXT NOT NULL
+		);
+		CREATE TABLE IF NOT EXISTS recipeCache (
+			cacheID TEXT PRIMARY KEY,
+			portID TEXT NOT NULL,
+			recipeHash TEXT NOT NULL,
+			content TEXT NOT NULL
+		);
+		CREATE INDEX IF NOT EXISTS recipeCacheByPortID ON recipeCache (portID);
+		CREATE TABLE IF NOT EXISTS portIdForPackageId (
+			key TEXT PRIMARY KEY,
+			value TEXT NOT NULL
+		);
+		CREATE INDEX IF NOT EXISTS portIdForPackageIdByPortID
+			ON portIdForPackageId (value);
+		CREATE TABLE IF NOT EXISTS portNameForPackageName (
+			key TEXT PRIMARY KEY,
+			value TEXT NOT NULL
+		);
+		CREATE TABLE IF NOT EXISTS treeIndex (
+			treePath TEXT PRIMARY KEY,
+			content TEXT NOT NULL
+		);
+	'''
+
+	def __init__(self, path):
+		self.path = path
+		self._connection = None
+		self._lock = threading.RLock()
+		self._transactionEnded = threading.Condition(self._lock)
+		self._transactionOwner = None
+		self._transactionDepth = 0
+
+	def close(self):
+		with self._lock:
+			if self._connection is not None:
+				self._connection.close()
+				self._connection = None
+
+	@contextmanager
+	def transaction(self):
+		"""Groups all modifications done within the context into one
+		   transaction, which is rolled back if an exception leaves the
+		   outermost context. Transactions of one thread nest, those of
+		   different threads are serialized."""
+
+		thread = threading.get_ident()
+		with self._lock:
+			while self._transactionOwner not in (None, thread):
+				self._transactionEnded.wait()
+			if self._transactionOwner is None:
+				self._execute('BEGIN')
+				self._transactionOwner = thread
+			self._transactionDepth += 1
+
+		try:
+			yield
+		except BaseException:
+			self._endTransaction('ROLLBACK')
+			raise
+		self._endTransaction('COMMIT')
+
+	def _endTransaction(self, statement):
+		with self._lock:
+			self._transactionDepth -= 1
+			if self._transactionDepth == 0:
+				try:
+					self._execute(statement)
+				finally:
+					self._transactionOwner = None
+					self._transactionEnded.notify_all()
+
+	def _execute(self, statement, parameters=()):
+		with self._lock:
+			if self._connection is None:
+				self._connection = sqlite3.connect(self.path,
+					isolation_level=None, check_same_thread=False)
+				self._connection.executescript(self._schema)
+			return self._connection.execute(statement, parameters).fetchall()
+
+	# dependency-infos
+
+	def setDependencyInfo(self, packageID, portID):
+		self._execute('INSERT OR REPLACE INTO dependencyInfos VALUES (?, ?)',
+			(packageID, portID))
+
+	def removeDependencyInfo(self, packageID):
+		self._execute('DELETE FROM dependencyInfos WHERE packageID = ?',
+			(packageID, ))
+
+	def dependencyInfoPackageIDs(self):
+		return [row[0] for row
+			in self._execute('SELECT packageID FROM dependencyInfos')]
+
+	# dependency-info markers and skipped ports
+
+	def getDependencyInfoMarker(self, portID):
+		return self._getRecipeHash('dependencyInfoMarkers', portID)
+
+	def setDependencyInfoMarker(self, portID, recipeHash):
+		self._setRecipeHash('dependencyInfoMarkers', portID, recipeHash)
+
+	def removeDependencyInfoMarker(self, portID):
+		self._removeRecipeHash('dependencyInfoMarkers', portID)
+
+	def dependencyInfoMarkerPortIDs(self):
+		return [row[0] for row
+			in self._execute('SELECT portID FROM dependencyInfoMarkers')]
+
+	def getSkippedPort(self, portID):
+		return self._getRecipeHash('skippedPorts', portID)
+
+	def setSkippedPort(self, portID, recipeHash):
+		self._setRecipeHash('skippedPorts', portID, recipeHash)
+
+	def removeSkippedPort(self, portID):
+		self._removeRecipeHash('skippedPorts', portID)
+
+	def _getRecipeHash(self, table, portID):
+		rows = self._execute('SELECT recipeHash FROM %s WHERE portID = ?'
+			% table, (portID, ))
+		return rows[0][0] if rows else None
+
+	def _setRecipeHash(self, table, portID, recipeHash):
+		self._execute('INSERT OR REPLACE INTO %s VALUES (?, ?)' % table,
+			(portID, recipeHash))
+
+	def _removeRecipeHash(self, table, portID):
+		self._execute('DELETE FROM %s WHERE portID = ?' % table, (portID, ))
+
+	# cached recipes
+
+	def getCachedRecipe(self, cacheID, recipeHash):
+		"""Returns the cached recipe (as stored by setCachedRecipe()), or None
+		   if there is none for the given recipe hash"""
+
+		rows = self._execute('SELECT content FROM recipeCache '
+			'WHERE cacheID = ? AND recipeHash = ?', (cacheID, recipeHash))
+		return json.loads(rows[0][0]) if rows else None
+
+	def setCachedRecipe(self, cacheID, portID, recipeHash, cached):
+		self._execute('INSERT OR REPLACE INTO recipeCache VALUES (?, ?, ?, ?)',
+			(cacheID, portID, recipeHash, json.dumps(cached)))
+
+	def removeCachedRecipe(self, cacheID):
+		self._execute('DELETE FROM recipeCache WHERE cacheID = ?', (cacheID, ))
+
+	def cachedRecipes(self):
+		"""Returns a list of (cacheID, portID) for all cached recipes"""
+
+		return self._execute('SELECT cacheID, portID FROM recipeCache')
+
+	# index of the recipe tree (see Repository._recipeTreeIndex())
+
+	def getTreeIndex(self, treePath):
+		rows = self._execute('SELECT content FROM treeIndex '
+			'WHERE treePath = ?', (treePath, ))
+		return json.loads(rows[0][0]) if rows else None
+
+	def setTreeIndex(self, treePath, treeIndex):
+		self._execute('INSERT OR REPLACE INTO treeIndex VALUES (?, ?)',
+			(treePath, json.dumps(treeIndex)))
+
+	# port-for-package maps
+
+	def getMap(self, name):
+		return dict(self._execute('SELECT key, value FROM %s' % name))
+
+	def updateMap(self, name, oldMap, newMap):
+		"""Brings the stored map from oldMap to newMap, only touching the
+		   entries that have changed"""
+
+		with self.transaction():
+			for key in oldMap.keys() - newMap.keys():
+				self._execute('DELETE FROM %s WHERE key = ?' % name, (key, ))
+			for key, value in newMap.items():
+				if oldMap.get(key) != value:
+					self._execute('INSERT OR REPLACE INTO %s VALUES (?, ?)'
+						% name, (key, value))
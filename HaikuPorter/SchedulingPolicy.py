@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017-2020 Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+
+# -- Modules ------------------------------------------------------------------
+
+from statistics import median
+
+# -- FifoSchedulingPolicy class -----------------------------------------------
+
+class FifoSchedulingPolicy(object):
+	"""Runs buildable builds in the order they became buildable.
+
+	   A scheduling policy is told about all builds of a buildrun once before
+	   the builds are started (prepare()) and then picks the next one to run
+	   from the buildable builds (selectBuild())."""
+
+	def prepare(self, builds, expectedDurations):
+		pass
+
+	def selectBuild(self, buildableBuilds):
+		return buildableBuilds[0]
+
+# -- CriticalPathSchedulingPolicy class ---------------------------------------
+
+class CriticalPathSchedulingPolicy(FifoSchedulingPolicy):
+	"""Runs the buildable build with the longest chain of dependent builds
+	   first, such that long chains (like the toolchain and everything built
+	   with it) are started as early as possible. The length of a chain is
+	   the sum of the expected durations of its builds, ties are broken by
+	   the number of builds depending on a build and then by FIFO order.
+
+	   The expected duration of a port is the one of its last successful
+	   build. Ports that haven't been built before are assumed to take the
+	   median duration of the known ones."""
+
+	def __init__(self):
+		self._priorities = {}
+
+	def prepare(self, builds, expectedDurations):
+		defaultDuration = (median(expectedDurations.values())
+			if expectedDurations else 1)
+
+		builderOfPackage = {}
+		for build in builds:
+			for package in build.port.packages:
+				builderOfPackage[package.versionedName] = build
+
+		dependents = {build: set() for build in builds}
+		for build in builds:
+			for packageID in build.missingPackageIDs:
+				builder = builderOfPackage.get(packageID)
+				if builder is not None and builder is not build:
+					dependents[builder].add(build)
+
+		# Walk the builds in reverse topological order, so that all
+		# dependents of a build are done before the build itself. The set
+		# of transitive dependents is kept as a bit mask.
+		index = {build: i for i, build in enumerate(builds)}
+		pathLength = {}
+		transitiveDependents = {}
+		state = {}
+		for root in builds:
+			if root in state:
+				continue
+			stack = [(root, iter(dependents[root]))]
+			state[root] = 'visiting'
+			while stack:
+				build, remaining = stack[-1]
+				for dependent in remaining:
+					if dependent not in state:
+						state[dependent] = 'visiting'
+						stack.append((dependent, iter(dependents[dependent])))
+						break
+				else:
+					stack.pop()
+					state[build] = 'done'
+
+					# dependents that are still being visited form a cycle,
+					# those builds can never run and are ignored
+					done = [dependent for dependent in dependents[build]
+						if state[dependent] == 'done']
+					longest = max((pathLength[dependent] for dependent in done),
+						default=0)
+					mask = 0
+					for dependent in done:
+						mask |= transitiveDependents[dependent] \
+							| (1 << index[dependent])
+
+					pathLength[build] = longest + expectedDurations.get(
+						build.port.name, defaultDuration)
+					transitiveDependents[build] = mask
+
+		self._priorities = {
+			build: (pathLength[build],
+				bin(transitiveDependents[build]).count('1'))
+			for build in builds
+		}
+
+	def selectBuild(self, buildableBuilds):
+		# max() returns the first of several equal ones, which keeps FIFO
+		# order among builds of the same priority
+		return max(buildableBuilds, key=self.priority)
+
+	def priority(self, build):
+		"""Returns the (critical path length, transitive dependent count) of
+		   the given build"""
+
+		return self._priorities.get(build, (0, 0))
+
+
+schedulingPolicies = {
+	'critical-path': CriticalPathSchedulingPolicy,
+	'fifo': FifoSchedulingPolicy,
+}
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013 Oliver Tappe
+# Distributed under the terms of the MIT License.
+
+# -- Modules ------------------------------------------------------------------
+
+import atexit
+import threading
+import uuid
+from subprocess import PIPE, Popen
+
+from .RecipeTypes import Phase
+from .ShellScriptlets import (getShellVariableSetters,
+                              persistentConfigFileEvaluatorScript)
+from .Utils import filteredEnvironment
+
+# -- ShellEvaluatorError class ------------------------------------------------
+
+class ShellEvaluatorError(Exception):
+	"""Raised when the communication with a bash coprocess has failed"""
+	pass
+
+# -- ShellEvaluator class -----------------------------------------------------
+
+class ShellEvaluator(object):
+	"""A long-lived bash coprocess that evaluates config files on request,
+	   which avoids starting a new shell for every recipe"""
+
+	_idleEvaluators = []
+	_lock = threading.Lock()
+
+	def __init__(self):
+		self.frameMarker = '--haikuporter-frame-%s--' % uuid.uuid4().hex
+
+		shellEnv = filteredEnvironment()
+		shellEnv['recipePhases'] = ' '.join(Phase.getAllowedValues())
+
+		script = ("frameMarker='%s'\n" % self.frameMarker
+			+ persistentConfigFileEvaluatorScript)
+		self.process = Popen(['bash', '-c', script], env=shellEnv,
+			stdin=PIPE, stdout=PIPE)
+
+	def evaluate(self, shellVariables):
+		"""Evaluates the config file given by shellVariables['fileToParse'],
+		   returns the exit status and the output of the evaluation"""
+
+		request = getShellVariableSetters(shellVariables).encode('utf-8')
+		try:
+			self.process.stdin.write(b'%d\n' % len(request) + request)
+			self.process.stdin.flush()
+		except (OSError, ValueError) as exception:
+			raise ShellEvaluatorError(str(exception))
+
+		output = []
+		while True:
+			line = self.process.stdout.readline().decode('utf-8')
+			if not line:
+				raise ShellEvaluatorError('bash coprocess has terminated')
+
+			index = line.find(self.frameMarker)
+			if index < 0:
+				output.append(line)
+				continue
+
+			output.append(line[:index])
+			try:
+				status = int(line[index + len(self.frameMarker):])
+			except ValueError:
+				raise ShellEvaluatorError('illegal frame: ' + line)
+			return status, ''.join(output)
+
+	def close(self):
+		try:
+			self.process.stdin.close()
+		except OSError:
+			pass
+		self.process.wait()
+
+	@classmethod
+	def acquire(cls):
+		"""Returns an idle evaluator, starting a new one if none is left"""
+		with cls._lock:
+			if cls._idleEvaluators:
+				return cls._idleEvaluators.pop()
+
+		return ShellEvaluator()
+
+	@classmethod
+	def release(cls, evaluator):
+		"""Hands an evaluator back for reuse by a later evaluation"""
+		with cls._lock:
+			cls._idleEvaluators.append(evaluator)
+
+	@classmethod
+	def shutdown(cls):
+		with cls._lock:
+			evaluators = cls._idleEvaluators
+			cls._idleEvaluators = []
+
+		for evaluator in evaluators:
+			evaluator.close()
+
+atexit.register(ShellEvaluator.shutdown)
@@ -201,6 +201,28 @@ done
 '''
 
 
+# -----------------------------------------------------------------------------
+
+# Shell scriptlet that keeps running and evaluates one config file per request
+# read from stdin. Each request consists of a line containing the length of
+# the request followed by shell code (as created by getShellVariableSetters())
+# that sets up the variables required by configFileEvaluatorScript. Every
+# config file is evaluated in a subshell of its own, such that no variables
+# leak from one config file into the next. The output of each evaluation is
+# terminated by the frame marker followed by the exit status of the subshell.
+# The shell variable "frameMarker" must be set.
+persistentConfigFileEvaluatorScript = r'''
+while read -r requestLength; do
+	read -r -N "$requestLength" request || exit 1
+	(
+		eval "$request"
+		unset request requestLength
+''' + configFileEvaluatorScript + r'''
+	) </dev/null
+	echo "$frameMarker$?"
+done
+'''
+
 # -----------------------------------------------------------------------------
 
 # Shell scriptlet that is used to trigger one of the actions defined in a build
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021, Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+
+# -- Modules ------------------------------------------------------------------
+
+import json
+import os
+import time
+
+# -- StatusJournal class ------------------------------------------------------
+
+class StatusJournal(object):
+	"""Append-only journal of the events of a buildrun (builds being
+	   scheduled, started, completed, ... and builders changing state),
+	   written as one JSON object per line.
+
+	   Every now and then a snapshot of the complete status is written to a
+	   separate file, together with the size the journal had at that point.
+	   A client loads the snapshot once and then only needs to fetch the
+	   part of the journal after the offset it has seen (using a HTTP Range
+	   request for example), so its cost per update doesn't grow with the
+	   size of the buildrun."""
+
+	fileName = 'events.ndjson'
+	snapshotFileName = 'events.snapshot.json'
+
+	# the minimum time in seconds between two snapshots
+	snapshotInterval = 60
+
+	def __init__(self, directory):
+		self.path = os.path.join(directory, StatusJournal.fileName)
+		self.snapshotPath = os.path.join(directory,
+			StatusJournal.snapshotFileName)
+
+		# json.dumps() escapes all non-ASCII characters, so the offsets in
+		# characters are offsets in bytes as well
+		self._file = open(self.path, 'w', encoding='ascii')
+		self._offset = 0
+		self._lastSnapshotTime = None
+
+		if os.path.exists(self.snapshotPath):
+			os.remove(self.snapshotPath)
+
+	def append(self, eventType, **fields):
+		fields['type'] = eventType
+		fields['time'] = time.time()
+		line = json.dumps(fields) + '\n'
+		self._file.write(line)
+		self._offset += len(line)
+
+	def flush(self):
+		self._file.flush()
+
+	@property
+	def snapshotDue(self):
+		return (self._lastSnapshotTime is None
+			or time.monotonic() - self._lastSnapshotTime
+				>= self.snapshotInterval)
+
+	def writeSnapshot(self, status):
+		"""Writes a snapshot of the given status, which must include all
+		   events appended so far"""
+
+		self.flush()
+		tempFile = self.snapshotPath + '.temp'
+		with open(tempFile, 'w') as outputFile:
+			outputFile.write(json.dumps({
+				'offset': self._offset,
+				'status': status
+			}))
+		os.rename(tempFile, self.snapshotPath)
+		self._lastSnapshotTime = time.monotonic()
+
+	def close(self):
+		self._file.close()
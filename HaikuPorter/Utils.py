@@ -303,6 +303,43 @@ def versionCompare(left, right):
 	# compare pre-release strings
 	return naturalCompare(leftElements[1], rightElements[1])
 
+# -- VersionKey class --------------------------------------------------------
+
+class VersionKey(tuple):
+	"""Sort key for a version (that may include a pre-release), ordered
+	   exactly like versionCompare(). Keys are cached per version string, so
+	   the version is only split up once, no matter how often it is compared.
+	"""
+	__slots__ = ()
+
+	_cache = {}
+	_numberPattern = re.compile('([0-9]+)')
+
+	def __new__(cls, version):
+		key = cls._cache.get(version)
+		if key is None:
+			elements = version.split('~', 1)
+			bareKey = tuple(cls._naturalKey(element)
+				for element in elements[0].split('.'))
+
+			# a version without a pre-release is higher than any of its
+			# pre-releases
+			if len(elements) < 2:
+				preReleaseKey = (1, )
+			else:
+				preReleaseKey = (0, cls._naturalKey(elements[1]))
+
+			key = tuple.__new__(cls, (bareKey, preReleaseKey))
+			cls._cache[version] = key
+		return key
+
+	@classmethod
+	def _naturalKey(cls, string):
+		"""the key naturalCompare() compares by"""
+
+		return tuple(int(text) if text.isdigit() else text.lower()
+			for text in cls._numberPattern.split(string))
+
 def filteredEnvironment():
 	"""returns a filtered version of os.environ, such that none of the
 	   variables that we export for one port leak into the shell environment
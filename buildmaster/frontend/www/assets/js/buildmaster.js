@@ -1,6 +1,11 @@
 'use strict';
 
 
+// the templates are moved out of the document once it is loaded, so that
+// they don't interfere with selectors matching the rendered status
+var templateStore = null;
+
+
 function findElement(elementSelector, baseElement)
 {
 	if (baseElement === undefined)
@@ -81,6 +86,9 @@ function mapContentFromObject(object, map, baseElement)
 
 function createFromTemplate(templateSelector, baseElement)
 {
+	if (baseElement === undefined)
+		baseElement = templateStore || document;
+
 	var template = findElement(templateSelector, baseElement).cloneNode(true);
 	template.attributes.removeNamedItem('id');
 	template.classList.remove('template');
@@ -122,7 +130,24 @@ function createInlineViewer(event)
 
 function BuildMaster()
 {
+	templateStore = document.createElement('div');
+	Array.from(document.querySelectorAll('.template')).forEach(
+		(template) => templateStore.appendChild(template));
+
 	this.baseDir = 'buildruns/';
+	this.pollInterval = 5000;
+	this.buildLists = {
+		'active': { name: 'Active', selector: '#activeBuilds' },
+		'scheduled': { name: 'Scheduled', selector: '#scheduledBuilds' },
+		'blocked': { name: 'Blocked', selector: '#blockedBuilds' },
+		'complete': { name: 'Complete', selector: '#completeBuilds' },
+		'failed': { name: 'Failed', selector: '#failedBuilds' },
+		'lost': { name: 'Lost', selector: '#lostBuilds' },
+		'skipped': { name: 'Skipped', selector: '#skippedBuilds',
+			template: '#skippedBuildTemplate' }
+	};
+	this.buildElements = {};
+
 	var buildrunDir
 		= getSearchParameter('buildrunDir', '[a-zA-Z0-9][a-zA-Z0-9.-/]*', '');
 	if (buildrunDir.length > 0)
@@ -149,16 +174,96 @@ BuildMaster.prototype.fetchStatus = function(buildrunDir)
 		this.populateBuildruns.bind(this));
 
 	setElementContent('#loadStatus', 'Loading buildrun status...');
-	this.fetch(this.buildrunDir + 'status.json', function(response) {
-			this.status = JSON.parse(response);
+
+	// Buildruns with an event journal are loaded from its last snapshot and
+	// then kept up to date with the events appended to the journal since.
+	var loadStatus = function(status, journalOffset) {
+			this.status = status;
 			setElementContent('#loadStatus', '');
 			this.portsTreeOriginURL = this.status.portsTreeOriginURL;
 			this.portsTreeHead = this.status.portsTreeHead;
 			this.showStatus();
-		}.bind(this), function(status) {
-			setElementContent('#loadStatus', 'Failed to load buildrun status: '
-				+ status);
-		});
+
+			if (journalOffset !== undefined) {
+				this.journalOffset = journalOffset;
+				this.pollJournal();
+			}
+		}.bind(this);
+
+	this.fetch(this.buildrunDir + 'events.snapshot.json', function(response) {
+			var snapshot = JSON.parse(response);
+			loadStatus(snapshot.status, snapshot.offset);
+		}, function() {
+			this.fetch(this.buildrunDir + 'status.json', function(response) {
+					loadStatus(JSON.parse(response));
+				}, function(status) {
+					setElementContent('#loadStatus',
+						'Failed to load buildrun status: ' + status);
+				});
+		}.bind(this));
+}
+
+
+BuildMaster.prototype.pollJournal = function()
+{
+	if (this.status.endTime)
+		return;
+
+	var request = new XMLHttpRequest();
+	request.open('GET', this.buildrunDir + 'events.ndjson');
+	request.setRequestHeader('Range', 'bytes=' + this.journalOffset + '-');
+	request.onreadystatechange = function() {
+			if (request.readyState != 4)
+				return;
+
+			// 416 means there is nothing new, servers not supporting ranges
+			// send the whole journal
+			var events = '';
+			if (request.status == 206)
+				events = request.responseText;
+			else if (request.status == 200)
+				events = request.responseText.substring(this.journalOffset);
+
+			// the last line may still be incomplete
+			var end = events.lastIndexOf('\n') + 1;
+			events.substring(0, end).split('\n').forEach((line) => {
+					if (line.length > 0)
+						this.applyEvent(JSON.parse(line));
+				});
+			this.journalOffset += end;
+
+			window.setTimeout(this.pollJournal.bind(this), this.pollInterval);
+		}.bind(this);
+
+	request.send(null);
+}
+
+
+BuildMaster.prototype.applyEvent = function(event)
+{
+	if (event.type == 'buildrunStatus') {
+		this.status.buildStatus = event.buildStatus;
+		this.status.startTime = event.startTime;
+		this.status.endTime = event.endTime;
+		this.showBuildrunInfo();
+	} else if (event.type == 'builderState') {
+		// the event only has the changed fields, keep the others
+		var name = event.builder.name;
+		var builder = {};
+		for (var list in this.status.builders) {
+			this.status.builders[list] = this.status.builders[list].filter(
+				(entry) => {
+					if (entry.name != name)
+						return true;
+					builder = entry;
+					return false;
+				});
+		}
+		this.status.builders[event.list].push(
+			Object.assign(builder, event.builder));
+		this.showBuilders();
+	} else if (event.build)
+		this.moveBuild(event.build, event.list);
 }
 
 
@@ -268,9 +373,15 @@ BuildMaster.prototype.logViewerURL = function(path)
 }
 
 
-BuildMaster.prototype.addLogs = function(selector, path)
+BuildMaster.prototype.addLogs = function(selector, path, baseElement,
+	rawPath)
 {
-	Array.from(document.querySelectorAll(selector)).forEach((element) => {
+	if (baseElement === undefined)
+		baseElement = document;
+	if (rawPath === undefined)
+		rawPath = path;
+
+	Array.from(baseElement.querySelectorAll(selector)).forEach((element) => {
 			var source = element.textContent;
 			if (!source)
 				return;
@@ -282,48 +393,90 @@ BuildMaster.prototype.addLogs = function(selector, path)
 		});
 
 	wrapElements(selector + ' .raw', 'a', {
-			'href': this.rawLogURL(path),
+			'href': this.rawLogURL(rawPath),
 			'target': '_blank',
 			'rel': 'noopener'
-		}, 'source');
+		}, 'source', undefined, baseElement);
 	wrapElements(selector + ' .viewer', 'a', {
 			'href': this.logViewerURL(path),
 			'target': '_blank',
 			'rel': 'noopener'
-		}, 'source');
+		}, 'source', undefined, baseElement);
 	wrapElements(selector + ' .inline', 'a', {
 			'data-url': this.logViewerURL(path)
-		}, 'source', createInlineViewer);
+		}, 'source', createInlineViewer, baseElement);
+}
+
+
+BuildMaster.prototype.addRecipeLinks = function(baseElement)
+{
+	wrapElements('.recipeFilePath', 'a', {
+			'href': this.recipeFileURL(),
+			'target': '_blank',
+			'rel': 'noopener'
+		}, undefined, undefined, baseElement);
 }
 
 
 BuildMaster.prototype.showStatus = function()
 {
-	this.status.duration = this.status.startTime && this.status.endTime
-		? Math.round(this.status.endTime - this.status.startTime) + 's' : '';
-	this.status.startTime = this.status.startTime
-		? new Date(this.status.startTime * 1000).toString() : '';
-	this.status.endTime = this.status.endTime
-		? new Date(this.status.endTime * 1000).toString() : '';
+	this.showBuildrunInfo();
+	this.showBuilders();
+
+	for (var list in this.buildLists) {
+		var buildList = this.status.builds[list];
+		if (!buildList)
+			continue;
 
-	mapContentFromObject(this.status, {
+		buildList.forEach((build) => this.addBuild(list, build));
+		this.updateBuildCount(list);
+	}
+
+	this.showBuildCounts();
+
+	this.addLogs('#masterLog', 'master.log');
+
+	wrapElements('#portsTreeHead', 'a', {
+			'href': this.commitURL(),
+			'target': '_blank',
+			'rel': 'noopener'
+		});
+
+	if (typeof this.onstatusloaded === 'function')
+		this.onstatusloaded();
+}
+
+
+BuildMaster.prototype.showBuildrunInfo = function()
+{
+	var status = this.status;
+	mapContentFromObject({
+			'portsTreeHead': status.portsTreeHead,
+			'buildStatus': status.buildStatus,
+			'startTime': status.startTime
+				? new Date(status.startTime * 1000).toString() : '',
+			'endTime': status.endTime
+				? new Date(status.endTime * 1000).toString() : '',
+			'duration': status.startTime && status.endTime
+				? Math.round(status.endTime - status.startTime) + 's' : ''
+		}, {
 			'portsTreeHead': '#portsTreeHead',
 			'buildStatus': '#buildStatus',
 			'startTime': '#startTime',
 			'endTime': '#endTime',
 			'duration': '#duration'
 		});
+}
 
-	var addBuildCount = function(name, count, linkTarget) {
-			var element = createFromTemplate('#buildCountTemplate');
-			setElementContent('.name', name, element);
-			setElementContent('.buildCount', count, element);
-			findElement('.link', element).href = linkTarget;
-			findElement('#buildCounts').appendChild(element);
-		};
+
+BuildMaster.prototype.showBuilders = function()
+{
+	var buildersElement = findElement('#builders');
+	removeElements('.builderEntry', buildersElement);
 
 	var addBuilder = function(parentElement, active, builder) {
 			var element = createFromTemplate('#builderTemplate');
+			element.classList.add('builderEntry');
 			mapContentFromObject(builder, {
 					'name': '.builderName',
 				}, element);
@@ -365,8 +518,17 @@ BuildMaster.prototype.showStatus = function()
 	totalBuilders += addBuilderList('#lostBuilders',
 		this.status.builders.lost);
 
-	setElementContent('.count', totalBuilders, findElement('#builders'));
+	setElementContent('.count', totalBuilders, buildersElement);
 
+	this.addLogs('.builderName', 'builders/%s.log', buildersElement);
+	this.addLogs('.buildNumber', 'builds/%s.log', buildersElement,
+		'builds/%s.log.gz');
+	this.addRecipeLinks(buildersElement);
+}
+
+
+BuildMaster.prototype.addBuild = function(list, build)
+{
 	var addString = function(parentElement, className, string) {
 			var element = document.createElement('div');
 			element.className = className;
@@ -391,79 +553,92 @@ BuildMaster.prototype.showStatus = function()
 				removeElement(targetElement.parentElement);
 		};
 
-	var addBuild = function(parentElement, template, build) {
-			var element
-				= createFromTemplate(template || '#scheduledBuildTemplate');
+	var element = createFromTemplate(
+		this.buildLists[list].template || '#scheduledBuildTemplate');
 
-			mapContentFromObject(build, {
-					'port.revisionedName': '.revisionedName',
-					'port.recipeFilePath': '.recipeFilePath'
-				}, element);
+	mapContentFromObject(build, {
+			'port.revisionedName': '.revisionedName',
+			'port.recipeFilePath': '.recipeFilePath'
+		}, element);
 
-			parentElement.appendChild(element);
+	findElement(this.buildLists[list].selector).appendChild(element);
 
-			addStringList(findElement('.buildNumbers', element),
-				'buildNumber', build.buildNumbers);
-			addStringList(findElement('.resultingPackages', element),
-				'packageName', build.resultingPackages, true);
-			addStringList(findElement('.requiredPackages', element),
-				'packageName', build.requiredPackages, true);
-			addStringList(findElement('.missingPackages', element),
-				'packageID', build.missingPackageIDs, true);
-
-			if (build.reason)
-				setElementContent('.reason', build.reason, element)
-		};
+	addStringList(findElement('.buildNumbers', element),
+		'buildNumber', build.buildNumbers);
+	addStringList(findElement('.resultingPackages', element),
+		'packageName', build.resultingPackages, true);
+	addStringList(findElement('.requiredPackages', element),
+		'packageName', build.requiredPackages, true);
+	addStringList(findElement('.missingPackages', element),
+		'packageID', build.missingPackageIDs, true);
 
-	var addBuildList = function(name, targetSelector, buildList, template) {
-			if (!buildList)
-				return 0;
+	if (build.reason)
+		setElementContent('.reason', build.reason, element)
 
-			var parentElement = findElement(targetSelector);
-			addBuildCount(name, buildList.length, targetSelector);
-			setElementContent('.count', buildList.length, parentElement);
-			buildList.forEach(addBuild.bind(null, parentElement, template));
-			return buildList.length;
-		};
+	this.addLogs('.buildNumber', 'builds/%s.log', element,
+		'builds/%s.log.gz');
+	this.addRecipeLinks(element);
 
-	var totalBuilds = 0;
-	totalBuilds += addBuildList('Active', '#activeBuilds',
-		this.status.builds.active);
-	totalBuilds += addBuildList('Scheduled', '#scheduledBuilds',
-		this.status.builds.scheduled);
-	totalBuilds += addBuildList('Blocked', '#blockedBuilds',
-		this.status.builds.blocked);
-	totalBuilds += addBuildList('Complete', '#completeBuilds',
-		this.status.builds.complete);
-	totalBuilds += addBuildList('Failed', '#failedBuilds',
-		this.status.builds.failed);
-	totalBuilds += addBuildList('Lost', '#lostBuilds',
-		this.status.builds.lost);
-	totalBuilds += addBuildList('Skipped', '#skippedBuilds',
-		this.status.builds.skipped, '#skippedBuildTemplate');
+	this.buildElements[build.port.revisionedName] = {
+		list: list,
+		element: element
+	};
+}
 
-	addBuildCount('Total', totalBuilds, '#builds');
-	setElementContent('.count', totalBuilds, findElement('#builds'));
 
-	this.addLogs('#masterLog', 'master.log');
-	this.addLogs('.builderName', 'builders/%s.log');
-	this.addLogs('.buildNumber', 'builds/%s.log');
+BuildMaster.prototype.moveBuild = function(build, list)
+{
+	var name = build.port.revisionedName;
+	var previous = this.buildElements[name];
+	if (previous !== undefined) {
+		removeElement(previous.element);
+		this.status.builds[previous.list]
+			= this.status.builds[previous.list].filter(
+				(other) => other.port.revisionedName != name);
+		this.updateBuildCount(previous.list);
+	}
 
-	wrapElements('#portsTreeHead', 'a', {
-			'href': this.commitURL(),
-			'target': '_blank',
-			'rel': 'noopener'
-		});
-	wrapElements('.recipeFilePath', 'a', {
-			'href': this.recipeFileURL(),
-			'target': '_blank',
-			'rel': 'noopener'
-		});
+	this.status.builds[list].push(build);
+	this.addBuild(list, build);
+	this.updateBuildCount(list);
+	this.showBuildCounts();
+}
 
-	removeElements('.template');
 
-	if (typeof this.onstatusloaded === 'function')
-		this.onstatusloaded();
+BuildMaster.prototype.updateBuildCount = function(list)
+{
+	setElementContent('.count', this.status.builds[list].length,
+		findElement(this.buildLists[list].selector));
+}
+
+
+BuildMaster.prototype.showBuildCounts = function()
+{
+	var buildCounts = findElement('#buildCounts');
+	removeElements('.buildCountEntry', buildCounts);
+
+	var addBuildCount = function(name, count, linkTarget) {
+			var element = createFromTemplate('#buildCountTemplate');
+			element.classList.add('buildCountEntry');
+			setElementContent('.name', name, element);
+			setElementContent('.buildCount', count, element);
+			findElement('.link', element).href = linkTarget;
+			buildCounts.appendChild(element);
+		};
+
+	var totalBuilds = 0;
+	for (var list in this.buildLists) {
+		var buildList = this.status.builds[list];
+		if (!buildList)
+			continue;
+
+		addBuildCount(this.buildLists[list].name, buildList.length,
+			this.buildLists[list].selector);
+		totalBuilds += buildList.length;
+	}
+
+	addBuildCount('Total', totalBuilds, '#builds');
+	setElementContent('.count', totalBuilds, findElement('#builds'));
 }
 
 
@@ -61,7 +61,7 @@ function replaceAttributes(match, inner)
 }
 
 
-function parseLogfile(content)
+function formatLog(content)
 {
 	const replacements = [
 			{ what: '<', with: '&lt;' },
@@ -73,14 +73,244 @@ function parseLogfile(content)
 			{ what: '\x1b\\[(([0-9]*;?)*)m', with: replaceAttributes }
 		];
 
-	document.body.textContent = 'parsing escape sequences';
-	document.body.innerHTML = replacements.reduce((value, replace) => {
+	return replacements.reduce((value, replace) => {
 			return value.replace(new RegExp(replace.what, 'g'), replace.with);
 		}, content);
+}
+
+
+function parseLogfile(content)
+{
+	document.body.textContent = 'parsing escape sequences';
+	document.body.innerHTML = formatLog(content);
 	document.documentElement.scrollTop = document.documentElement.scrollHeight;
 }
 
 
+function fetchRange(url, start, end)
+{
+	var range = 'bytes=' + start + '-' + (end !== undefined ? end : '');
+	return fetch(url, { headers: { 'Range': range }, cache: 'no-store' })
+		.then((response) => {
+			// 416: there is nothing after start (yet)
+			if (response.status == 416)
+				return new ArrayBuffer(0);
+			if (!response.ok)
+				throw response.status + ' ' + response.statusText;
+
+			// servers not supporting ranges send the whole file
+			return response.arrayBuffer().then((buffer) =>
+				response.status == 206 ? buffer : buffer.slice(start,
+					end !== undefined ? end + 1 : undefined));
+		});
+}
+
+
+function decompress(buffer)
+{
+	return new Response(new Blob([buffer]).stream().pipeThrough(
+		new DecompressionStream('gzip'))).arrayBuffer();
+}
+
+
+// Shows a log written by the buildmaster in compressed chunks (see
+// ChunkedLog.py). Only the last complete chunk and the chunk being written
+// are fetched initially, or the chunk containing the line given as
+// "#line=<number>". Further chunks are fetched on request and the end of
+// the log is followed while it is being written.
+function ChunkedLogViewer(logfile, index)
+{
+	this.logfile = logfile;
+	this.baseURL = logfile.substring(0, logfile.lastIndexOf('/') + 1);
+	this.decoder = new TextDecoder();
+	this.pollInterval = 5000;
+	this.index = index;
+
+	var chunkCount = index.chunks.length;
+	var line = Number.parseInt(
+		(window.location.hash.match(/line=([0-9]+)/) || [])[1]);
+	var chunk = index.chunks.findIndex(
+		(chunk) => line < chunk[2] + chunk[3]);
+	if (Number.isNaN(line) || chunk < 0)
+		chunk = Math.max(chunkCount - 1, 0);
+
+	// the loaded chunks are [firstChunk, endChunk), followed by the part of
+	// the open chunk up to openOffset when following the end of the log
+	this.firstChunk = chunk;
+	this.endChunk = chunk;
+	this.openOffset = 0;
+
+	document.body.textContent = '';
+	this.earlierButton = this.createButton('Load earlier lines',
+		this.loadEarlier);
+	this.content = document.createElement('div');
+	document.body.appendChild(this.content);
+	this.laterButton = this.createButton('Load later lines', this.loadLater);
+
+	// loading the last complete chunk starts following the log
+	if (chunk < chunkCount)
+		this.loadLater();
+	else
+		this.follow();
+	this.updateButtons();
+}
+
+
+ChunkedLogViewer.prototype.createButton = function(label, onclick)
+{
+	var button = document.createElement('button');
+	button.textContent = label;
+	button.onclick = onclick.bind(this);
+	document.body.appendChild(button);
+	return button;
+}
+
+
+ChunkedLogViewer.prototype.updateButtons = function()
+{
+	this.earlierButton.hidden = this.firstChunk == 0;
+	this.laterButton.hidden = this.following
+		|| this.endChunk >= this.index.chunks.length;
+}
+
+
+ChunkedLogViewer.prototype.fetchChunk = function(chunk)
+{
+	var offset = this.index.chunks[chunk][0];
+	var size = this.index.chunks[chunk][1];
+	return fetchRange(this.logfile + '.gz', offset, offset + size - 1)
+		.then(decompress);
+}
+
+
+ChunkedLogViewer.prototype.render = function(buffer)
+{
+	var element = document.createElement('div');
+	element.innerHTML = formatLog(this.decoder.decode(buffer));
+	return element;
+}
+
+
+ChunkedLogViewer.prototype.append = function(buffer)
+{
+	if (buffer.byteLength == 0)
+		return;
+
+	var root = document.documentElement;
+	var atEnd = root.scrollTop + root.clientHeight >= root.scrollHeight - 1;
+	this.content.appendChild(this.render(buffer));
+	if (atEnd && this.following)
+		root.scrollTop = root.scrollHeight;
+}
+
+
+ChunkedLogViewer.prototype.loadEarlier = function()
+{
+	if (this.firstChunk == 0 || this.loading)
+		return Promise.resolve();
+
+	var chunk = this.firstChunk - 1;
+	this.loading = true;
+	return this.fetchChunk(chunk).then((buffer) => {
+			// the escape sequence state belongs to the later lines
+			var setAttributes = gSetAttributes;
+			gSetAttributes = [];
+			this.content.insertBefore(this.render(buffer),
+				this.content.firstChild);
+			gSetAttributes = setAttributes;
+			this.firstChunk = chunk;
+		}).finally(() => {
+			this.loading = false;
+			this.updateButtons();
+		});
+}
+
+
+ChunkedLogViewer.prototype.loadLater = function()
+{
+	if (this.endChunk >= this.index.chunks.length || this.loading)
+		return Promise.resolve();
+
+	var chunk = this.endChunk;
+	this.loading = true;
+	return this.fetchChunk(chunk).then((buffer) => {
+			this.append(buffer);
+			this.endChunk = chunk + 1;
+		}).finally(() => {
+			this.loading = false;
+			if (this.endChunk == this.index.chunks.length && !this.following)
+				this.follow();
+			this.updateButtons();
+		});
+}
+
+
+ChunkedLogViewer.prototype.follow = function()
+{
+	this.following = true;
+	var root = document.documentElement;
+	root.scrollTop = root.scrollHeight;
+	this.update();
+}
+
+
+ChunkedLogViewer.prototype.isUpToDate = function()
+{
+	return this.index.complete && this.endChunk == this.index.chunks.length;
+}
+
+
+ChunkedLogViewer.prototype.update = function()
+{
+	if (this.isUpToDate())
+		return;
+
+	fetch(this.logfile + '.index', { cache: 'no-store' })
+		.then((response) => response.json())
+		.then((index) => {
+			this.index = index;
+
+			// Fetch the chunks completed since the last update in order, the
+			// first of them is the one that has been shown up to openOffset
+			// so far. The position only advances once a chunk has been
+			// shown, so a failed fetch is retried with the next update.
+			var pending = Promise.resolve();
+			for (let chunk = this.endChunk; chunk < index.chunks.length;
+					chunk++) {
+				pending = pending
+					.then(() => this.fetchChunk(chunk))
+					.then((buffer) => {
+						this.append(buffer.slice(this.openOffset));
+						this.endChunk = chunk + 1;
+						this.openOffset = 0;
+					});
+			}
+
+			if (!index.openChunk)
+				return pending;
+
+			return pending
+				.then(() => fetchRange(this.baseURL + index.openChunk,
+					this.openOffset))
+				.then((buffer) => {
+					// only show complete lines
+					var end = new Uint8Array(buffer).lastIndexOf(10) + 1;
+					this.append(buffer.slice(0, end));
+					this.openOffset += end;
+				});
+		})
+		.catch(() => {
+			// the open chunk may have been completed meanwhile, retry
+		})
+		.then(() => {
+			if (!this.isUpToDate()) {
+				window.setTimeout(this.update.bind(this),
+					this.pollInterval);
+			}
+		});
+}
+
+
 function init()
 {
 	var logfile = window.location.search.substring(1);
@@ -91,13 +321,22 @@ function init()
 	}
 
 	document.body.textContent = 'fetching "' + logfile + '"';
-	fetch(logfile).then((response) => {
+
+	// logs written in chunks have an index, others are fetched completely
+	fetch(logfile + '.index', { cache: 'no-store' }).then((response) => {
 			if (!response.ok)
-				throw response.status + ' ' + response.statusText;
-			return response.text()
-		}).then(parseLogfile, (error) => {
-			document.body.textContent
-				= 'failed to load logfile "' + logfile + '": ' + error;
+				throw response.status;
+			return response.json();
+		}).then((index) => new ChunkedLogViewer(logfile, index), () => {
+			fetch(logfile).then((response) => {
+					if (!response.ok)
+						throw response.status + ' ' + response.statusText;
+					return response.text()
+				}).then(parseLogfile, (error) => {
+					document.body.textContent
+						= 'failed to load logfile "' + logfile + '": '
+							+ error;
+				});
 		});
 }
 
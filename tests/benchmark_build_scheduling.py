@@ -0,0 +1,115 @@
+# Copyright 2024 Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+"""Benchmark for the build master scheduling policies.
+
+Simulates a buildrun over a synthetic dependency graph of ports, with a
+toolchain-like chain of long builds at its base, and prints the makespan
+each scheduling policy achieves. Run it directly:
+
+    python tests/benchmark_build_scheduling.py [port-count] [builder-count]
+"""
+import heapq
+import os
+import random
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from HaikuPorter.SchedulingPolicy import schedulingPolicies  # noqa: E402
+
+
+class Build:
+    """Stands in for a ScheduledBuild"""
+
+    def __init__(self, port, missing_package_ids):
+        self.port = port
+        self.missingPackageIDs = missing_package_ids
+
+
+def make_builds(count, generator):
+    """Returns the builds in scheduling (alphabetical) order along with the
+    duration of each of them"""
+    builds = []
+    durations = {}
+    for index in range(count):
+        name = "port%04d" % index
+        package = SimpleNamespace(versionedName=name + "-1")
+        port = SimpleNamespace(name=name, packages=[package])
+        if index < 8:
+            # a chain of long builds, like the toolchain
+            requires = list(range(index))[-1:]
+            duration = generator.uniform(1800, 3600)
+        else:
+            requires = generator.sample(range(index), min(index, 3))
+            # a few big ones, like the frameworks and the browsers
+            if generator.random() < 0.02:
+                duration = generator.uniform(3600, 3 * 3600)
+            else:
+                duration = generator.lognormvariate(4.5, 1.2)
+        builds.append(Build(port,
+                            set("port%04d-1" % other for other in requires)))
+        durations[name] = duration
+
+    # ports are scheduled by name, which has little to do with the order in
+    # which they depend on each other
+    generator.shuffle(builds)
+    return builds, durations
+
+
+def simulate(policy, builds, durations, builder_count):
+    """Returns the makespan of building all builds with the given policy"""
+    policy.prepare(builds, durations)
+
+    missing = {build: set(build.missingPackageIDs) for build in builds}
+    waiting_for = {}
+    for build in builds:
+        for package_id in build.missingPackageIDs:
+            waiting_for.setdefault(package_id, []).append(build)
+
+    buildable = [build for build in builds if not missing[build]]
+    running = []
+    now = 0.0
+    idle = builder_count
+    sequence = 0
+    while buildable or running:
+        while idle and buildable:
+            build = policy.selectBuild(buildable)
+            buildable.remove(build)
+            heapq.heappush(running, (now + durations[build.port.name],
+                                     sequence, build))
+            sequence += 1
+            idle -= 1
+
+        now, _, build = heapq.heappop(running)
+        idle += 1
+        for package in build.port.packages:
+            for dependent in waiting_for.get(package.versionedName, []):
+                missing[dependent].discard(package.versionedName)
+                if not missing[dependent]:
+                    buildable.append(dependent)
+
+    return now
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    builder_count = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    builds, durations = make_builds(count, random.Random(0))
+
+    # no schedule can be shorter than the longest chain of builds or the
+    # total build time spread evenly over all builders
+    policy = schedulingPolicies["critical-path"]()
+    policy.prepare(builds, durations)
+    lower_bound = max(max(policy.priority(build)[0] for build in builds),
+                      sum(durations.values()) / builder_count)
+    print("lower bound: %.1fh" % (lower_bound / 3600))
+
+    for name, policy_class in sorted(schedulingPolicies.items()):
+        makespan = simulate(policy_class(), builds, durations, builder_count)
+        print("%s: makespan %.1fh with %d builders (%d ports)"
+              % (name, makespan / 3600, builder_count, count))
+
+
+if __name__ == "__main__":
+    main()
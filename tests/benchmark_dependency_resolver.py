@@ -0,0 +1,98 @@
+# Copyright 2024 Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+"""Benchmark for the DependencyResolver.
+
+Generates a synthetic ports tree worth of DependencyInfo files and resolves
+the build dependency closure of the packages at the top of the tree, which
+covers most of it. Run it directly:
+
+    python tests/benchmark_dependency_resolver.py [package-count]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from HaikuPorter import BuildPlatform  # noqa: E402
+from HaikuPorter.DependencyResolver import DependencyResolver  # noqa: E402
+from HaikuPorter.Options import parseOptions  # noqa: E402
+
+ARCHITECTURE = "x86_64"
+
+
+def write_dependency_infos(directory, count, generator):
+    """Writes count DependencyInfo files, each package requiring a few of
+    the packages written before it and providing a library and a command"""
+    paths = []
+    for index in range(count):
+        name = "pkg%d" % index
+        earlier = range(index)
+        requires = ["lib:libpkg%d >= 1" % other for other in
+                    generator.sample(earlier, min(index, 4))]
+        build_requires = ["cmd:pkg%d" % other for other in
+                          generator.sample(earlier, min(index, 8))]
+        dependency_info = {
+            "name": name,
+            "version": "1.%d-1" % (index % 7),
+            "architecture": ARCHITECTURE,
+            "provides": [
+                "%s = 1.%d-1" % (name, index % 7),
+                "lib:lib%s = 1.%d compat >= 1" % (name, index % 7),
+                "cmd:%s" % name,
+            ],
+            "requires": ["haiku"] + requires,
+            "buildRequires": build_requires,
+            "buildPrerequires": ["cmd:gcc", "cmd:make"],
+            "testRequires": [],
+        }
+        path = os.path.join(directory, name + "-1.DependencyInfo")
+        with open(path, "w") as dependency_info_file:
+            json.dump(dependency_info, dependency_info_file)
+        paths.append(path)
+
+    for name in ["haiku", "gcc", "make"]:
+        dependency_info = {
+            "name": name,
+            "version": "1-1",
+            "architecture": ARCHITECTURE,
+            "provides": [name + " = 1-1", "cmd:" + name],
+            "requires": [],
+            "buildRequires": [],
+            "buildPrerequires": [],
+            "testRequires": [],
+        }
+        with open(os.path.join(directory, name + "-1.DependencyInfo"),
+                  "w") as dependency_info_file:
+            json.dump(dependency_info, dependency_info_file)
+
+    return paths
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    sys.argv = sys.argv[:1]
+    parseOptions()
+    BuildPlatform.buildPlatform.targetArchitecture = ARCHITECTURE
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_dependency_infos(directory, count, random.Random(0))
+
+        # resolve the closure of the last packages, which depend on most of
+        # the tree, each with a resolver of its own
+        start = time.perf_counter()
+        closure_size = 0
+        for path in paths[-10:]:
+            resolver = DependencyResolver(None, ["BUILD_REQUIRES",
+                                                 "BUILD_PREREQUIRES"],
+                                          [directory], quiet=True)
+            closure_size += len(resolver.determineRequiredPackagesFor([path]))
+        elapsed = time.perf_counter() - start
+
+    print("%d packages: %.3fs for 10 closures (%d packages in total)"
+          % (count, elapsed, closure_size))
+
+if __name__ == "__main__":
+    main()
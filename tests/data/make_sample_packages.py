@@ -0,0 +1,363 @@
+# Copyright 2024 Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+"""Writes the sample hpkg files used by test_hpkg_reader.py
+
+The packages follow the version 2 package file format as documented in
+Haiku's docs/develop/packages/FileFormat.rst and headers/os/package/hpkg/
+HPKGDefs.h. Run this script from any directory to regenerate them next to
+it. The .listing files are not generated, see README.md.
+"""
+import os
+import random
+import struct
+import zlib
+
+OUTPUT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# attribute types
+T_UINT = 2
+T_STRING = 3
+T_RAW = 4
+
+# attribute IDs (B_HPKG_ATTRIBUTE_ID_*)
+DIRECTORY_ENTRY = 0
+FILE_TYPE = 1
+FILE_PERMISSIONS = 2
+FILE_MTIME = 6
+DATA = 13
+PACKAGE_NAME = 15
+PACKAGE_SUMMARY = 16
+PACKAGE_DESCRIPTION = 17
+PACKAGE_VENDOR = 18
+PACKAGE_PACKAGER = 19
+PACKAGE_FLAGS = 20
+PACKAGE_ARCHITECTURE = 21
+PACKAGE_VERSION_MAJOR = 22
+PACKAGE_VERSION_MINOR = 23
+PACKAGE_VERSION_MICRO = 24
+PACKAGE_VERSION_REVISION = 25
+PACKAGE_COPYRIGHT = 26
+PACKAGE_LICENSE = 27
+PACKAGE_PROVIDES = 28
+PACKAGE_REQUIRES = 29
+PACKAGE_SUPPLEMENTS = 30
+PACKAGE_CONFLICTS = 31
+PACKAGE_FRESHENS = 32
+PACKAGE_REPLACES = 33
+PACKAGE_RESOLVABLE_OPERATOR = 34
+PACKAGE_VERSION_PRE_RELEASE = 36
+PACKAGE_PROVIDES_COMPATIBLE = 37
+PACKAGE_URL = 38
+PACKAGE_SOURCE_URL = 39
+PACKAGE_INSTALL_PATH = 40
+PACKAGE_BASE_PACKAGE = 41
+
+# architectures (B_PACKAGE_ARCHITECTURE_*)
+ARCH_ANY = 0
+ARCH_X86_GCC2 = 2
+ARCH_X86_64 = 4
+
+# resolvable operators (B_PACKAGE_RESOLVABLE_OP_*)
+OP_LESS = 0
+OP_LESS_EQUAL = 1
+OP_EQUAL = 2
+OP_NOT_EQUAL = 3
+OP_GREATER_EQUAL = 4
+OP_GREATER = 5
+
+# heap compression (B_HPKG_COMPRESSION_*)
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+
+HEAP_CHUNK_SIZE = 64 * 1024
+
+
+class Attribute:
+    """An attribute with its children, strings may be stored in the
+    section's string table and raw data in the heap"""
+
+    def __init__(self, attribute_id, attribute_type, value, children=(),
+                 in_table=False, heap_offset=None):
+        self.attribute_id = attribute_id
+        self.attribute_type = attribute_type
+        self.value = value
+        self.children = list(children)
+        self.in_table = in_table
+        self.heap_offset = heap_offset
+
+
+def unsigned_leb128(value):
+    """Returns the unsigned LEB128 encoding of the given value"""
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if not value:
+            encoded.append(byte)
+            return bytes(encoded)
+        encoded.append(byte | 0x80)
+
+
+def encode_attributes(attributes, strings):
+    """Returns the encoded attribute list, terminated by a 0 tag"""
+    encoded = bytearray()
+    for attribute in attributes:
+        if attribute.attribute_type == T_UINT:
+            value = attribute.value
+            encoding = (0 if value < 1 << 8 else 1 if value < 1 << 16
+                        else 2 if value < 1 << 32 else 3)
+            payload = value.to_bytes(1 << encoding, 'big')
+        elif attribute.attribute_type == T_STRING:
+            if attribute.in_table:
+                encoding = 1
+                payload = unsigned_leb128(strings.index(attribute.value))
+            else:
+                encoding = 0
+                payload = attribute.value.encode('utf-8') + b'\0'
+        elif attribute.heap_offset is not None:
+            encoding = 1
+            payload = (unsigned_leb128(len(attribute.value))
+                       + unsigned_leb128(attribute.heap_offset))
+        else:
+            encoding = 0
+            payload = unsigned_leb128(len(attribute.value)) + attribute.value
+
+        tag = ((attribute.attribute_id << 7)
+               | (attribute.attribute_type << 4) | (encoding << 1)
+               | (1 if attribute.children else 0)) + 1
+        encoded += unsigned_leb128(tag) + payload
+        if attribute.children:
+            encoded += encode_attributes(attribute.children, strings)
+
+    encoded += unsigned_leb128(0)
+    return bytes(encoded)
+
+
+def encode_section(attributes, strings):
+    """Returns the section data (string table followed by the attributes),
+    the length of the string table and the number of strings"""
+    string_table = b''.join(string.encode('utf-8') + b'\0'
+                            for string in strings) + b'\0'
+    return (string_table + encode_attributes(attributes, strings),
+            len(string_table), len(strings))
+
+
+def version(attribute_id, major, minor=None, micro=None, pre_release=None,
+            revision=0, in_table=False):
+    """Returns a version attribute"""
+    children = []
+    if minor:
+        children.append(Attribute(PACKAGE_VERSION_MINOR, T_STRING, minor))
+        if micro:
+            children.append(Attribute(PACKAGE_VERSION_MICRO, T_STRING,
+                                      micro))
+    if pre_release:
+        children.append(Attribute(PACKAGE_VERSION_PRE_RELEASE, T_STRING,
+                                  pre_release))
+    if revision:
+        children.append(Attribute(PACKAGE_VERSION_REVISION, T_UINT,
+                                  revision))
+    return Attribute(attribute_id, T_STRING, major, children,
+                     in_table=in_table)
+
+
+def resolvable(attribute_id, name, operator=None, resolvable_version=None,
+               in_table=False):
+    """Returns a provides/requires/... attribute"""
+    children = []
+    if operator is not None:
+        children.append(Attribute(PACKAGE_RESOLVABLE_OPERATOR, T_UINT,
+                                  operator))
+    if resolvable_version:
+        children.append(resolvable_version)
+    return Attribute(attribute_id, T_STRING, name, children,
+                     in_table=in_table)
+
+
+def write_package(file_name, attributes, attribute_strings, files,
+                  compression):
+    """Writes a package with the given package attributes and files, all of
+    the latter are put into a "bin" directory"""
+    heap = bytearray()
+    entries = []
+    for name, data in files:
+        # small files are stored inline (their data still goes to the heap)
+        offset = len(heap)
+        heap += data
+        if len(data) <= 8:
+            data_attribute = Attribute(DATA, T_RAW, data)
+        else:
+            data_attribute = Attribute(DATA, T_RAW, data, heap_offset=offset)
+        entries.append(Attribute(DIRECTORY_ENTRY, T_STRING, name, [
+            Attribute(FILE_TYPE, T_UINT, 0),
+            Attribute(FILE_PERMISSIONS, T_UINT, 0o644),
+            Attribute(FILE_MTIME, T_UINT, 1700000000),
+            data_attribute]))
+
+    toc = []
+    toc_strings = []
+    if files:
+        toc_strings.append('bin')
+        toc.append(Attribute(DIRECTORY_ENTRY, T_STRING, 'bin', [
+            Attribute(FILE_TYPE, T_UINT, 1),
+            Attribute(FILE_PERMISSIONS, T_UINT, 0o755)] + entries,
+            in_table=True))
+
+    # the TOC and the package attributes are at the end of the heap
+    toc_data, toc_strings_length, toc_strings_count \
+        = encode_section(toc, toc_strings)
+    heap += toc_data
+    attributes_data, attribute_strings_length, attribute_strings_count \
+        = encode_section(attributes, attribute_strings)
+    heap += attributes_data
+    uncompressed_size = len(heap)
+
+    if compression == COMPRESSION_NONE:
+        heap_data = bytes(heap)
+    else:
+        # chunks that don't get smaller are stored uncompressed, the sizes
+        # of all but the last chunk follow them
+        chunks = []
+        for offset in range(0, uncompressed_size, HEAP_CHUNK_SIZE):
+            chunk = bytes(heap[offset:offset + HEAP_CHUNK_SIZE])
+            compressed_chunk = zlib.compress(chunk, 9)
+            chunks.append(compressed_chunk
+                          if len(compressed_chunk) < len(chunk) else chunk)
+        heap_data = b''.join(chunks) + b''.join(
+            struct.pack('>H', len(chunk) - 1) for chunk in chunks[:-1])
+
+    header_size = 80
+    header = struct.pack(
+        '>4sHHQHHIQQIIIIQQQ', b'hpkg', header_size, 2,
+        header_size + len(heap_data), 0, compression, HEAP_CHUNK_SIZE,
+        len(heap_data), uncompressed_size, len(attributes_data),
+        attribute_strings_length, attribute_strings_count, 0, len(toc_data),
+        toc_strings_length, toc_strings_count)
+    with open(os.path.join(OUTPUT_DIR, file_name), 'wb') as package_file:
+        package_file.write(header + heap_data)
+
+
+def write_libsample():
+    """A zlib compressed package with several heap chunks, one of which is
+    incompressible, and all kinds of resolvables"""
+    generator = random.Random(1)
+    files = [
+        ('sample_tool', bytes(generator.randrange(256)
+                              for _ in range(70000))
+         + b'sample data ' * 9000),
+        ('README', b'tiny'),
+    ]
+    attributes = [
+        Attribute(PACKAGE_NAME, T_STRING, 'libsample', in_table=True),
+        Attribute(PACKAGE_SUMMARY, T_STRING, 'A sample library'),
+        Attribute(PACKAGE_DESCRIPTION, T_STRING,
+                  'A sample library, used to test reading package files.\n'
+                  'Second line.'),
+        Attribute(PACKAGE_VENDOR, T_STRING, 'Haiku Project', in_table=True),
+        Attribute(PACKAGE_PACKAGER, T_STRING, 'Jane Doe <jane@example.com>'),
+        Attribute(PACKAGE_FLAGS, T_UINT, 1),
+        Attribute(PACKAGE_ARCHITECTURE, T_UINT, ARCH_X86_64),
+        version(PACKAGE_VERSION_MAJOR, '1', '2', '3', 'rc1', 4),
+        Attribute(PACKAGE_COPYRIGHT, T_STRING, '2024 Haiku Project'),
+        Attribute(PACKAGE_LICENSE, T_STRING, 'MIT'),
+        Attribute(PACKAGE_URL, T_STRING, 'https://example.com/libsample'),
+        Attribute(PACKAGE_SOURCE_URL, T_STRING,
+                  'Download <https://example.com/libsample-1.2.3.tar.gz>'),
+        resolvable(PACKAGE_PROVIDES, 'libsample',
+                   resolvable_version=version(PACKAGE_VERSION_MAJOR, '1',
+                                              '2', '3', 'rc1', 4)),
+        Attribute(PACKAGE_PROVIDES, T_STRING, 'lib:libsample', [
+            version(PACKAGE_VERSION_MAJOR, '1', '2', '3'),
+            version(PACKAGE_PROVIDES_COMPATIBLE, '1', in_table=True)]),
+        Attribute(PACKAGE_PROVIDES, T_STRING, 'lib:libsample_x86_64', [
+            version(PACKAGE_VERSION_MAJOR, '1', '2', '3'),
+            version(PACKAGE_PROVIDES_COMPATIBLE, '1', '2')]),
+        Attribute(PACKAGE_PROVIDES, T_STRING, 'cmd:sample_tool', [
+            version(PACKAGE_VERSION_MAJOR, '1', '2', '3')]),
+        Attribute(PACKAGE_PROVIDES, T_STRING, 'devel:libsample'),
+        resolvable(PACKAGE_REQUIRES, 'haiku', OP_GREATER_EQUAL,
+                   version(PACKAGE_VERSION_MAJOR, 'r1',
+                           pre_release='beta4_hrev57937', revision=1)),
+        resolvable(PACKAGE_REQUIRES, 'lib:libz', OP_GREATER_EQUAL,
+                   version(PACKAGE_VERSION_MAJOR, '1', '2', '13')),
+        resolvable(PACKAGE_REQUIRES, 'lib:libstdc++'),
+        resolvable(PACKAGE_SUPPLEMENTS, 'sample_base', OP_EQUAL,
+                   version(PACKAGE_VERSION_MAJOR, '1', '2')),
+        resolvable(PACKAGE_CONFLICTS, 'libsample_legacy', OP_LESS,
+                   version(PACKAGE_VERSION_MAJOR, '1')),
+        resolvable(PACKAGE_FRESHENS, 'libsample_old'),
+        Attribute(PACKAGE_REPLACES, T_STRING, 'libsample_compat'),
+    ]
+    write_package('libsample-1.2.3~rc1-4-x86_64.hpkg', attributes,
+                  ['libsample', 'Haiku Project', '1'], files,
+                  COMPRESSION_ZLIB)
+
+
+def write_sample_x86():
+    """An uncompressed package for a secondary architecture, using all
+    resolvable operators"""
+    attributes = [
+        Attribute(PACKAGE_NAME, T_STRING, 'sample_x86', in_table=True),
+        Attribute(PACKAGE_SUMMARY, T_STRING,
+                  'Sample tools for the secondary architecture'),
+        Attribute(PACKAGE_DESCRIPTION, T_STRING, 'Sample tools.'),
+        Attribute(PACKAGE_VENDOR, T_STRING, 'Haiku Project'),
+        Attribute(PACKAGE_PACKAGER, T_STRING, 'John Doe <john@example.com>'),
+        Attribute(PACKAGE_FLAGS, T_UINT, 0),
+        Attribute(PACKAGE_ARCHITECTURE, T_UINT, ARCH_X86_GCC2),
+        version(PACKAGE_VERSION_MAJOR, '20240101', revision=12),
+        Attribute(PACKAGE_COPYRIGHT, T_STRING, '2024 Haiku Project'),
+        Attribute(PACKAGE_LICENSE, T_STRING, 'GNU GPL v2'),
+        Attribute(PACKAGE_INSTALL_PATH, T_STRING, '/boot/system/develop'),
+        Attribute(PACKAGE_BASE_PACKAGE, T_STRING, 'sample'),
+        resolvable(PACKAGE_PROVIDES, 'sample_x86',
+                   resolvable_version=version(PACKAGE_VERSION_MAJOR,
+                                              '20240101', revision=12)),
+        Attribute(PACKAGE_PROVIDES, T_STRING, 'cmd:sample_x86', [
+            version(PACKAGE_VERSION_MAJOR, '20240101')]),
+        resolvable(PACKAGE_REQUIRES, 'haiku_x86', OP_GREATER_EQUAL,
+                   version(PACKAGE_VERSION_MAJOR, 'r1',
+                           pre_release='beta4')),
+        resolvable(PACKAGE_REQUIRES, 'lib:libbar_x86', OP_LESS,
+                   version(PACKAGE_VERSION_MAJOR, '3'), in_table=True),
+        resolvable(PACKAGE_REQUIRES, 'lib:libbaz_x86', OP_LESS_EQUAL,
+                   version(PACKAGE_VERSION_MAJOR, '3', '1')),
+        resolvable(PACKAGE_REQUIRES, 'libqux_x86', OP_EQUAL,
+                   version(PACKAGE_VERSION_MAJOR, '0', '9', '8zh')),
+        resolvable(PACKAGE_REQUIRES, 'libquux_x86', OP_NOT_EQUAL,
+                   version(PACKAGE_VERSION_MAJOR, '2', '0',
+                           pre_release='alpha1')),
+        resolvable(PACKAGE_REQUIRES, 'cmd:sh', OP_GREATER,
+                   version(PACKAGE_VERSION_MAJOR, '0')),
+    ]
+    write_package('sample_x86-20240101-12-x86_gcc2.hpkg', attributes,
+                  ['sample_x86', 'lib:libbar_x86'],
+                  [('sample', b'#!/bin/sh\necho sample\n')],
+                  COMPRESSION_NONE)
+
+
+def write_sample_empty():
+    """A zlib compressed package without any files, fitting into a single
+    heap chunk"""
+    attributes = [
+        Attribute(PACKAGE_NAME, T_STRING, 'sample_empty'),
+        Attribute(PACKAGE_SUMMARY, T_STRING, 'An empty package'),
+        Attribute(PACKAGE_DESCRIPTION, T_STRING, 'Empty.'),
+        Attribute(PACKAGE_VENDOR, T_STRING, 'Haiku Project'),
+        Attribute(PACKAGE_PACKAGER, T_STRING, 'Jane Doe <jane@example.com>'),
+        Attribute(PACKAGE_FLAGS, T_UINT, 2),
+        Attribute(PACKAGE_ARCHITECTURE, T_UINT, ARCH_ANY),
+        version(PACKAGE_VERSION_MAJOR, '1', '0'),
+        Attribute(PACKAGE_COPYRIGHT, T_STRING, '2024 Haiku Project'),
+        Attribute(PACKAGE_LICENSE, T_STRING, 'MIT'),
+        Attribute(PACKAGE_PROVIDES, T_STRING, 'sample_empty', [
+            version(PACKAGE_VERSION_MAJOR, '1', '0')]),
+    ]
+    write_package('sample_empty-1.0-any.hpkg', attributes, [], [],
+                  COMPRESSION_ZLIB)
+
+
+if __name__ == '__main__':
+    write_libsample()
+    write_sample_x86()
+    write_sample_empty()
@@ -0,0 +1,87 @@
+# Copyright 2024 Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+"""Unit tests for BuildHistory.py module"""
+import json
+
+from HaikuPorter.BuildHistory import BuildHistory
+
+
+def _record(name, version, duration, success=True, builder="builder1",
+            start_time=1000.0):
+    return {
+        "port": {
+            "name": name,
+            "version": version,
+            "revision": "1",
+            "revisionedName": "%s-%s-1" % (name, version),
+        },
+        "buildNumbers": [],
+        "startTime": start_time,
+        "duration": duration,
+        "buildSuccess": success,
+        "builderId": builder,
+    }
+
+
+def test_predict_duration(tmp_path):
+    """Tests that predictions prefer the same version and ignore failures."""
+    history = BuildHistory(str(tmp_path))
+    history.addRecord(1, _record("gcc", "11", 3000, start_time=1000.0))
+    history.addRecord(2, _record("gcc", "13", 4000, start_time=2000.0))
+    history.addRecord(3, _record("gcc", "13", 5000, start_time=3000.0))
+    history.addRecord(4, _record("gcc", "13", 10, success=False,
+                                 start_time=4000.0))
+    history.addRecord(5, _record("zlib", "1.3", 60, start_time=5000.0))
+
+    assert history.predictDuration("gcc", "13") == 4500
+    assert history.predictDuration("gcc", "11") == 3000
+    assert history.predictDuration("gcc", "14") == 4000
+    assert history.predictDuration("unknown", "1") is None
+    assert history.defaultDuration() == (5000 + 60) / 2
+
+
+def test_queries(tmp_path):
+    """Tests the slowest ports and builder throughput queries."""
+    history = BuildHistory(str(tmp_path))
+    history.addRecord(1, _record("gcc", "13", 3600, builder="a"))
+    history.addRecord(2, _record("zlib", "1.3", 60, builder="b"))
+    history.addRecord(3, _record("curl", "8", 300, builder="b",
+                                 start_time=2000.0))
+    history.addRecord(4, _record("curl", "8", 20, success=False, builder="b",
+                                 start_time=3000.0))
+
+    assert history.slowestPorts(2) == [("gcc", "13", 3600), ("curl", "8", 300)]
+
+    throughput = history.builderThroughput()
+    assert throughput["a"]["buildsPerHour"] == 1
+    assert throughput["b"]["builds"] == 3
+    assert throughput["b"]["successfulBuilds"] == 2
+    assert history.builderThroughput(since=2000.0)["b"]["builds"] == 2
+
+
+def test_import_records(tmp_path):
+    """Tests importing a build records directory, only once."""
+    records = tmp_path / "records"
+    records.mkdir()
+    (records / "7.json").write_text(json.dumps(_record("gcc", "13", 3000)))
+    (records / "8.json").write_text(json.dumps(_record("gcc", "13", 4000)))
+    (records / "broken.json").write_text("{")
+
+    history = BuildHistory(str(tmp_path))
+    assert history.importRecords(str(records)) == 2
+    assert history.importRecords(str(records)) == 0
+    assert history.predictDuration("gcc", "13") == 3500
+
+
+def test_sources(tmp_path):
+    """Tests that records of other sources don't replace the own ones."""
+    records = tmp_path / "records"
+    records.mkdir()
+    (records / "1.json").write_text(json.dumps(_record("gcc", "13", 3000)))
+
+    history = BuildHistory(str(tmp_path))
+    history.addRecord(1, _record("zlib", "1.3", 60))
+    assert history.importRecords(str(records)) == 0
+    assert history.importRecords(str(records), source="other") == 1
+    assert history.predictDuration("zlib") == 60
+    assert history.predictDuration("gcc") == 3000
@@ -0,0 +1,70 @@
+# Copyright 2024 Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+"""Unit tests for ChunkedLog.py module"""
+import gzip
+import json
+
+from HaikuPorter.ChunkedLog import ChunkedLog
+
+
+def _compressed(log):
+    with open(log.compressedPath, "rb") as compressed_file:
+        return compressed_file.read()
+
+
+def _index(log):
+    with open(log.indexPath, encoding="utf-8") as index_file:
+        return json.load(index_file)
+
+
+def test_chunks_and_index(tmp_path, monkeypatch):
+    """Tests that complete chunks are compressed and indexed."""
+    monkeypatch.setattr(ChunkedLog, "chunkSize", 100)
+    log = ChunkedLog(str(tmp_path / "1.log"))
+    lines = ["line %d of the log\n" % number for number in range(50)]
+    for line in lines:
+        log.write(line)
+
+    index = _index(log)
+    assert not index["complete"]
+    assert index["chunks"]
+    assert index["lineCount"] == sum(chunk[3] for chunk in index["chunks"])
+
+    # every chunk can be decompressed on its own
+    compressed = _compressed(log)
+    for offset, size, first_line, line_count, _ in index["chunks"]:
+        chunk = gzip.decompress(compressed[offset:offset + size])
+        assert chunk.decode("utf-8") \
+            == "".join(lines[first_line:first_line + line_count])
+
+    # the rest of the log is in the open chunk
+    with open(tmp_path / index["openChunk"], encoding="utf-8") as chunk_file:
+        assert chunk_file.read() == "".join(lines[index["lineCount"]:])
+
+    log.close()
+    index = _index(log)
+    assert index["complete"]
+    assert index["openChunk"] is None
+    assert index["lineCount"] == len(lines)
+    assert sorted(path.name for path in tmp_path.iterdir()) \
+        == ["1.log.gz", "1.log.index"]
+    assert gzip.decompress(_compressed(log)).decode("utf-8") == "".join(lines)
+
+
+def test_blocks_split_at_line_breaks(tmp_path, monkeypatch):
+    """Tests that blocks not ending at a line break are split into chunks."""
+    monkeypatch.setattr(ChunkedLog, "chunkSize", 100)
+    log = ChunkedLog(str(tmp_path / "2.log"))
+    text = "".join("output line %d\n" % number for number in range(40))
+    for offset in range(0, len(text), 70):
+        log.write(text[offset:offset + 70])
+
+    index = _index(log)
+    compressed = _compressed(log)
+    for offset, size, _, _, _ in index["chunks"]:
+        assert gzip.decompress(compressed[offset:offset + size]) \
+            .endswith(b"\n")
+
+    log.close()
+    assert gzip.decompress(_compressed(log)).decode("utf-8") == text
+    assert _index(log)["lineCount"] == 40
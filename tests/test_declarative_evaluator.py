@@ -0,0 +1,107 @@
+# Copyright 2024 Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+"""Unit tests for DeclarativeEvaluator.py module"""
+import shutil
+
+import HaikuPorter.BuildPlatform  # noqa: F401
+import pytest
+from HaikuPorter.ConfigParser import ConfigParser
+from HaikuPorter.DeclarativeEvaluator import (DeclarativeEvaluator,
+                                              UnsupportedConstructError)
+
+pytestmark = pytest.mark.skipif(shutil.which('bash') is None,
+                                reason='bash is not available')
+
+ATTRIBUTES = {'SUMMARY': None, 'DESCRIPTION': None, 'HOMEPAGE': None,
+              'REVISION': None, 'SOURCE_URI': None, 'PROVIDES': None}
+SHELL_VARIABLES = {'portName': 'foo', 'portVersion': '1.2',
+                   'portRevisionedName': 'foo-1.2-$REVISION'}
+
+SUPPORTED_RECIPE = r'''# a comment
+SUMMARY="The foo tool"  # trailing comment
+DESCRIPTION="First line.
+Second line with \"quotes\", \$dollars and \\backslashes.
+Third line"
+HOMEPAGE='https://example.com/$portName'
+REVISION="3"; SOURCE_URI=https://example.com/$portName-${portVersion}.tar.gz
+SOURCE_URI_2=a\ b\
+c:d SUMMARY_devel="$SUMMARY (development files)"
+PROVIDES="
+	foo = $portVersion
+	cmd:foo$
+	"
+PROVIDES_devel="
+	foo_devel = $portVersion
+	"
+updateRevisionVariables
+DESCRIPTION_devel="$portRevisionedName"
+
+BUILD()
+{
+	cat > foo.sh <<-END
+	}
+	END
+	make $jobArgs
+}
+
+INSTALL()
+{
+	cat <<END >> bar
+}
+END
+	make install
+}
+'''
+
+UNSUPPORTED_CONSTRUCTS = [
+    'SUMMARY=${missing:-default}',
+    "SUMMARY=$'a\\tb'",
+    'SUMMARY+=" more"',
+    'SUMMARY=(a b)',
+    'export SUMMARY=foo',
+    'SUMMARY=$1',
+    'SUMMARY="$unknownVariable"',
+    'SUMMARY=$(echo foo)',
+    'if true; then SUMMARY=foo; fi',
+]
+
+
+def _write_recipe(tmp_path, text):
+    path = tmp_path / 'foo-1.2.recipe'
+    path.write_text(text)
+    return str(path)
+
+
+def _shell_variables(path):
+    # pylint: disable=protected-access
+    return ConfigParser._evaluatorVariables(path, ATTRIBUTES,
+                                            SHELL_VARIABLES)
+
+
+def test_output_matches_bash(tmp_path):
+    """Tests that the supported constructs are evaluated like bash does."""
+    path = _write_recipe(tmp_path, SUPPORTED_RECIPE)
+    shell_variables = _shell_variables(path)
+
+    output = DeclarativeEvaluator(shell_variables).evaluate()
+    # pylint: disable=protected-access
+    assert output == ConfigParser._evaluateInNewShell(path, shell_variables)
+    assert 'BUILD_DEFINED=1\n' in output
+    assert 'INSTALL_DEFINED=1\n' in output
+    assert 'DESCRIPTION_devel=foo-1.2-3\n' in output
+
+
+@pytest.mark.parametrize('construct', UNSUPPORTED_CONSTRUCTS)
+def test_unsupported_construct_falls_back(tmp_path, construct):
+    """Tests that unsupported constructs are refused and that the recipe is
+    evaluated by bash instead."""
+    path = _write_recipe(tmp_path, 'HOMEPAGE=x\n' + construct + '\n')
+    shell_variables = _shell_variables(path)
+
+    with pytest.raises(UnsupportedConstructError):
+        DeclarativeEvaluator(shell_variables).evaluate()
+
+    # pylint: disable=protected-access
+    assert ConfigParser._evaluate(path, ATTRIBUTES, SHELL_VARIABLES,
+                                  'python') \
+        == ConfigParser._evaluateInNewShell(path, shell_variables)
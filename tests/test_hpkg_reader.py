@@ -0,0 +1,91 @@
+# Copyright 2024 Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+"""Unit tests for HpkgReader.py module"""
+import glob
+import os
+import shutil
+from subprocess import check_output
+
+from HaikuPorter.HpkgReader import HpkgFormatError, HpkgReader
+from HaikuPorter.PackageInfo import PackageInfo
+from pytest import mark, raises
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+# Sample packages, each with the expected output of `package list -i` for it
+# next to it in a .listing file. See data/README.md for how they were made.
+SAMPLE_PACKAGES = sorted(glob.glob(os.path.join(DATA_DIR, "*.hpkg")))
+
+
+def _package_info_from_reader(path):
+    package_info = PackageInfo.__new__(PackageInfo)
+    package_info.path = path
+    package_info._parseFromHpkgFile()
+    return package_info
+
+
+def _package_info_from_listing(path, listing):
+    package_info = PackageInfo.__new__(PackageInfo)
+    package_info.path = path
+    package_info._parsePackageListing(listing)
+    return package_info
+
+
+def _fields(package_info):
+    """Returns the attributes of the package info in comparable form"""
+    fields = dict(package_info.__dict__)
+    for key in ["provides", "requires", "buildRequires", "buildPrerequires",
+                "testRequires"]:
+        fields[key] = [str(item) for item in fields[key]]
+    return fields
+
+
+@mark.parametrize("path", SAMPLE_PACKAGES, ids=os.path.basename)
+def test_reader_matches_package_listing(path):
+    """Tests that reading a package gives the same package info as parsing
+    its listing."""
+    with open(path + ".listing", encoding="utf-8") as listing_file:
+        listing = listing_file.read()
+    assert _fields(_package_info_from_reader(path)) \
+        == _fields(_package_info_from_listing(path, listing))
+
+
+@mark.skipif(shutil.which("package") is None,
+             reason="the package command is not available")
+@mark.parametrize("path", SAMPLE_PACKAGES, ids=os.path.basename)
+def test_reader_matches_package_command(path):
+    """Tests that reading a package gives the same package info as parsing
+    the output of the package command."""
+    listing = check_output(["package", "list", "-i", path]).decode("utf-8")
+    assert _fields(_package_info_from_reader(path)) \
+        == _fields(_package_info_from_listing(path, listing))
+
+
+def test_reader_attributes():
+    """Tests the attributes that aren't part of the package info."""
+    reader = HpkgReader(os.path.join(DATA_DIR,
+                                     "libsample-1.2.3~rc1-4-x86_64.hpkg"))
+    assert reader.flags == 1
+    assert reader.basePackage is None
+    assert reader.supplements == ["sample_base == 1.2"]
+    assert reader.conflicts == ["libsample_legacy < 1"]
+    assert reader.freshens == ["libsample_old"]
+    assert reader.replaces == ["libsample_compat"]
+
+    reader = HpkgReader(os.path.join(DATA_DIR,
+                                     "sample_x86-20240101-12-x86_gcc2.hpkg"))
+    assert reader.basePackage == "sample"
+    assert reader.installPath == "/boot/system/develop"
+
+
+def test_reader_rejects_other_files(tmp_path):
+    """Tests that files which aren't packages raise HpkgFormatError."""
+    path = tmp_path / "broken.hpkg"
+    path.write_bytes(b"hpkg")
+    with raises(HpkgFormatError):
+        HpkgReader(str(path))
+
+    with open(SAMPLE_PACKAGES[0], "rb") as package_file:
+        path.write_bytes(package_file.read()[:200])
+    with raises(HpkgFormatError):
+        HpkgReader(str(path))
@@ -0,0 +1,79 @@
+# Copyright 2024 Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+"""Unit tests for LogRouter.py module"""
+import logging
+import threading
+
+from HaikuPorter.LogRouter import LogRouter
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_records_routed_per_thread():
+    """Tests that records only reach the handler of the logging thread."""
+    router = LogRouter()
+    logger = logging.getLogger("test_log_router")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    logger.addHandler(router)
+
+    handlers = [_ListHandler() for _ in range(3)]
+
+    def build(handler, name):
+        router.setThreadHandler(handler)
+        for number in range(5):
+            logger.info("%s %d", name, number)
+
+    threads = [threading.Thread(target=build, args=(handler, "build%d" % i))
+               for i, handler in enumerate(handlers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # records of threads without a handler are dropped without fallbacks
+    logger.info("unrouted")
+
+    for i, handler in enumerate(handlers):
+        assert handler.messages == ["build%d %d" % (i, number)
+                                    for number in range(5)]
+
+    router.removeThreadHandler(handlers[0])
+    router.setThreadHandler(handlers[1])
+    logger.info("routed")
+    router.removeThreadHandler(handlers[1])
+    logger.info("removed")
+    assert handlers[1].messages[-1] == "routed"
+    logger.removeHandler(router)
+
+
+def test_unrouted_records_reach_fallback_handlers():
+    """Tests that records of threads without a handler go to the fallbacks."""
+    console = _ListHandler()
+    quiet = _ListHandler()
+    quiet.setLevel(logging.WARNING)
+    router = LogRouter([console, quiet])
+    logger = logging.getLogger("test_log_router_fallback")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    logger.addHandler(router)
+
+    logger.info("dispatcher")
+    logger.warning("reporter")
+
+    build = _ListHandler()
+    router.setThreadHandler(build)
+    logger.info("build")
+    router.removeThreadHandler(build)
+
+    assert console.messages == ["dispatcher", "reporter"]
+    assert quiet.messages == ["reporter"]
+    assert build.messages == ["build"]
+    logger.removeHandler(router)
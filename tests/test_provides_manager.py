@@ -0,0 +1,102 @@
+# Copyright 2024 Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+"""Unit tests for ProvidesManager.py module"""
+from math import inf
+
+# BuildPlatform and ProvidesManager import each other, BuildPlatform has to
+# be imported first
+import HaikuPorter.BuildPlatform  # noqa: F401
+from HaikuPorter.ProvidesManager import ProvidesIndex, ProvidesInfo
+from HaikuPorter.Utils import VersionKey, versionCompare
+from pytest import mark
+
+OPERATORS = {
+    "<": lambda result: result < 0,
+    "<=": lambda result: result <= 0,
+    "==": lambda result: result == 0,
+    "!=": lambda result: result != 0,
+    ">=": lambda result: result >= 0,
+    ">": lambda result: result > 0,
+}
+
+PROVIDES = [
+    "lib:foo = 0.9",
+    "lib:foo = 1.0",
+    "lib:foo = 1.0 compat >= 0.9",
+    "lib:foo = 1.0~beta1",
+    "lib:foo = 1.2.3 compat >= 1.2",
+    "lib:foo = 2",
+    "lib:foo",
+]
+
+VERSIONS = ["0.1", "0.9", "1.0~alpha", "1.0", "1.1", "1.2.3", "2", "3"]
+
+
+def _linear_matching(provides_list, operator, version):
+    """The matching of ProvidesManager before the provides were indexed."""
+    return [
+        provides for provides in provides_list
+        if provides.version
+        and OPERATORS[operator](versionCompare(provides.version, version))
+        and not (provides.compatibleVersion
+                 and versionCompare(provides.compatibleVersion, version) > 0)
+    ]
+
+
+def _index(ranks, hpkg=False):
+    index = ProvidesIndex()
+    provides_list = []
+    for rank in ranks:
+        for string in PROVIDES:
+            provides = ProvidesInfo("foo-1-1", string, "foo-1-1", rank)
+            provides.isHpkg = hpkg
+            index.add(provides)
+            provides_list.append(provides)
+    return index, provides_list
+
+
+def _sorted(provides_list):
+    return sorted(provides_list, key=lambda provides: provides.sequence)
+
+
+@mark.parametrize("ranks", [[0], [inf], [0, inf]])
+@mark.parametrize("operator", sorted(OPERATORS))
+def test_matching_like_linear(ranks, operator):
+    """Tests that matching() finds what a linear search did, for base and
+    overlay ranks."""
+    index, provides_list = _index(ranks)
+    for version in VERSIONS:
+        expected = _linear_matching(provides_list, operator, version)
+        found = index.matching(operator, VersionKey(version), False,
+                               frozenset())
+        assert _sorted(found) == _sorted(expected), (operator, version)
+        assert index.matching(operator, VersionKey(version), True,
+                              frozenset()) == []
+
+
+def test_overlay_rank_equal_version():
+    """Tests provides with rank inf are matched by == and <= (regression)."""
+    index, _ = _index([inf])
+    found = index.matching("==", VersionKey("1.0"), False, frozenset())
+    assert sorted(provides.version for provides in found) == ["1.0", "1.0"]
+    found = index.matching("<=", VersionKey("1.0"), False, frozenset())
+    assert "1.0" in [provides.version for provides in found]
+    found = index.matching(">", VersionKey("1.0"), False, frozenset())
+    assert "1.0" not in [provides.version for provides in found]
+
+
+def test_matching_hpkgs_and_removal():
+    """Tests the hpkg partition, removed provides and excluded sources."""
+    index, provides_list = _index([0], hpkg=True)
+    expected = _linear_matching(provides_list, ">=", "1.0")
+    assert _sorted(index.matching(">=", VersionKey("1.0"), True,
+                                  frozenset())) == _sorted(expected)
+    assert index.matching(">=", VersionKey("1.0"), False, frozenset()) == []
+    assert index.matching(">=", VersionKey("1.0"), True,
+                          frozenset(["foo-1-1"])) == []
+
+    for provides in provides_list[:4]:
+        index.remove(provides)
+    expected = _linear_matching(provides_list[4:], ">=", "0.1")
+    assert _sorted(index.matching(">=", VersionKey("0.1"), True,
+                                  frozenset())) == _sorted(expected)
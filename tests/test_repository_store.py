@@ -0,0 +1,51 @@
+# Copyright 2024 Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+"""Unit tests for RepositoryStore.py module"""
+import threading
+
+from HaikuPorter.RepositoryStore import RepositoryStore
+from pytest import raises
+
+
+def test_nested_transaction_rollback(tmp_path):
+    """Tests that an exception leaving the outermost transaction rolls back
+    everything done within it."""
+    store = RepositoryStore(str(tmp_path / RepositoryStore.fileName))
+    store.setSkippedPort("kept-1", "hash")
+    with raises(RuntimeError):
+        with store.transaction():
+            store.setSkippedPort("a-1", "hash")
+            with store.transaction():
+                store.setDependencyInfo("a-1", "a-1")
+            raise RuntimeError()
+
+    assert store.getSkippedPort("kept-1") == "hash"
+    assert store.getSkippedPort("a-1") is None
+    assert store.dependencyInfoPackageIDs() == []
+
+
+def test_transactions_of_threads_serialized(tmp_path):
+    """Tests that a rollback in one thread doesn't end the transaction of
+    another one, which waits for it instead."""
+    store = RepositoryStore(str(tmp_path / RepositoryStore.fileName))
+    started = threading.Event()
+    done = threading.Event()
+
+    def other():
+        started.wait()
+        with store.transaction():
+            store.setSkippedPort("b-1", "hash")
+        done.set()
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    with raises(RuntimeError):
+        with store.transaction():
+            store.setSkippedPort("a-1", "hash")
+            started.set()
+            assert not done.wait(0.2)
+            raise RuntimeError()
+    thread.join()
+
+    assert store.getSkippedPort("a-1") is None
+    assert store.getSkippedPort("b-1") == "hash"
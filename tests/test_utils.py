@@ -0,0 +1,143 @@
+# Copyright 2024 Haiku, Inc. All rights reserved.
+# Distributed under the terms of the MIT License.
+"""Unit tests for Utils.py module"""
+import os
+import random
+from functools import cmp_to_key
+
+from HaikuPorter.Utils import VersionKey, cmp, versionCompare
+from pytest import mark
+
+# Versions as they appear in recipe names and package versions of the
+# HaikuPorts tree.
+SAMPLE_VERSIONS = [
+    "0.1",
+    "0.9.8zh",
+    "1",
+    "1.0",
+    "1.00",
+    "1.0.0",
+    "1.0~rc1",
+    "1.0~rc2",
+    "1.0~RC10",
+    "1.0~beta",
+    "1.0~beta2",
+    "1.0~alpha1",
+    "1.0_git",
+    "1.0-1",
+    "1.0-2",
+    "1.0-10",
+    "1.0.1",
+    "1.1.1w",
+    "1.1.1t",
+    "1.2.11",
+    "1.2.13",
+    "2.4.48",
+    "2.10.1",
+    "2.9.14",
+    "3.0.0~beta2",
+    "3.0.0",
+    "4.2.0~alpha1",
+    "20200101",
+    "20191231",
+    "0.0.20230412",
+    "0.1~git20200101",
+    "0.1~git20191231",
+    "r1~beta4",
+    "r1~beta4_hrev57937_25",
+    "r1~alpha4.1",
+    "hrev57937",
+    "1.2.3a",
+    "1.2.3B",
+    "1.2.3b",
+    "2019.10",
+    "6.4_20230520",
+    "1.22.0.b7",
+    "0.20~1",
+    "3.14159",
+]
+
+COMPONENTS = ["0", "1", "2", "9", "10", "01", "123", "a", "b", "B", "rc1",
+              "rc10", "beta", "git2020", "r1", "1a", "1b", "2z", ""]
+
+
+def _random_version(generator):
+    """Assembles a version from random components, with an optional
+    pre-release and revision"""
+    version = ".".join(generator.choice(COMPONENTS)
+                       for _ in range(generator.randint(1, 4)))
+    if generator.random() < 0.3:
+        version += "~" + "".join(generator.choice(COMPONENTS)
+                                 for _ in range(generator.randint(1, 2)))
+    if generator.random() < 0.3:
+        version += "-" + str(generator.randint(1, 12))
+    return version
+
+
+def _tree_versions():
+    """Collects the versions of all recipes in the ports tree given by the
+    environment variable HAIKUPORTS_TREE"""
+    versions = set()
+    for _, _, file_names in os.walk(os.environ["HAIKUPORTS_TREE"]):
+        for file_name in file_names:
+            if file_name.endswith(".recipe") and file_name.count("-") == 1:
+                versions.add(file_name[:-7].split("-")[1])
+    return sorted(versions)
+
+
+def _assert_ordering_matches(versions):
+    for left in versions:
+        for right in versions:
+            expected = versionCompare(left, right)
+            assert cmp(VersionKey(left), VersionKey(right)) == expected, \
+                (left, right)
+            if expected == 0:
+                assert hash(VersionKey(left)) == hash(VersionKey(right))
+
+    assert sorted(versions, key=VersionKey) \
+        == sorted(versions, key=cmp_to_key(versionCompare))
+
+
+def test_ordering_matches_version_compare_on_sample_versions():
+    """Tests that VersionKey orders the sample versions like versionCompare."""
+    _assert_ordering_matches(SAMPLE_VERSIONS)
+
+
+@mark.parametrize("seed", range(20))
+def test_ordering_matches_version_compare_on_random_versions(seed):
+    """Tests that VersionKey orders random versions like versionCompare."""
+    generator = random.Random(seed)
+    versions = [_random_version(generator) for _ in range(40)]
+    versions += generator.sample(SAMPLE_VERSIONS, 10)
+    _assert_ordering_matches(versions)
+
+
+@mark.skipif("HAIKUPORTS_TREE" not in os.environ,
+             reason="HAIKUPORTS_TREE is not set")
+def test_ordering_matches_version_compare_on_ports_tree():
+    """Tests that VersionKey orders the versions of a real ports tree like
+    versionCompare."""
+    versions = _tree_versions()
+    _assert_ordering_matches(versions)
+
+
+@mark.parametrize(
+    "lower, higher",
+    [
+        ["1.0~rc1", "1.0"],
+        ["1.0~beta2", "1.0~rc1"],
+        ["1.0~rc2", "1.0~rc10"],
+        ["1.0", "1.0.0"],
+        ["1.9", "1.10"],
+        ["0.9.8zg", "0.9.8zh"],
+    ],
+)
+def test_version_key_ordering(lower, higher):
+    """Tests the ordering of some well known versions."""
+    assert VersionKey(lower) < VersionKey(higher)
+
+
+def test_version_key_is_cached():
+    """Tests that the key of a version is only built once."""
+    assert VersionKey("1.2.3~rc1") is VersionKey("1.2.3~rc1")
+    assert VersionKey("1.0") == VersionKey("1.00")